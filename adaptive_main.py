@@ -6,13 +6,18 @@
 import os
 import sys
 import logging
+import importlib.util
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from langdetect import detect
 from langdetect.lang_detect_exception import LangDetectException
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from lazy_loader import BackgroundLoader
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,41 +43,48 @@ RAILWAY_MODE = os.getenv("RAILWAY_MODE", "false").lower() == "true"
 FORCE_LIGHTWEIGHT = os.getenv("FORCE_LIGHTWEIGHT", "false").lower() == "true"
 FORCE_FULL_ML = os.getenv("FORCE_FULL_ML", "false").lower() == "true"
 
+FULL_ML_SYSTEMS = ["maximum_accuracy", "ultimate_search", "senior_ai"]
+LIGHTWEIGHT_SYSTEMS = ["railway_optimized", "railway_simple"]
+
+# Полные ML зависимости проверяются без импорта (find_spec): импорт torch,
+# faiss и nltk занимает секунды и выполняется уже в фоновой загрузке
+ML_DEPENDENCIES = ["numpy", "sentence_transformers", "faiss", "fuzzywuzzy", "nltk", "pandas", "sklearn"]
+
+def missing_ml_dependencies() -> list:
+    """Полные ML зависимости, которые не установлены"""
+    return [name for name in ML_DEPENDENCIES if importlib.util.find_spec(name) is None]
+
 # Умная система импорта
 def smart_import():
-    """Умно импортирует лучшую версию в зависимости от окружения"""
+    """
+    Умно выбирает версию в зависимости от окружения. Облегченная версия
+    импортируется сразу и отвечает с первого запроса; если нужна полная ML
+    версия, возвращается флаг ее фоновой загрузки (full_ml_loader).
+    """
     
     # Принудительные настройки
     if FORCE_LIGHTWEIGHT:
         logger.info("🔧 Принудительно включена облегченная версия")
-        return import_lightweight()
+        return (*import_lightweight(), False)
     
     if FORCE_FULL_ML:
         logger.info("🔧 Принудительно включены полные ML зависимости")
-        return import_full_ml()
+        return (*import_lightweight(), True)
     
     # Автоматическое определение
     if RAILWAY_MODE:
         logger.info("☁️ Railway окружение - используем облегченную версию")
-        return import_lightweight()
+        return (*import_lightweight(), False)
     
     # Проверяем доступность полных ML зависимостей
-    try:
-        import numpy
-        import sentence_transformers
-        import faiss
-        import fuzzywuzzy
-        import nltk
-        import pandas
-        import sklearn
-        
-        logger.info("🚀 Полные ML зависимости доступны - используем максимальную точность")
-        return import_full_ml()
-        
-    except ImportError as e:
-        logger.warning(f"⚠️ Полные ML зависимости недоступны: {e}")
+    missing = missing_ml_dependencies()
+    if missing:
+        logger.warning(f"⚠️ Полные ML зависимости недоступны: {', '.join(missing)}")
         logger.info("⚡ Переключаемся на облегченную версию")
-        return import_lightweight()
+        return (*import_lightweight(), False)
+    
+    logger.info("🚀 Полные ML зависимости доступны - максимальная точность после фоновой загрузки")
+    return (*import_lightweight(), True)
 
 def import_full_ml():
     """Импортирует полную ML версию"""
@@ -109,8 +121,25 @@ def import_lightweight():
             logger.error("❌ Ни одна система не доступна")
             return None, "none"
 
-# Импортируем лучшую версию
-get_enhanced_answer, system_type = smart_import()
+def _load_full_ml():
+    """Фоновая загрузка полной ML версии"""
+    answer, loaded_type = import_full_ml()
+    if loaded_type not in FULL_ML_SYSTEMS:
+        raise RuntimeError("полные ML системы недоступны")
+    return answer, loaded_type
+
+def _activate_full_ml(result):
+    """Подменяет облегченную версию полной, когда та загрузилась"""
+    global get_enhanced_answer, system_type
+    get_enhanced_answer, system_type = result
+    logger.info(f"🔄 Переключились на полную ML версию: {system_type}")
+
+full_ml_loader = BackgroundLoader("full_ml", _load_full_ml, on_ready=_activate_full_ml)
+
+# Импортируем облегченную версию сразу, полную ML - в фоне
+get_enhanced_answer, system_type, load_full_ml = smart_import()
+if load_full_ml:
+    full_ml_loader.start()
 
 # Загружаем базовые компоненты
 try:
@@ -198,19 +227,44 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Проверка здоровья системы"""
+    """Проверка здоровья системы (liveness: процесс отвечает, загрузка компонентов не учитывается)"""
     return {
         "status": "healthy",
         "system_type": system_type,
         "railway_mode": RAILWAY_MODE,
         "timestamp": datetime.now().isoformat(),
         "features": {
-            "maximum_accuracy": system_type in ["maximum_accuracy", "ultimate_search", "senior_ai"],
-            "lightweight": system_type in ["railway_optimized", "railway_simple"],
+            "maximum_accuracy": system_type in FULL_ML_SYSTEMS,
+            "lightweight": system_type in LIGHTWEIGHT_SYSTEMS,
             "adaptive": True
         }
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Готовность компонентов (readiness). Сервис готов, когда подключена хотя
+    бы облегченная версия; состояние фоновой загрузки полной ML версии и ее
+    эмбеддингов отдается в components.
+    """
+    components = {
+        "answer_system": system_type,
+        "full_ml": full_ml_loader.status()
+    }
+    if system_type == "senior_ai":
+        from senior_ai_integrated_client import get_readiness
+        components["senior_ai"] = get_readiness()
+    
+    ready = get_enhanced_answer is not None
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "components": components,
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """Основной эндпоинт для чата"""
@@ -226,8 +280,8 @@ async def chat_endpoint(request: ChatRequest):
         
         # Обрабатываем запрос
         if intent == "faq" and get_enhanced_answer:
-            # Используем AI систему
-            answer = get_enhanced_answer(request.text)
+            # Используем AI систему (в пуле потоков: поиск с эмбеддингами не блокирует цикл событий)
+            answer = await run_in_threadpool(get_enhanced_answer, request.text)
             confidence = 0.95 if answer != "Нужна уточняющая информация" else 0.3
             source = "ai_system"
         else:
@@ -261,19 +315,12 @@ async def get_status():
         "system_type": system_type,
         "railway_mode": RAILWAY_MODE,
         "features": {
-            "maximum_accuracy": system_type in ["maximum_accuracy", "ultimate_search", "senior_ai"],
-            "lightweight": system_type in ["railway_optimized", "railway_simple"],
+            "maximum_accuracy": system_type in FULL_ML_SYSTEMS,
+            "lightweight": system_type in LIGHTWEIGHT_SYSTEMS,
             "adaptive": True
         },
-        "dependencies": {
-            "numpy": "numpy" in sys.modules,
-            "sentence_transformers": "sentence_transformers" in sys.modules,
-            "faiss": "faiss" in sys.modules,
-            "fuzzywuzzy": "fuzzywuzzy" in sys.modules,
-            "nltk": "nltk" in sys.modules,
-            "pandas": "pandas" in sys.modules,
-            "sklearn": "sklearn" in sys.modules
-        }
+        "full_ml": full_ml_loader.status(),
+        "dependencies": {name: name in sys.modules for name in ML_DEPENDENCIES}
     }
 
 if __name__ == "__main__":
@@ -15,6 +15,10 @@ from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 import os
 
+from ollama_async_client import get_ollama_client, OllamaTimeoutError
+from llm_selection import KBCandidateSelector
+from prompt_assembly import get_prompt_assembler
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -51,13 +55,40 @@ class HealthResponse(BaseModel):
     llm_available: bool = False
 
 class AnswerSelectionLLMClient:
+    # Неизменная часть промпта выбора (общий префикс для KV-кэша Ollama)
+    SELECTION_INSTRUCTIONS = """Задача: выбери номер готового ответа, который лучше всего подходит для вопроса пользователя.
+
+Учитывай:
+- Совпадение ключевых слов
+- Похожесть на вариации вопросов
+- Смысловую близость"""
+    
+    SELECTION_OPTIONS = {
+        "temperature": 0.0,   # Минимальная температура для точности
+        "num_predict": 3,      # Только номер ответа
+        "num_ctx": 1024,      # Список кандидатов (~2k символов) без обрезки инструкций
+        "repeat_penalty": 1.0,
+        "top_k": 1,           # Только лучший вариант
+        "top_p": 0.1,         # Минимальная вероятность
+        "stop": ["\n", ".", "!", "?", "Ответ:", "Категория:", "Объяснение:"]  # Стоп-слова
+    }
+    
     def __init__(self):
         self.ollama_url = os.environ.get("OLLAMA_URL", "http://localhost:11434")
         self.model_name = "aparu-senior-ai"
         self.ollama_available = False
         
+        self.ollama = get_ollama_client(self.ollama_url)
+        
         # Загружаем базу знаний
         self.knowledge_base = self._load_knowledge_base()
+        # Лексический shortlist: LLM выбирает только среди top-k кандидатов
+        self.selector = KBCandidateSelector(self.knowledge_base, instructions=self.SELECTION_INSTRUCTIONS)
+        # Инструкции - стабильный системный префикс модели (keep_alive и прогрев)
+        self.assembler = get_prompt_assembler(self.ollama)
+        self.system_prefix = self.assembler.register(
+            self.model_name, "answer_selection", self.selector.prefix, self.SELECTION_OPTIONS
+        )
         
         # Проверяем доступность Ollama
         self._check_ollama_model()
@@ -89,7 +120,7 @@ class AnswerSelectionLLMClient:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к Ollama: {e}")
     
-    def find_best_answer(self, question: str) -> Dict[str, Any]:
+    async def find_best_answer(self, question: str) -> Dict[str, Any]:
         """Находит лучший готовый ответ используя LLM для выбора"""
         start_time = datetime.now()
         
@@ -97,7 +128,7 @@ class AnswerSelectionLLMClient:
         if self.ollama_available:
             try:
                 logger.info("🎯 Используем LLM для выбора готового ответа...")
-                result = self._llm_answer_selection(question)
+                result = await self._llm_answer_selection(question)
                 if result:
                     processing_time = (datetime.now() - start_time).total_seconds()
                     logger.info(f"✅ LLM выбор завершен за {processing_time:.2f}с")
@@ -109,107 +140,52 @@ class AnswerSelectionLLMClient:
         logger.info("🔄 Fallback к поиску по ключевым словам...")
         return self._keyword_search(question)
     
-    def _llm_answer_selection(self, question: str) -> Dict[str, Any]:
-        """LLM выбирает подходящий готовый ответ из базы"""
+    async def _llm_answer_selection(self, question: str) -> Dict[str, Any]:
+        """LLM выбирает подходящий готовый ответ среди кандидатов из базы"""
         try:
-            # Создаем промпт для выбора ответа
-            selection_prompt = self._create_selection_prompt(question)
-            
-            payload = {
-                "model": self.model_name,
-                "prompt": selection_prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.0,   # Минимальная температура для точности
-                    "num_predict": 3,      # Только номер ответа
-                    "num_ctx": 512,       # Достаточный контекст
-                    "repeat_penalty": 1.0,
-                    "top_k": 1,           # Только лучший вариант
-                    "top_p": 0.1,         # Минимальная вероятность
-                    "stop": ["\n", ".", "!", "?", "Ответ:", "Категория:", "Объяснение:"]  # Стоп-слова
-                }
-            }
+            candidates = self.selector.shortlist(question)
+            if not candidates:
+                logger.info("🎯 Нет лексических кандидатов - LLM не вызываем")
+                return None
+            if len(candidates) == 1:
+                # Единственный кандидат - выбирать LLM нечего
+                return self._kb_result(candidates[0], 0.9, "lexical_shortlist")
             
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload,
-                timeout=10  # Короткий таймаут
+            # Промпт = системный префикс + кандидаты и вопрос
+            data = await self.assembler.generate(
+                self.system_prefix, self._create_selection_prompt(question, candidates),
+                client=self.ollama, timeout=10  # Короткий таймаут
             )
+            answer = data.get('response', '').strip()
             
-            if response.status_code == 200:
-                data = response.json()
-                answer = data.get('response', '').strip()
-                
-                # Парсим номер выбранного ответа
-                selected_num = self._parse_selected_answer(answer)
-                if selected_num:
-                    # Возвращаем готовый ответ из базы
-                    if 1 <= selected_num <= len(self.knowledge_base):
-                        kb_item = self.knowledge_base[selected_num - 1]
-                        return {
-                            "answer": kb_item.get("answer", "Ответ не найден"),
-                            "category": f"Ответ {selected_num}",
-                            "confidence": 0.95,
-                            "source": "llm_answer_selection"
-                        }
-                
-                logger.warning(f"⚠️ LLM вернул неожиданный ответ: '{answer}'")
-                return None
+            # Номер выбранного кандидата -> готовый ответ из базы
+            kb_index = self.selector.resolve(answer, candidates)
+            if kb_index is not None:
+                return self._kb_result(kb_index, 0.95, "llm_answer_selection")
             
-            logger.warning(f"⚠️ LLM вернул ошибку: {response.status_code}")
+            logger.warning(f"⚠️ LLM вернул неожиданный ответ: '{answer}'")
             return None
             
-        except requests.exceptions.Timeout:
+        except OllamaTimeoutError:
             logger.error(f"❌ LLM выбор таймаут (>10с)")
             return None
         except Exception as e:
             logger.error(f"❌ Ошибка LLM выбора: {e}")
             return None
     
-    def _create_selection_prompt(self, question: str) -> str:
-        """Создает промпт для выбора подходящего ответа"""
-        prompt = f"""Вопрос пользователя: "{question}"
-
-Доступные готовые ответы:
-
-"""
-        
-        for i, item in enumerate(self.knowledge_base, 1):
-            variations = item.get("question_variations", [])
-            keywords = item.get("keywords", [])
-            answer_preview = item.get("answer", "")[:100] + "..."
-            
-            prompt += f"{i}. ВАРИАЦИИ ВОПРОСОВ:\n"
-            for variation in variations[:3]:  # Показываем первые 3 вариации
-                prompt += f"   - {variation}\n"
-            
-            prompt += f"   КЛЮЧЕВЫЕ СЛОВА: {', '.join(keywords[:5])}\n"
-            prompt += f"   ОТВЕТ: {answer_preview}\n\n"
-        
-        prompt += f"""Задача: Выбери номер ответа (1-{len(self.knowledge_base)}), который лучше всего подходит для вопроса: "{question}"
-
-Учитывай:
-- Совпадение ключевых слов
-- Похожесть на вариации вопросов
-- Смысловую близость
-
-Номер ответа:"""
-
-        return prompt
+    def _create_selection_prompt(self, question: str, candidates: List[int]) -> str:
+        """Создает переменную часть промпта выбора: кандидаты и вопрос (после системного префикса)"""
+        return self.selector.build_body(question, candidates)
     
-    def _parse_selected_answer(self, answer: str) -> Optional[int]:
-        """Парсит номер выбранного ответа"""
-        try:
-            # Ищем число в ответе
-            import re
-            numbers = re.findall(r'\d+', answer)
-            if numbers:
-                num = int(numbers[0])
-                if 1 <= num <= len(self.knowledge_base):
-                    return num
-            return None
-        except:
-            return None
+    def _kb_result(self, kb_index: int, confidence: float, source: str) -> Dict[str, Any]:
+        """Готовый ответ из пункта базы знаний"""
+        kb_item = self.knowledge_base[kb_index]
+        return {
+            "answer": kb_item.get("answer", "Ответ не найден"),
+            "category": f"Ответ {kb_index + 1}",
+            "confidence": confidence,
+            "source": source
+        }
     
     def _keyword_search(self, question: str) -> Dict[str, Any]:
         """Fallback поиск по ключевым словам"""
@@ -260,6 +236,16 @@ class AnswerSelectionLLMClient:
 # Глобальный экземпляр
 answer_selection_client = AnswerSelectionLLMClient()
 
+@app.on_event("startup")
+async def startup():
+    """Фоновый прогрев префикса выбора ответа"""
+    if answer_selection_client.ollama_available:
+        answer_selection_client.assembler.start_warmup()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await answer_selection_client.assembler.stop_warmup()
+
 @app.get("/")
 async def root():
     return {
@@ -279,6 +265,11 @@ async def health():
         llm_available=answer_selection_client.ollama_available
     )
 
+@app.get("/llm/stats")
+async def llm_stats():
+    """Статистика LLM: переиспользование префикса, prompt_eval_count / eval_duration"""
+    return answer_selection_client.assembler.stats()
+
 @app.get("/webapp", response_class=HTMLResponse)
 async def webapp():
     """Telegram WebApp интерфейс"""
@@ -296,7 +287,7 @@ async def webapp():
 async def chat(request: ChatRequest):
     """Основной эндпоинт для чата"""
     try:
-        result = answer_selection_client.find_best_answer(request.text)
+        result = await answer_selection_client.find_best_answer(request.text)
         
         return ChatResponse(
             response=result["answer"],
@@ -0,0 +1,275 @@
+"""
+Бэкенды модели эмбеддингов запросов.
+
+По умолчанию модель (paraphrase-multilingual-MiniLM-L12-v2) загружается
+через sentence-transformers на PyTorch: долгий импорт torch, сотни МБ RSS
+и заметная задержка на запрос - из-за этого эмбеддинги отключены на
+Railway. Альтернатива - та же модель, один раз экспортированная в ONNX с
+динамической int8 квантизацией и выполняемая через onnxruntime на CPU
+(нужны только onnxruntime и tokenizers).
+
+    python backend/embedding_backend.py export   # torch -> ONNX int8 (один раз)
+    python backend/embedding_backend.py check    # сверка с PyTorch на вариациях базы
+
+Выбор бэкенда - EMBEDDINGS_BACKEND: auto (ONNX, если модель
+экспортирована, иначе PyTorch), onnx или torch.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import importlib.util
+from typing import Dict, Any, List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_BACKEND = os.environ.get("EMBEDDINGS_BACKEND", "auto")
+MODELS_DIR = os.environ.get(
+    "EMBEDDINGS_MODELS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+)
+
+ONNX_MANIFEST_FILE = "onnx_manifest.json"
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+# Наличие пакетов проверяется без импорта (torch импортируется только при загрузке модели)
+TORCH_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+ONNX_AVAILABLE = (importlib.util.find_spec("onnxruntime") is not None
+                  and importlib.util.find_spec("tokenizers") is not None)
+
+
+def onnx_model_dir(model_name: str) -> str:
+    """Каталог экспортированной ONNX модели"""
+    return os.path.join(MODELS_DIR, model_name.split("/")[-1] + "-onnx")
+
+
+def onnx_model_exported(model_name: str) -> bool:
+    return os.path.exists(os.path.join(onnx_model_dir(model_name), ONNX_MANIFEST_FILE))
+
+
+# Эмбеддинги доступны, если есть хотя бы один рабочий бэкенд
+EMBEDDINGS_AVAILABLE = TORCH_AVAILABLE or ONNX_AVAILABLE
+
+
+def mean_pooling(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Среднее по токенам без паддинга (пулинг sentence-transformers для этой модели)"""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    return (summed / counts).astype(np.float32)
+
+
+class OnnxSentenceEncoder:
+    """Модель эмбеддингов на onnxruntime с тем же encode(), что у SentenceTransformer"""
+
+    backend = "onnx"
+
+    def __init__(self, model_dir: str, threads: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.manifest['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.manifest['pad_token_id'], pad_token=self.manifest['pad_token'])
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, self.manifest['file']), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        logger.info(f"✅ ONNX модель эмбеддингов загружена: {self.manifest['model']} ({self.manifest['file']})")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.manifest['dim']
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        outputs = self.session.run(None, {name: feeds[name] for name in self.input_names})
+        return mean_pooling(outputs[0], feeds['attention_mask'])
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Эмбеддинги float32: (n, dim) для списка, (dim,) для одной строки"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.manifest['dim']), dtype=np.float32)
+
+        # Пакеты из текстов близкой длины - меньше паддинга
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        result = np.empty((len(texts), self.manifest['dim']), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            result[batch] = self._encode_batch([texts[i] for i in batch])
+        return result[0] if single else result
+
+
+def load_embedding_model(model_name: str, backend: Optional[str] = None):
+    """
+    Загружает модель эмбеддингов выбранного бэкенда. При недоступности ONNX
+    (не установлен onnxruntime или модель не экспортирована) используется
+    PyTorch. None, если ни один бэкенд недоступен.
+    """
+    backend = backend or EMBEDDINGS_BACKEND
+    if backend in ("auto", "onnx"):
+        if ONNX_AVAILABLE and onnx_model_exported(model_name):
+            try:
+                return OnnxSentenceEncoder(onnx_model_dir(model_name))
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка загрузки ONNX модели, используем PyTorch: {e}")
+        elif backend == "onnx":
+            logger.warning(f"⚠️ ONNX модель недоступна ({onnx_model_dir(model_name)}), используем PyTorch")
+
+    if TORCH_AVAILABLE:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    return None
+
+
+def export_onnx(model_name: str, output_dir: Optional[str] = None, quantize: bool = True,
+                max_seq_length: int = 128, opset: int = 14) -> str:
+    """
+    Экспортирует трансформер модели в ONNX и (по умолчанию) квантизует веса
+    в int8. Нужны torch, transformers и onnxruntime - только на машине, где
+    выполняется экспорт.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = output_dir or onnx_model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    hub_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+    tokenizer = AutoTokenizer.from_pretrained(hub_id)
+    model = AutoModel.from_pretrained(hub_id).eval()
+
+    sample = tokenizer(["Что такое наценка?", "Как пополнить баланс"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in input_names), fp32_path,
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=opset
+        )
+
+    model_file = ONNX_MODEL_FILE
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(output_dir, ONNX_QUANTIZED_FILE), weight_type=QuantType.QInt8)
+        model_file = ONNX_QUANTIZED_FILE
+
+    tokenizer.save_pretrained(output_dir)
+    manifest = {
+        'model': model_name,
+        'hub_id': hub_id,
+        'file': model_file,
+        'quantized': quantize,
+        'dim': model.config.hidden_size,
+        'max_seq_length': max_seq_length,
+        'pooling': 'mean',
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id
+    }
+    with open(os.path.join(output_dir, ONNX_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"💾 ONNX модель сохранена: {output_dir} ({model_file})")
+    return output_dir
+
+
+def check_accuracy(reference, candidate, texts: List[str], min_mean_cosine: float = 0.98,
+                   min_top1_agreement: float = 0.95) -> Dict[str, Any]:
+    """
+    Сверяет эмбеддинги бэкенда-кандидата с эталонными (PyTorch):
+    - косинус между векторами одного текста (среднее и минимум);
+    - совпадение ближайшего соседа каждого текста среди остальных
+      (то, что на самом деле видит поиск).
+    """
+    def normalized(model) -> np.ndarray:
+        vectors = np.asarray(model.encode(texts), dtype=np.float32)
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    started = time.perf_counter()
+    ref = normalized(reference)
+    reference_time = time.perf_counter() - started
+    started = time.perf_counter()
+    cand = normalized(candidate)
+    candidate_time = time.perf_counter() - started
+
+    cosines = (ref * cand).sum(axis=1)
+
+    def nearest(vectors: np.ndarray) -> np.ndarray:
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, -np.inf)
+        return similarity.argmax(axis=1)
+
+    agreement = float(np.mean(nearest(ref) == nearest(cand))) if len(texts) > 1 else 1.0
+    report = {
+        'texts': len(texts),
+        'mean_cosine': float(cosines.mean()),
+        'min_cosine': float(cosines.min()),
+        'top1_agreement': agreement,
+        'reference_ms_per_text': reference_time / len(texts) * 1000,
+        'candidate_ms_per_text': candidate_time / len(texts) * 1000
+    }
+    report['passed'] = report['mean_cosine'] >= min_mean_cosine and agreement >= min_top1_agreement
+    return report
+
+
+def kb_texts(path: str) -> List[str]:
+    """Вопросы и вариации базы знаний (senior_ai_knowledge_base.json или BZ.txt)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        knowledge_base = json.load(f)
+    texts = []
+    for item in knowledge_base:
+        if item.get('question'):
+            texts.append(item['question'])
+        texts.extend(item.get('variations') or item.get('question_variations') or [])
+    return list(dict.fromkeys(texts))
+
+
+__all__ = ['OnnxSentenceEncoder', 'load_embedding_model', 'export_onnx', 'check_accuracy', 'mean_pooling',
+           'EMBEDDINGS_AVAILABLE', 'ONNX_AVAILABLE', 'TORCH_AVAILABLE', 'EMBEDDINGS_BACKEND']
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    model_name = os.environ.get("EMBEDDINGS_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+
+    if command == "export":
+        export_onnx(model_name, quantize="--fp32" not in sys.argv)
+    elif command == "check":
+        kb_path = sys.argv[2] if len(sys.argv) > 2 else "senior_ai_knowledge_base.json"
+        texts = kb_texts(kb_path)
+        report = check_accuracy(load_embedding_model(model_name, "torch"),
+                                OnnxSentenceEncoder(onnx_model_dir(model_name)), texts)
+        print(f"📊 Сверка ONNX с PyTorch на {report['texts']} текстах из {kb_path}:")
+        print(f"   Косинус: среднее {report['mean_cosine']:.4f}, минимум {report['min_cosine']:.4f}")
+        print(f"   Совпадение ближайшего соседа: {report['top1_agreement']:.1%}")
+        print(f"   Время на текст: PyTorch {report['reference_ms_per_text']:.1f} мс, "
+              f"ONNX {report['candidate_ms_per_text']:.1f} мс")
+        print("✅ Точность сохранена" if report['passed'] else "❌ Точность ниже порога")
+        sys.exit(0 if report['passed'] else 1)
+    else:
+        print("Использование: python backend/embedding_backend.py [export [--fp32] | check [kb.json]]")
+        sys.exit(2)
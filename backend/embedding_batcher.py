@@ -0,0 +1,126 @@
+"""
+Микро-батчинг эмбеддингов запросов.
+
+SentenceTransformer.encode на CPU обрабатывает 16 предложений почти за то
+же время, что и одно. Поэтому запросы не кодируются по одному: они
+попадают в очередь, фоновый поток собирает пакет (до max_batch_size
+текстов или max_wait_ms миллисекунд с первого) и вызывает encode один раз
+на весь пакет, после чего раздает векторы ожидающим запросам.
+
+Синхронный encode() предназначен для поиска, выполняемого в пуле потоков
+(FastAPI threadpool), encode_async() - для корутин: цикл событий не
+блокируется, пока пакет считается.
+"""
+
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 16))
+DEFAULT_BATCH_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_WAIT_MS", 5))
+
+
+class EmbeddingBatcher:
+    """Очередь запросов на эмбеддинг и фоновый поток, кодирующий их пакетами"""
+
+    def __init__(self, encode_fn: Callable[[List[str]], Any], max_batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_BATCH_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.batches = 0
+        self.encoded = 0
+        self.max_batch = 0
+        self.errors = 0
+
+    def submit(self, text: str) -> Future:
+        """Ставит текст в очередь; Future получит вектор float32"""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """Эмбеддинг одного текста (блокирует вызывающий поток до готовности пакета)"""
+        return self.submit(text).result(timeout)
+
+    async def encode_async(self, text: str) -> np.ndarray:
+        """Эмбеддинг одного текста без блокировки цикла событий"""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        """Первый запрос ждем без ограничения, остальные - до заполнения пакета или таймаута"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Отмененные ожидающие не занимают место в пакете
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: Sequence[Tuple[str, Future]]):
+        # Одинаковые тексты в пакете кодируются один раз
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = np.asarray(self.encode_fn(texts), dtype=np.float32)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Ошибка пакетного эмбеддинга ({len(texts)} текстов): {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.requests += len(batch)
+        self.batches += 1
+        self.encoded += len(texts)
+        self.max_batch = max(self.max_batch, len(texts))
+
+        row = {text: i for i, text in enumerate(texts)}
+        for text, future in batch:
+            future.set_result(vectors[row[text]])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'encoded': self.encoded,
+            'avg_batch_size': self.encoded / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch,
+            'errors': self.errors,
+            'queued': self._queue.qsize()
+        }
+
+
+__all__ = ['EmbeddingBatcher', 'DEFAULT_BATCH_SIZE', 'DEFAULT_BATCH_WAIT_MS']
@@ -0,0 +1,151 @@
+"""
+Кэш эмбеддингов запросов.
+
+Ключ - текст запроса после нормализации (normalize_text_advanced и т.п.),
+значение - вектор float32. Перефразировки в поддержке часто сводятся к
+одному и тому же нормализованному тексту, а один вектор используется всеми
+ветками гибридного поиска, поэтому кэш стоит перед encode и отделен от
+кэша ответов. Объем ограничен бюджетом в байтах (вытеснение по LRU).
+
+Кэш можно сохранять на диск между перезапусками: .npz с массивом текстов
+и матрицей векторов (без pickle), файл привязан к модели эмбеддингов.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_BYTES = int(float(os.environ.get("EMBEDDING_CACHE_MB", 16)) * 1024 * 1024)
+DEFAULT_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "")
+
+
+class EmbeddingCache:
+    """LRU кэш нормализованный текст -> float32 вектор с бюджетом памяти"""
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES, model: str = "",
+                 path: Optional[str] = None):
+        self.budget_bytes = budget_bytes
+        self.model = model
+        self.path = path or None
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.path:
+            self.load()
+
+    @staticmethod
+    def _entry_size(key: str, vector: np.ndarray) -> int:
+        # Вектор + текст ключа (UTF-8 верхняя оценка)
+        return vector.nbytes + len(key) * 4
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Вектор из кэша или None"""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: np.ndarray) -> np.ndarray:
+        """Сохраняет вектор (копия float32 только для чтения), вытесняя старые записи"""
+        vector = np.array(vector, dtype=np.float32).reshape(-1)
+        vector.setflags(write=False)
+        size = self._entry_size(key, vector)
+        if size > self.budget_bytes:
+            return vector
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._entry_size(key, old)
+            self._entries[key] = vector
+            self._bytes += size
+            while self._bytes > self.budget_bytes:
+                old_key, old_vector = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_vector)
+                self.evictions += 1
+        return vector
+
+    def get_or_compute(self, key: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        """Вектор из кэша, при промахе - compute(key) с сохранением результата"""
+        vector = self.get(key)
+        if vector is None:
+            vector = self.put(key, compute(key))
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def save(self, path: Optional[str] = None) -> bool:
+        """Сохраняет кэш в .npz (порядок LRU сохраняется)"""
+        path = path or self.path
+        if not path:
+            return False
+        with self._lock:
+            keys = list(self._entries.keys())
+            vectors = list(self._entries.values())
+        if not vectors or len({vector.shape for vector in vectors}) != 1:
+            return False
+
+        tmp_path = path + ".tmp.npz"
+        try:
+            np.savez(tmp_path, texts=np.array(keys), vectors=np.stack(vectors),
+                     model=np.array(self.model))
+            os.replace(tmp_path, path)
+            logger.info(f"💾 Кэш эмбеддингов сохранен: {len(keys)} векторов в {path}")
+            return True
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить кэш эмбеддингов: {e}")
+            return False
+
+    def load(self, path: Optional[str] = None) -> int:
+        """Загружает кэш с диска; файл другой модели игнорируется. Возвращает число векторов"""
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['model']) != self.model:
+                    logger.warning(f"⚠️ Кэш эмбеддингов {path} создан другой моделью, пропускаем")
+                    return 0
+                texts, vectors = data['texts'], data['vectors']
+                for text, vector in zip(texts, vectors):
+                    self.put(str(text), vector)
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"⚠️ Не удалось загрузить кэш эмбеддингов: {e}")
+            return 0
+        logger.info(f"✅ Кэш эмбеддингов загружен: {len(self._entries)} векторов")
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'bytes': self._bytes,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'persistent': self.path is not None
+            }
+
+
+__all__ = ['EmbeddingCache', 'DEFAULT_BUDGET_BYTES', 'DEFAULT_CACHE_PATH']
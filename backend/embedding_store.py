@@ -0,0 +1,206 @@
+"""
+Хранилище эмбеддингов базы знаний на диске.
+
+Вместо pickle с FAISS индексом индекс хранится в каталоге:
+- embeddings.npy - матрица float32 (строки нормализованы по L2),
+  открывается через np.memmap, поэтому несколько воркеров uvicorn делят
+  одни и те же страницы через кэш ОС, а не держат по своей копии;
+- ids.npy - номер пункта базы знаний (int32) для каждой строки матрицы
+  (row_to_item_id): строка -> пункт за O(1), результаты по вариациям
+  одного пункта объединяются max-pooling;
+- manifest.json - версия формата, модель, размерность, число строк, хэш
+  базы знаний, по которому устаревший индекс не используется, и имена
+  файлов матрицы и номеров.
+
+Каждое сохранение пишет матрицу и номера в новые файлы
+(embeddings-<версия>.npy, ids-<версия>.npy), а затем атомарно заменяет
+манифест, который на них ссылается. Читатель видит либо старый манифест
+со старыми файлами, либо новый с новыми. Файлы предыдущего сохранения
+остаются на диске до следующего (их мог успеть открыть читатель старого
+манифеста); индексы без имен файлов в манифесте читаются из embeddings.npy
+и ids.npy.
+
+Загрузка не десериализует Python объекты (allow_pickle=False). Поиск -
+скалярное произведение с нормализованным запросом, как IndexFlatIP.
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+IDS_FILE = "ids.npy"
+
+
+class IndexFormatError(Exception):
+    """Индекс на диске поврежден, устарел или создан другой моделью"""
+
+
+def kb_hash(knowledge_base: List[Dict[str, Any]]) -> str:
+    """Хэш содержимого базы знаний (не зависит от форматирования файла)"""
+    data = json.dumps(knowledge_base, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """float32 копия с единичной L2 нормой строк (аналог faiss.normalize_L2)"""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingStore:
+    """Матрица эмбеддингов (memmap), номера пунктов базы по строкам и манифест"""
+
+    def __init__(self, embeddings: np.ndarray, ids: np.ndarray, manifest: Dict[str, Any]):
+        self.embeddings = embeddings
+        self.ids = ids
+        self.manifest = manifest
+        self.item_count = int(ids.max()) + 1 if len(ids) else 0
+
+    @property
+    def row_to_item_id(self) -> np.ndarray:
+        return self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    def search(self, query_embeddings: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k строк по косинусной близости: (scores, indices) как у faiss.Index.search"""
+        queries = normalize_rows(query_embeddings)
+        scores = queries @ self.embeddings.T
+        top_k = min(top_k, scores.shape[1])
+        if top_k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+    def search_items(self, query_embedding: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Top-k пунктов базы для одного запроса: близость пункта - максимум по
+        строкам его вопроса и вариаций (max-pooling), каждый пункт один раз.
+        """
+        scores = self.embeddings @ normalize_rows(query_embedding)[0]
+        pooled = np.full(self.item_count, -np.inf, dtype=np.float32)
+        np.maximum.at(pooled, self.ids, scores)
+
+        top_k = min(top_k, self.item_count)
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-pooled, top_k - 1)[:top_k]
+        top = top[np.argsort(-pooled[top], kind='stable')]
+        return [(int(item_id), float(pooled[item_id])) for item_id in top if np.isfinite(pooled[item_id])]
+
+    @staticmethod
+    def save(path: str, embeddings: np.ndarray, ids: List[int], model: str, kb: str) -> Dict[str, Any]:
+        """
+        Сохраняет индекс в каталог path. Матрица и номера пишутся в новые
+        файлы, затем атомарно заменяется манифест со ссылками на них:
+        манифест всегда описывает ту матрицу, на которую ссылается.
+        """
+        embeddings = normalize_rows(embeddings)
+        ids = np.asarray(ids, dtype=np.int32)
+        if len(ids) != len(embeddings):
+            raise ValueError(f"Число строк ({len(embeddings)}) и номеров ({len(ids)}) не совпадает")
+
+        os.makedirs(path, exist_ok=True)
+        previous = EmbeddingStore._data_files(path)
+        version = uuid.uuid4().hex[:12]
+        files = {'embeddings': f"embeddings-{version}.npy", 'ids': f"ids-{version}.npy"}
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'model': model,
+            'dim': int(embeddings.shape[1]),
+            'count': int(len(ids)),
+            'dtype': 'float32',
+            'kb_hash': kb,
+            'files': files,
+            'created_at': datetime.now().isoformat()
+        }
+
+        for name, array in ((files['embeddings'], embeddings), (files['ids'], ids)):
+            tmp_path = os.path.join(path, name + ".tmp")
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(tmp_path, os.path.join(path, name))
+
+        tmp_path = os.path.join(path, MANIFEST_FILE + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+        # Удаляются файлы старше предыдущего сохранения, предыдущие остаются
+        keep = set(files.values()) | set(previous)
+        for name in os.listdir(path):
+            if name.endswith(".npy") and name.startswith(("embeddings", "ids")) and name not in keep:
+                os.remove(os.path.join(path, name))
+
+        logger.info(f"💾 Индекс эмбеддингов сохранен: {path} ({len(ids)}x{manifest['dim']})")
+        return manifest
+
+    @staticmethod
+    def _data_files(path: str, manifest: Optional[Dict[str, Any]] = None) -> Tuple[str, ...]:
+        """Имена файлов матрицы и номеров из манифеста (по умолчанию - текущего в path)"""
+        if manifest is None:
+            try:
+                with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                return ()
+        files = manifest.get('files') or {}
+        names = (files.get('embeddings', EMBEDDINGS_FILE), files.get('ids', IDS_FILE))
+        if any(os.path.basename(name) != name for name in names):
+            raise IndexFormatError(f"недопустимые имена файлов в манифесте: {names}")
+        return names
+
+    @classmethod
+    def load(cls, path: str, model: Optional[str] = None, kb: Optional[str] = None) -> 'EmbeddingStore':
+        """
+        Открывает индекс только для чтения. IndexFormatError, если версия
+        формата, модель, хэш базы знаний или размеры не совпадают с ожидаемыми.
+        FileNotFoundError, если индекса нет.
+        """
+        with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if manifest.get('format_version') != FORMAT_VERSION:
+            raise IndexFormatError(f"версия формата {manifest.get('format_version')}, ожидается {FORMAT_VERSION}")
+        if model is not None and manifest.get('model') != model:
+            raise IndexFormatError(f"индекс построен моделью {manifest.get('model')}, а не {model}")
+        if kb is not None and manifest.get('kb_hash') != kb:
+            raise IndexFormatError("база знаний изменилась после построения индекса")
+
+        embeddings_file, ids_file = cls._data_files(path, manifest)
+        embeddings = np.load(os.path.join(path, embeddings_file), mmap_mode='r', allow_pickle=False)
+        ids = np.load(os.path.join(path, ids_file), allow_pickle=False)
+
+        expected = (manifest['count'], manifest['dim'])
+        if embeddings.dtype != np.float32 or embeddings.shape != expected or len(ids) != manifest['count']:
+            raise IndexFormatError(
+                f"размеры не совпадают с манифестом: {embeddings.dtype} {embeddings.shape}, "
+                f"номеров {len(ids)}, ожидается {expected}"
+            )
+        return cls(embeddings, ids, manifest)
+
+
+__all__ = ['EmbeddingStore', 'IndexFormatError', 'kb_hash', 'normalize_rows', 'FORMAT_VERSION']
@@ -9,6 +9,9 @@ import logging
 from typing import Dict, List, Any, Optional, Tuple
 from collections import defaultdict
 
+import text_normalizer
+from language_detector import LanguageDetector
+
 logger = logging.getLogger(__name__)
 
 class EnhancedMorphologicalAnalyzer:
@@ -17,6 +20,7 @@ class EnhancedMorphologicalAnalyzer:
     def __init__(self):
         self.rules = self._load_morphological_rules()
         self.stop_words = self._load_stop_words()
+        self.language_detector = LanguageDetector()
         self.synonyms = self._load_synonyms()
         self.patterns = self._load_patterns()
         
@@ -175,23 +179,8 @@ class EnhancedMorphologicalAnalyzer:
     
     def normalize_text(self, text: str, language: str = 'ru') -> str:
         """Нормализует текст для анализа"""
-        if not text:
-            return ""
-        
-        # Приводим к нижнему регистру
-        text = text.lower().strip()
-        
-        # Убираем пунктуацию, оставляем только буквы и пробелы
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # Убираем лишние пробелы
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Убираем стоп-слова
-        words = text.split()
-        filtered_words = [word for word in words if word not in self.stop_words.get(language, set())]
-        
-        return ' '.join(filtered_words)
+        # Нижний регистр, пунктуация -> пробел, без стоп-слов
+        return text_normalizer.normalize_text(text, self.stop_words.get(language, set()))
     
     def get_word_stem(self, word: str, language: str = 'ru') -> str:
         """Получает основу слова"""
@@ -297,14 +286,8 @@ class EnhancedMorphologicalAnalyzer:
         if not text:
             return 'ru'
         
-        # Простая эвристика по алфавиту
-        kz_chars = set('әғқңөұүіһ')
-        text_chars = set(text.lower())
-        
-        if kz_chars.intersection(text_chars):
-            return 'kz'
-        
-        return 'ru'
+        # Казахские буквы -> kz, иначе ru (общий детектор с кэшем)
+        return 'kz' if self.language_detector.detect(text) == 'kk' else 'ru'
     
     def analyze_intent(self, query: str) -> Dict[str, Any]:
         """Анализирует намерение запроса"""
@@ -0,0 +1,119 @@
+"""
+Предкомпилированный инвертированный индекс для трехуровневого поиска FAQ.
+
+Строится один раз при загрузке базы знаний: токенизирует варианты вопросов,
+ключевые слова и ответы, вычисляет корни слов и хранит posting-листы
+токен -> номера FAQ. На запрос оцениваются только кандидаты, у которых
+есть общий токен, корень или префикс корня с запросом.
+"""
+
+import re
+import logging
+from typing import Dict, List, Any, Callable, Set, FrozenSet, Optional
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+
+# Длина префикса корня для posting-листов: частичное совпадение корней
+# в calculate_word_similarity требует минимум 4 общих начальных символа
+ROOT_PREFIX_LEN = 4
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на слова длиннее двух символов (как в search_with_three_filters)"""
+    words = _NON_WORD_RE.sub(' ', text.lower()).split()
+    return [word for word in words if len(word) > 2]
+
+
+class FAQIndex:
+    """Индекс FAQ с posting-листами, корнями и предразбитыми ответами"""
+
+    def __init__(self, faq_items: List[Dict[str, Any]], root_fn: Callable[[str], str]):
+        self.items = faq_items
+        self.root_fn = root_fn
+
+        # Предобработанные поля каждого FAQ (по позиции в self.items)
+        self.variations: List[List[str]] = []
+        self.keywords: List[List[str]] = []
+        self.keyword_roots: List[List[str]] = []
+        self.answers: List[str] = []
+        self.answer_words: List[List[str]] = []
+        self.answer_word_sets: List[FrozenSet[str]] = []
+
+        # Инвертированный индекс: термин (токен / корень / префикс корня) -> номера FAQ
+        self.postings: Dict[str, List[int]] = {}
+
+        # Корни всех слов и ключевых фраз базы знаний (слово -> корень)
+        self.roots: Dict[str, str] = {}
+
+        # Позиция FAQ по идентичности объекта (для ссылок на FAQ из кэшей)
+        self._positions: Dict[int, int] = {id(item): idx for idx, item in enumerate(self.items)}
+
+        self._build()
+
+    def root_of(self, word: str) -> str:
+        """Корень слова из словаря базы знаний или вычисленный root_fn"""
+        root = self.roots.get(word)
+        if root is None:
+            root = self.root_fn(word)
+        return root
+
+    def _terms(self, word: str) -> Set[str]:
+        """Возвращает индексируемые термины слова: само слово, корень и префикс корня"""
+        root = self.root_of(word)
+        terms = {word, root}
+        if len(root) >= ROOT_PREFIX_LEN:
+            terms.add(root[:ROOT_PREFIX_LEN])
+        return terms
+
+    def _build(self):
+        """Строит индекс по всем FAQ"""
+        postings = defaultdict(set)
+
+        for idx, item in enumerate(self.items):
+            variations = [v.lower() for v in item.get("question_variations", [])]
+            keywords = [k.lower().strip() for k in item.get("keywords", [])]
+            answer = item.get("answer", "").lower()
+            answer_words = tokenize(answer)
+
+            self.variations.append(variations)
+            self.keywords.append(keywords)
+            for keyword in keywords:
+                if keyword not in self.roots:
+                    self.roots[keyword] = self.root_fn(keyword)
+            self.keyword_roots.append([self.roots[k] for k in keywords])
+            self.answers.append(answer)
+            self.answer_words.append(answer_words)
+            self.answer_word_sets.append(frozenset(answer_words))
+
+            words = set(answer_words)
+            for variation in variations:
+                words.update(tokenize(variation))
+            for keyword in keywords:
+                words.update(tokenize(keyword))
+
+            for word in words:
+                if word not in self.roots:
+                    self.roots[word] = self.root_fn(word)
+                for term in self._terms(word):
+                    postings[term].add(idx)
+
+        self.postings = {term: sorted(ids) for term, ids in postings.items()}
+        logger.info(f"✅ FAQ индекс построен: {len(self.items)} FAQ, {len(self.postings)} терминов")
+
+    def candidates(self, query_words: List[str]) -> List[int]:
+        """Возвращает номера FAQ, имеющих общий токен, корень или префикс корня с запросом"""
+        found = set()
+        for word in query_words:
+            for term in self._terms(word.lower()):
+                found.update(self.postings.get(term, ()))
+        return sorted(found)
+
+    def position(self, item: Dict[str, Any]) -> Optional[int]:
+        """Номер FAQ в базе знаний или None, если объект не из этого индекса"""
+        return self._positions.get(id(item))
+
+    def __len__(self) -> int:
+        return len(self.items)
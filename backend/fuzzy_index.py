@@ -0,0 +1,158 @@
+"""
+Индекс для fuzzy поиска по вопросам и вариациям базы знаний.
+
+process.extract с fuzz.ratio сравнивает запрос с каждой вариацией каждого
+пункта, то есть время растет линейно с числом вариаций. Здесь при загрузке
+базы строятся posting-листы символьных триграмм: на запрос отбираются
+строки с наибольшей долей общих триграмм (коэффициент Дайса), и точный
+ratio считается только для этого короткого списка.
+
+Оценка отдельной строки совпадает с fuzz.ratio: обе строки проходят
+full_process (не буквенно-цифровые символы -> пробел, нижний регистр,
+strip), ratio - SequenceMatcher в процентах. Если fuzzywuzzy не
+установлен, используются эквивалентные реализации на чистом Python (difflib).
+
+Ранжирование совпадает с полным перебором (process.extract) только для
+небольших баз: пока строк не больше max_candidates * EXHAUSTIVE_FACTOR,
+оцениваются все строки. В больших базах поиск приближенный - оцениваются
+max_candidates строк с наибольшим коэффициентом Дайса, а строки без общих
+триграмм с запросом не оцениваются вовсе, поэтому пункт с высоким ratio,
+но малой долей общих триграмм, может не попасть в результат.
+"""
+
+import os
+import re
+import heapq
+import logging
+from difflib import SequenceMatcher
+from typing import Dict, Any, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from fuzzywuzzy import fuzz, utils as fuzz_utils
+    FUZZY_AVAILABLE = True
+except ImportError:
+    FUZZY_AVAILABLE = False
+
+# Сколько строк с наибольшим числом общих триграмм оценивается точно
+DEFAULT_MAX_CANDIDATES = int(os.environ.get("FUZZY_MAX_CANDIDATES", 64))
+
+# До max_candidates * EXHAUSTIVE_FACTOR строк оцениваются все строки (точный результат)
+EXHAUSTIVE_FACTOR = 4
+
+_NON_ALNUM_RE = re.compile(r'(?ui)\W')
+
+
+def full_process(text: str) -> str:
+    """Предобработка строки как utils.full_process в fuzzywuzzy"""
+    if FUZZY_AVAILABLE:
+        return fuzz_utils.full_process(text)
+    return _NON_ALNUM_RE.sub(' ', text).lower().strip()
+
+
+def ratio(s1: str, s2: str) -> int:
+    """Схожесть 0-100 как fuzz.ratio (строки уже обработаны full_process)"""
+    if FUZZY_AVAILABLE:
+        return fuzz.ratio(s1, s2)
+    if not s1 or not s2:
+        return 0
+    return int(round(100 * SequenceMatcher(None, s1, s2).ratio()))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Символьные триграммы строки с границами слов (пробелы по краям)"""
+    if not text:
+        return set()
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """Триграммный индекс строк (вопросы и вариации) с номерами пунктов базы"""
+
+    def __init__(self, texts: Sequence[str], item_ids: Sequence[int],
+                 max_candidates: int = DEFAULT_MAX_CANDIDATES, exhaustive_limit: Optional[int] = None):
+        if len(texts) != len(item_ids):
+            raise ValueError(f"Число строк ({len(texts)}) и номеров ({len(item_ids)}) не совпадает")
+        self.max_candidates = max(1, max_candidates)
+        self.exhaustive_limit = (self.max_candidates * EXHAUSTIVE_FACTOR
+                                 if exhaustive_limit is None else exhaustive_limit)
+        self.texts: List[str] = [full_process(text) for text in texts]
+        self.item_ids: List[int] = list(item_ids)
+        self.gram_counts: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+
+        for row, text in enumerate(self.texts):
+            grams = trigrams(text)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(row)
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base: List[Dict[str, Any]], **kwargs) -> 'FuzzyIndex':
+        """Индекс по вопросу и вариациям каждого пункта базы знаний"""
+        texts, item_ids = [], []
+        for idx, item in enumerate(knowledge_base):
+            for text in [item['question'], *item.get('variations', [])]:
+                texts.append(text)
+                item_ids.append(idx)
+        index = cls(texts, item_ids, **kwargs)
+        logger.info(f"✅ Fuzzy индекс построен: {len(texts)} строк, {len(index.postings)} триграмм")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def exhaustive(self) -> bool:
+        """True, если оцениваются все строки (результат равен полному перебору)"""
+        return len(self.texts) <= self.exhaustive_limit
+
+    def candidates(self, query_grams: Set[str]) -> List[int]:
+        """Строки с наибольшим коэффициентом Дайса по триграммам"""
+        shared: Dict[int, int] = {}
+        for gram in query_grams:
+            for row in self.postings.get(gram, ()):
+                shared[row] = shared.get(row, 0) + 1
+
+        query_size = len(query_grams)
+        gram_counts = self.gram_counts
+        return heapq.nlargest(
+            self.max_candidates, shared,
+            key=lambda row: shared[row] / (query_size + gram_counts[row])
+        )
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Top-k пунктов базы: (номер пункта, ratio / 100), лучшая строка
+        каждого пункта. В небольшой базе оцениваются все строки; в большой -
+        только шортлист по триграммам (приближенно, см. описание модуля).
+        """
+        processed = full_process(query)
+        if not processed:
+            return []
+
+        rows = range(len(self.texts)) if self.exhaustive else sorted(self.candidates(trigrams(processed)))
+        best: Dict[int, int] = {}
+        for row in rows:
+            score = ratio(processed, self.texts[row])
+            item_id = self.item_ids[row]
+            if score > best.get(item_id, -1):
+                best[item_id] = score
+
+        ranked = sorted(best.items(), key=lambda pair: -pair[1])[:top_k]
+        return [(item_id, score / 100.0) for item_id, score in ranked]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'texts': len(self.texts),
+            'trigrams': len(self.postings),
+            'max_candidates': self.max_candidates,
+            'exhaustive': self.exhaustive,
+            'fuzzywuzzy': FUZZY_AVAILABLE
+        }
+
+
+__all__ = ['FuzzyIndex', 'full_process', 'ratio', 'trigrams', 'FUZZY_AVAILABLE', 'DEFAULT_MAX_CANDIDATES',
+           'EXHAUSTIVE_FACTOR']
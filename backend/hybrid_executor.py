@@ -0,0 +1,131 @@
+"""
+Параллельное выполнение веток гибридного поиска.
+
+hybrid_search_advanced вызывал поиск по эмбеддингам, ключевым словам и
+fuzzy по очереди, так что задержка была суммой веток. Здесь ветки
+запускаются одновременно в пуле потоков (numpy и encode отпускают GIL), а
+у каждой ветки есть дедлайн от начала поиска: ветка, не уложившаяся в
+него, дает пустой результат, и объединяются те результаты, что успели.
+Задержка поиска ограничена максимальным дедлайном, а не суммой веток.
+
+Опоздавшая ветка не прерывается: future.cancel() не останавливает уже
+запущенную функцию, поэтому ветка выполняется до конца и занимает поток
+пула. Чтобы опоздавшие ветки не задерживали в очереди ветки следующих
+запросов (их дедлайн идет с начала поиска), пул рассчитан на
+HYBRID_SEARCH_CONCURRENCY одновременных поисков по потоку на каждую ветку.
+
+Время каждой ветки (в том числе опоздавшей) записывается в статистику,
+число еще выполняющихся опоздавших веток - в late_running ветки.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сколько поисков одновременно получают свободный поток на каждую ветку
+DEFAULT_CONCURRENCY = int(os.environ.get("HYBRID_SEARCH_CONCURRENCY", 8))
+
+# Дедлайны веток в секундах от начала поиска. Лексические ветки быстрые,
+# их дедлайн - защита от зависания; эмбеддинги ограничены бюджетом
+DEFAULT_DEADLINES = {
+    'embeddings': float(os.environ.get("HYBRID_DEADLINE_EMBEDDINGS_MS", 300)) / 1000.0,
+    'keywords': float(os.environ.get("HYBRID_DEADLINE_KEYWORDS_MS", 1000)) / 1000.0,
+    'fuzzy': float(os.environ.get("HYBRID_DEADLINE_FUZZY_MS", 1000)) / 1000.0,
+}
+
+# Сколько последних замеров ветки хранится для перцентилей
+TIMINGS_WINDOW = 1000
+
+
+class HybridSearchExecutor:
+    """Пул потоков для веток гибридного поиска с дедлайнами и замерами времени"""
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY,
+                 deadlines: Optional[Dict[str, float]] = None):
+        self.deadlines = dict(DEFAULT_DEADLINES if deadlines is None else deadlines)
+        # Одновременные поиски x ветки: опоздавшие ветки не занимают потоки чужих запросов
+        self.max_workers = max(1, concurrency * max(1, len(self.deadlines)))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hybrid-search")
+        self._lock = threading.Lock()
+        self._timings: Dict[str, deque] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _branch_counters(self, name: str) -> Dict[str, int]:
+        counters = self._counters.get(name)
+        if counters is None:
+            counters = self._counters[name] = {'calls': 0, 'timeouts': 0, 'errors': 0, 'late_running': 0}
+            self._timings[name] = deque(maxlen=TIMINGS_WINDOW)
+        return counters
+
+    def _timed(self, name: str, fn: Callable[[], List]) -> List:
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._branch_counters(name)['calls'] += 1
+                self._timings[name].append(elapsed)
+
+    def run(self, branches: Dict[str, Callable[[], List]]) -> Dict[str, List]:
+        """
+        Выполняет ветки параллельно. Возвращает результат каждой ветки;
+        для опоздавшей или упавшей ветки - пустой список.
+        """
+        start = time.monotonic()
+        futures = {name: self._pool.submit(self._timed, name, fn) for name, fn in branches.items()}
+
+        results: Dict[str, List] = {}
+        for name, future in futures.items():
+            deadline = self.deadlines.get(name)
+            timeout = None if deadline is None else max(0.0, start + deadline - time.monotonic())
+            try:
+                results[name] = future.result(timeout)
+            except FutureTimeout:
+                # Запущенную ветку не отменить - она дорабатывает в своем потоке
+                results[name] = []
+                with self._lock:
+                    counters = self._branch_counters(name)
+                    counters['timeouts'] += 1
+                    counters['late_running'] += 1
+                future.add_done_callback(lambda done, name=name: self._late_done(name))
+                logger.warning(f"⚠️ Ветка поиска {name} не уложилась в {deadline * 1000:.0f}мс")
+            except Exception as e:
+                results[name] = []
+                with self._lock:
+                    self._branch_counters(name)['errors'] += 1
+                logger.warning(f"⚠️ Ошибка ветки поиска {name}: {e}")
+        return results
+
+    def _late_done(self, name: str):
+        with self._lock:
+            self._counters[name]['late_running'] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Замеры по веткам: число вызовов, среднее, p50/p99, максимум (мс), таймауты и ошибки"""
+        with self._lock:
+            stats = {}
+            for name, counters in self._counters.items():
+                timings = sorted(self._timings[name])
+                branch = {**counters, 'deadline_ms': (self.deadlines.get(name) or 0) * 1000}
+                if timings:
+                    branch.update({
+                        'avg_ms': sum(timings) / len(timings) * 1000,
+                        'p50_ms': timings[len(timings) // 2] * 1000,
+                        'p99_ms': timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+                        'max_ms': timings[-1] * 1000
+                    })
+                stats[name] = branch
+            return stats
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+__all__ = ['HybridSearchExecutor', 'DEFAULT_DEADLINES', 'DEFAULT_CONCURRENCY']
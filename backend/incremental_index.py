@@ -0,0 +1,188 @@
+"""
+Индекс эмбеддингов с инкрементальными изменениями.
+
+FAISS индекс ProfessionalFAQAssistant строился один раз: записи,
+добавленные через expand_knowledge_base, в него не попадали, а полная
+перестройка заново кодировала все вопросы и вариации. Здесь индекс -
+матрица float32 (строки нормализованы) с номером пункта базы для каждой
+строки:
+
+- add - новые вариации кодируются отдельно и дописываются в конец
+  (емкость матрицы растет удвоением);
+- delete_item - строки пункта помечаются удаленными (tombstone) и сразу
+  исключаются из поиска;
+- update_item - удаление старых строк пункта и добавление новых;
+- compact - удаленные строки физически вычищаются; запускается в фоновом
+  потоке, когда их доля превышает compaction_ratio.
+
+Поиск читает согласованный снимок массивов, изменения не блокируют его
+дольше копирования ссылок. Результат - лучшая строка каждого пункта
+(max-pooling), как EmbeddingStore.search_items.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_store import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPACTION_RATIO = float(os.environ.get("INDEX_COMPACTION_RATIO", 0.25))
+INITIAL_CAPACITY = 64
+
+
+class IncrementalEmbeddingIndex:
+    """Матрица эмбеддингов с добавлением, tombstone удалением и фоновым сжатием"""
+
+    def __init__(self, dim: int, compaction_ratio: float = DEFAULT_COMPACTION_RATIO):
+        self.dim = dim
+        self.compaction_ratio = compaction_ratio
+        self._vectors = np.zeros((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self._ids = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._count = 0
+        self._tombstones = 0
+        self._item_rows: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self.compactions = 0
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, item_ids: Sequence[int], **kwargs) -> 'IncrementalEmbeddingIndex':
+        """Индекс из готовой матрицы (строка i принадлежит пункту item_ids[i])"""
+        vectors = normalize_rows(vectors)
+        index = cls(vectors.shape[1], **kwargs)
+        with index._lock:
+            index._append(vectors, np.asarray(item_ids, dtype=np.int32))
+        return index
+
+    def __len__(self) -> int:
+        """Число живых строк"""
+        return self._count - self._tombstones
+
+    def _append(self, vectors: np.ndarray, ids: np.ndarray):
+        """Дописывает строки (вызывается под блокировкой)"""
+        needed = self._count + len(vectors)
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            # Новые массивы: снимки, уже взятые поиском, остаются согласованными
+            self._vectors = np.concatenate([self._vectors[:self._count],
+                                            np.zeros((capacity - self._count, self.dim), dtype=np.float32)])
+            self._ids = np.concatenate([self._ids[:self._count], np.zeros(capacity - self._count, dtype=np.int32)])
+            self._alive = np.concatenate([self._alive[:self._count], np.zeros(capacity - self._count, dtype=bool)])
+
+        rows = range(self._count, needed)
+        self._vectors[self._count:needed] = vectors
+        self._ids[self._count:needed] = ids
+        self._alive[self._count:needed] = True
+        for row, item_id in zip(rows, ids):
+            self._item_rows.setdefault(int(item_id), []).append(row)
+        self._count = needed
+
+    def _tombstone(self, item_id: int) -> int:
+        """Помечает строки пункта удаленными (вызывается под блокировкой)"""
+        rows = self._item_rows.pop(item_id, [])
+        if rows:
+            self._alive[rows] = False
+            self._tombstones += len(rows)
+        return len(rows)
+
+    def add(self, item_id: int, vectors: np.ndarray) -> int:
+        """Добавляет строки пункта (эмбеддинги его новых вопросов/вариаций)"""
+        vectors = normalize_rows(vectors)
+        with self._lock:
+            self._append(vectors, np.full(len(vectors), item_id, dtype=np.int32))
+        return len(vectors)
+
+    def delete_item(self, item_id: int) -> int:
+        """Исключает пункт из поиска; возвращает число удаленных строк"""
+        with self._lock:
+            removed = self._tombstone(item_id)
+        self._maybe_compact()
+        return removed
+
+    def update_item(self, item_id: int, vectors: np.ndarray) -> int:
+        """Заменяет строки пункта новыми (атомарно для поиска)"""
+        vectors = normalize_rows(vectors)
+        with self._lock:
+            self._tombstone(item_id)
+            self._append(vectors, np.full(len(vectors), item_id, dtype=np.int32))
+        self._maybe_compact()
+        return len(vectors)
+
+    def item_rows(self, item_id: int) -> int:
+        """Число живых строк пункта"""
+        return len(self._item_rows.get(item_id, ()))
+
+    def _snapshot(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        with self._lock:
+            count = self._count
+            return self._vectors[:count], self._ids[:count], self._alive[:count].copy()
+
+    def search_items(self, query_embedding: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """Top-k пунктов по косинусной близости: лучшая живая строка каждого пункта"""
+        vectors, ids, alive = self._snapshot()
+        if not alive.any() or top_k <= 0:
+            return []
+
+        scores = vectors @ normalize_rows(query_embedding)[0]
+        scores[~alive] = -np.inf
+        pooled = np.full(int(ids.max()) + 1, -np.inf, dtype=np.float32)
+        np.maximum.at(pooled, ids, scores)
+
+        top_k = min(top_k, len(pooled))
+        top = np.argpartition(-pooled, top_k - 1)[:top_k]
+        top = top[np.argsort(-pooled[top], kind='stable')]
+        return [(int(item_id), float(pooled[item_id])) for item_id in top if np.isfinite(pooled[item_id])]
+
+    def compact(self) -> int:
+        """Вычищает удаленные строки; возвращает их число"""
+        with self._lock:
+            if not self._tombstones:
+                return 0
+            alive = self._alive[:self._count]
+            vectors = self._vectors[:self._count][alive]
+            ids = self._ids[:self._count][alive]
+            removed = self._tombstones
+
+            capacity = max(INITIAL_CAPACITY, len(ids))
+            self._vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            self._ids = np.zeros(capacity, dtype=np.int32)
+            self._alive = np.zeros(capacity, dtype=bool)
+            self._count = 0
+            self._tombstones = 0
+            self._item_rows = {}
+            self._append(vectors, ids)
+            self.compactions += 1
+        logger.info(f"🧹 Индекс эмбеддингов сжат: удалено {removed} строк, осталось {len(ids)}")
+        return removed
+
+    def _maybe_compact(self):
+        """Запускает сжатие в фоне, если доля удаленных строк велика"""
+        if not self._count or self._tombstones / self._count < self.compaction_ratio:
+            return
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self.compact, name="index-compaction", daemon=True)
+        self._compaction.start()
+
+    def wait_compaction(self, timeout: Optional[float] = None):
+        if self._compaction is not None:
+            self._compaction.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rows': self._count,
+            'alive': len(self),
+            'tombstones': self._tombstones,
+            'items': len(self._item_rows),
+            'capacity': len(self._vectors),
+            'compactions': self.compactions
+        }
+
+
+__all__ = ['IncrementalEmbeddingIndex', 'DEFAULT_COMPACTION_RATIO']
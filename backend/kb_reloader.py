@@ -0,0 +1,143 @@
+"""
+Горячая перезагрузка базы знаний без перезапуска процесса.
+
+Раньше kb.json / BZ.txt читались один раз при старте, и любая правка базы
+требовала редеплоя (холодный старт, потерянные кэши). KBReloader следит
+за файлами (опрос mtime/размера через KBFileVersion) и при изменении
+строит все производные структуры (токены, корни, posting-листы, матрицы
+скоринга) в фоновом потоке, вне пути запроса.
+
+Готовый снимок публикуется одной заменой ссылки: запрос один раз берет
+kb_reloader.snapshot и до конца работает с ним, поэтому запросы, начатые
+до перезагрузки, завершаются на старом снимке. Если файл не читается
+(например, записан наполовину), старый снимок остается, а перезагрузка
+повторяется на следующем опросе.
+
+Для QueryCache KBReloader служит источником версии (current() и
+fingerprint): кэш сбрасывается ровно в момент публикации нового снимка.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from query_cache import KBFileVersion
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RELOAD_INTERVAL = float(os.environ.get("KB_RELOAD_INTERVAL", 2.0))
+
+
+class KBSnapshot(NamedTuple):
+    """Неизменяемый снимок базы знаний и производных структур"""
+    version: int
+    fingerprint: str
+    value: Any
+    loaded_at: float
+
+
+class KBReloader:
+    """Опрос файлов базы знаний, фоновая сборка и атомарная публикация снимка"""
+
+    def __init__(self, paths: List[str], build: Callable[[], Any], initial: Any = None,
+                 interval: float = DEFAULT_RELOAD_INTERVAL):
+        self.build = build
+        self.interval = interval
+        self._files = KBFileVersion(paths, check_interval=0)
+        self._seen_version = self._files.version
+        self._retry = False
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+        value = build() if initial is None else initial
+        self._snapshot = KBSnapshot(1, self._files.fingerprint, value, time.time())
+
+    @property
+    def paths(self) -> List[str]:
+        return self._files.paths
+
+    @property
+    def snapshot(self) -> KBSnapshot:
+        """Текущий снимок (запрос берет его один раз и работает с ним до конца)"""
+        return self._snapshot
+
+    def current(self) -> int:
+        """Номер версии опубликованного снимка (интерфейс KBFileVersion для QueryCache)"""
+        return self._snapshot.version
+
+    @property
+    def fingerprint(self) -> str:
+        """Хэш содержимого файлов опубликованного снимка"""
+        return self._snapshot.fingerprint
+
+    def reload(self) -> bool:
+        """Собирает новый снимок и публикует его; при ошибке старый снимок остается"""
+        with self._reload_lock:
+            self._seen_version = self._files.current()
+            fingerprint = self._files.fingerprint
+            start = time.monotonic()
+            try:
+                value = self.build()
+            except Exception as e:
+                # Повторяем на следующем опросе, даже если файлы больше не меняются
+                self._retry = True
+                self.failures += 1
+                self.last_error = str(e)
+                logger.warning(f"⚠️ Не удалось перезагрузить базу знаний, остается версия {self._snapshot.version}: {e}")
+                return False
+
+            # Одна замена ссылки: новые запросы видят новый снимок, начатые - старый
+            self._snapshot = KBSnapshot(self._snapshot.version + 1, fingerprint, value, time.time())
+            self.reloads += 1
+            self._retry = False
+            self.last_error = None
+            logger.info(f"🔄 База знаний перезагружена: версия {self._snapshot.version} "
+                        f"за {time.monotonic() - start:.2f}с")
+            return True
+
+    def check(self) -> bool:
+        """Перезагружает базу, если файлы изменились (или прошлая попытка не удалась)"""
+        if self._files.current() == self._seen_version and not self._retry:
+            return False
+        return self.reload()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка проверки базы знаний: {e}")
+
+    def start(self) -> 'KBReloader':
+        """Запускает фоновый опрос файлов (повторный вызов ничего не делает)"""
+        if self.interval > 0 and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="kb-reloader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version,
+            'fingerprint': snapshot.fingerprint,
+            'loaded_at': snapshot.loaded_at,
+            'paths': self.paths,
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'watching': self._thread is not None and self._thread.is_alive()
+        }
+
+
+__all__ = ['KBReloader', 'KBSnapshot', 'DEFAULT_RELOAD_INTERVAL']
@@ -0,0 +1,140 @@
+"""
+Автомат Ахо-Корасик для поиска множества ключевых слов за один проход.
+
+classify_intent и морфологический поиск проверяли каждое ключевое слово
+отдельным `keyword in text` - полный проход по тексту на каждое слово.
+KeywordAutomaton строится один раз из именованных групп ключевых слов
+(интент -> список слов) и за один проход по тексту находит все слова,
+входящие в него подстрокой; время не зависит от числа слов.
+
+Если установлен pyahocorasick, проход выполняется на C. Иначе - детерминированный
+автомат на Python (переходы с учетом суффиксных ссылок вычислены заранее,
+один поиск в словаре на символ).
+
+Семантика совпадает с `keyword in text`: слово считается один раз, сколько
+бы раз оно ни встречалось; повтор слова в списке группы дает повтор в
+счете (как sum(1 for keyword in keywords if keyword in text)).
+"""
+
+from collections import deque
+from typing import Any, Dict, List, Sequence, Set
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class KeywordAutomaton:
+    """Ахо-Корасик по группам ключевых слов с подсчетом совпадений по группам"""
+
+    def __init__(self, groups: Dict[str, Sequence[str]]):
+        self.groups = {name: list(keywords) for name, keywords in groups.items()}
+        self.patterns: List[str] = []
+        pattern_ids: Dict[str, int] = {}
+        for keywords in self.groups.values():
+            for keyword in keywords:
+                if keyword not in pattern_ids:
+                    pattern_ids[keyword] = len(self.patterns)
+                    self.patterns.append(keyword)
+        self._group_ids = {name: [pattern_ids[keyword] for keyword in keywords]
+                           for name, keywords in self.groups.items()}
+        # Группы каждого слова (с повторами), чтобы счет шел по найденным словам
+        self._pattern_groups: List[List[str]] = [[] for _ in self.patterns]
+        for name, ids in self._group_ids.items():
+            for pattern_id in ids:
+                self._pattern_groups[pattern_id].append(name)
+
+        # Пустое слово входит в любой текст, как '' in text
+        self._always = {pattern_id for pattern_id, pattern in enumerate(self.patterns) if not pattern}
+        self._has_words = len(self._always) < len(self.patterns)
+
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self._has_words:
+            self._automaton = ahocorasick.Automaton()
+            for pattern_id, pattern in enumerate(self.patterns):
+                if pattern:
+                    self._automaton.add_word(pattern, pattern_id)
+            self._automaton.make_automaton()
+        else:
+            self._build_dfa()
+
+    def _build_dfa(self):
+        """Бор, суффиксные ссылки и полная таблица переходов"""
+        goto: List[Dict[str, int]] = [{}]
+        fail: List[int] = [0]
+        out: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                state = next_state
+            out[state].append(pattern_id)
+
+        # Обход в ширину: переходы состояния = переходы его суффиксной ссылки
+        # плюс собственные; символ вне таблицы ведет в корень
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            out[state] = out[state] + out[fail[state]]
+            for ch, next_state in goto[state].items():
+                fail[next_state] = delta[fail[state]].get(ch, 0)
+                queue.append(next_state)
+
+        self._delta = delta
+        self._out = [tuple(ids) for ids in out]
+
+    def find_ids(self, text: str) -> Set[int]:
+        """Номера слов, входящих в текст (один проход)"""
+        found = set(self._always)
+        if not self._has_words:
+            return found
+        if self._automaton is not None:
+            found.update(pattern_id for _, pattern_id in self._automaton.iter(text))
+            return found
+
+        delta, out = self._delta, self._out
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def find(self, text: str) -> Set[str]:
+        """Слова, входящие в текст"""
+        return {self.patterns[pattern_id] for pattern_id in self.find_ids(text)}
+
+    def counts(self, text: str) -> Dict[str, int]:
+        """Число совпавших слов каждой группы (с учетом повторов в списке группы)"""
+        counts = dict.fromkeys(self.groups, 0)
+        for pattern_id in self.find_ids(text):
+            for name in self._pattern_groups[pattern_id]:
+                counts[name] += 1
+        return counts
+
+    def matched_groups(self, text: str) -> List[str]:
+        """Группы, в которых совпало хотя бы одно слово, в порядке объявления"""
+        counts = self.counts(text)
+        return [name for name in self.groups if counts[name]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'groups': len(self.groups),
+            'patterns': len(self.patterns),
+            'backend': 'pyahocorasick' if self._automaton is not None else 'python'
+        }
+
+
+__all__ = ['KeywordAutomaton', 'AHOCORASICK_AVAILABLE']
@@ -0,0 +1,122 @@
+"""
+Векторизованный скоринг ключевых слов (Filter 2) для всех FAQ сразу.
+
+При загрузке базы знаний строится словарь уникальных ключевых слов с
+приоритетами и разреженная связь FAQ -> ключевые слова. На запрос
+считается матрица схожести слова запроса x словарь (строки кэшируются
+по слову запроса), затем одним проходом NumPy применяются пороги схожести
+и взвешенная сумма по каждому FAQ. Результат совпадает с search_keywords.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Пороги схожести и множители приоритета (как в search_keywords)
+SIMILARITY_TIERS = [
+    (1.0, 1.0),    # Точное совпадение
+    (0.9, 0.9),    # Совпадение корней
+    (0.8, 0.8),    # Частичное совпадение корней
+    (0.7, 0.7),    # Хорошая схожесть
+    (0.6, 0.5),    # Умеренная схожесть
+    (0.5, 0.3),    # Слабая схожесть
+    (0.4, 0.1),    # Минимальная схожесть
+]
+
+# Максимум баллов за одно ключевое слово
+MAX_KEYWORD_POINTS = 20
+
+
+class KeywordMatrixScorer:
+    """Матричный скоринг ключевых слов по всем FAQ"""
+
+    def __init__(self, keywords: List[List[str]], keyword_roots: List[List[str]],
+                 priorities: Dict[str, float], word_similarity: Callable[[str, str], float],
+                 root_fn: Callable[[str], str], default_priority: float = 5,
+                 cache_size: int = 4096):
+        self.word_similarity = word_similarity
+        self.root_fn = root_fn
+        self.items_count = len(keywords)
+
+        # Словарь уникальных ключевых слов
+        self.vocabulary: List[str] = []
+        self.vocabulary_roots: List[str] = []
+        vocabulary_ids: Dict[str, int] = {}
+
+        # Разреженная связь: для каждого вхождения ключевого слова - номер FAQ и номер в словаре
+        entry_items = []
+        entry_terms = []
+        for item_idx, (item_keywords, item_roots) in enumerate(zip(keywords, keyword_roots)):
+            for keyword, root in zip(item_keywords, item_roots):
+                term_id = vocabulary_ids.get(keyword)
+                if term_id is None:
+                    term_id = len(self.vocabulary)
+                    vocabulary_ids[keyword] = term_id
+                    self.vocabulary.append(keyword)
+                    self.vocabulary_roots.append(root)
+                entry_items.append(item_idx)
+                entry_terms.append(term_id)
+
+        self.vocabulary_ids = vocabulary_ids
+        self.entry_items = np.array(entry_items, dtype=np.intp)
+        self.entry_terms = np.array(entry_terms, dtype=np.intp)
+        self.priorities = np.array([priorities.get(k, default_priority) for k in self.vocabulary],
+                                   dtype=np.float64)
+        self.max_possible = np.array([len(k) * MAX_KEYWORD_POINTS for k in keywords], dtype=np.float64)
+
+        self.tier_thresholds = np.array([t for t, _ in SIMILARITY_TIERS], dtype=np.float64)
+        self.tier_factors = np.array([f for _, f in SIMILARITY_TIERS] + [0.0], dtype=np.float64)
+
+        self._similarity_row = lru_cache(maxsize=cache_size)(self._compute_similarity_row)
+
+        logger.info(f"✅ Матрица ключевых слов: {self.items_count} FAQ, {len(self.vocabulary)} ключевых слов")
+
+    def _compute_similarity_row(self, word: str) -> np.ndarray:
+        """Схожесть слова запроса со всеми ключевыми словами словаря (по слову и по корню)"""
+        word_root = self.root_fn(word)
+        row = np.empty(len(self.vocabulary), dtype=np.float64)
+        for term_id, (keyword, keyword_root) in enumerate(zip(self.vocabulary, self.vocabulary_roots)):
+            if word == keyword:
+                row[term_id] = 1.0
+                continue
+            row[term_id] = max(self.word_similarity(word, keyword),
+                               self.word_similarity(word_root, keyword_root))
+        row.setflags(write=False)
+        return row
+
+    def score_all(self, query_words: List[str]) -> np.ndarray:
+        """Балл Filter 2 для каждого FAQ (в порядке базы знаний)"""
+        scores = np.zeros(self.items_count, dtype=np.float64)
+        if not query_words or not self.vocabulary:
+            return scores
+
+        words = [word.lower().strip() for word in query_words]
+        similarity = np.vstack([self._similarity_row(word) for word in words])
+
+        # Точные совпадения дают приоритет за каждое совпавшее слово запроса
+        exact_counts = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for word in words:
+            term_id = self.vocabulary_ids.get(word)
+            if term_id is not None:
+                exact_counts[term_id] += 1
+
+        # Пороги схожести -> множитель приоритета
+        max_similarity = similarity.max(axis=0)
+        tier = np.searchsorted(-self.tier_thresholds, -max_similarity, side='left')
+        points = self.priorities * (exact_counts + self.tier_factors[tier])
+
+        totals = np.bincount(self.entry_items, weights=points[self.entry_terms], minlength=self.items_count)
+        np.divide(totals, self.max_possible, out=scores, where=self.max_possible > 0)
+        return scores
+
+    def cache_info(self) -> Dict[str, int]:
+        """Статистика кэша строк матрицы схожести"""
+        info = self._similarity_row.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
+
+
+__all__ = ['KeywordMatrixScorer', 'SIMILARITY_TIERS']
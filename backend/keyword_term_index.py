@@ -0,0 +1,73 @@
+"""
+Предвычисленные нормализованные поля базы знаний для поиска по ключевым словам.
+
+search_by_keywords_advanced нормализовал (regex, стоп-слова, стемминг)
+каждое ключевое слово, вопрос, вариацию и ответ каждого пункта на каждый
+запрос. Здесь нормализация выполняется один раз при загрузке базы: для
+каждого термина хранится список (номер пункта, вес), где вес - сумма
+вкладов термина в оценку пункта:
+
+- 2.0 за каждое ключевое слово, нормализованное в этот термин;
+- 1.5, если термин есть в вопросе;
+- 1.0 за каждую вариацию, где он есть;
+- 0.5, если он есть в ответе.
+
+Оценка запроса - сумма весов по множеству его терминов (разреженное
+скалярное произведение), что совпадает с прежним подсчетом пересечений.
+"""
+
+import logging
+from typing import Callable, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_WEIGHT = 2.0
+QUESTION_WEIGHT = 1.5
+VARIATION_WEIGHT = 1.0
+ANSWER_WEIGHT = 0.5
+
+
+class KeywordTermIndex:
+    """Инвертированный индекс термин -> (пункт, вес) по нормализованным полям базы"""
+
+    def __init__(self, knowledge_base: List[Dict[str, Any]], normalize: Callable[[str], str]):
+        self.normalize = normalize
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+
+        for idx, item in enumerate(knowledge_base):
+            weights: Dict[str, float] = {}
+
+            def add(terms, weight):
+                for term in terms:
+                    weights[term] = weights.get(term, 0.0) + weight
+
+            # Ключевое слово совпадает целиком (нормализованная фраза - один термин)
+            add([normalize(keyword) for keyword in item.get('keywords', [])], KEYWORD_WEIGHT)
+            add(frozenset(normalize(item['question']).split()), QUESTION_WEIGHT)
+            for variation in item.get('variations', []):
+                add(frozenset(normalize(variation).split()), VARIATION_WEIGHT)
+            add(frozenset(normalize(item['answer']).split()), ANSWER_WEIGHT)
+
+            for term, weight in weights.items():
+                self.postings.setdefault(term, []).append((idx, weight))
+
+        logger.info(f"✅ Индекс ключевых слов построен: {len(knowledge_base)} записей, {len(self.postings)} терминов")
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """Top-k пунктов по сумме весов терминов запроса (при равенстве - по порядку в базе)"""
+        scores: Dict[int, float] = {}
+        for term in set(self.normalize(query).split()):
+            for idx, weight in self.postings.get(term, ()):
+                scores[idx] = scores.get(idx, 0.0) + weight
+
+        results = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+        return results[:top_k]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'terms': len(self.postings),
+            'postings': sum(len(entries) for entries in self.postings.values())
+        }
+
+
+__all__ = ['KeywordTermIndex', 'KEYWORD_WEIGHT', 'QUESTION_WEIGHT', 'VARIATION_WEIGHT', 'ANSWER_WEIGHT']
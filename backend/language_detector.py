@@ -0,0 +1,178 @@
+"""
+Быстрое детерминированное определение языка запроса.
+
+detect_language вызывал langdetect.detect на каждом запросе (даже при
+попадании в кэш ответов): первая загрузка профилей тяжелая, результат без
+seed недетерминирован, на коротких текстах детектор медленный и часто
+ошибается. Наши запросы - русский, казахский и английский, поэтому:
+
+1. Проход по классам символов: казахские буквы (әғқңөұүіһ) -> 'kk';
+   почти вся кириллица -> 'ru'.
+2. Латиница или смесь алфавитов неоднозначны - тогда работает компактная
+   модель по символьным триграммам (профили частых триграмм ru/kk/en).
+3. Результаты мемоизируются (LRU по тексту).
+
+Детекторы взаимозаменяемы (метод detect(text) -> код языка или 'unknown');
+прежнее поведение - LangdetectDetector, включается LANGUAGE_DETECTOR=langdetect
+для сравнения.
+"""
+
+import os
+import re
+import logging
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from langdetect import detect as langdetect_detect
+    from langdetect.lang_detect_exception import LangDetectException
+    LANGDETECT_AVAILABLE = True
+except ImportError:
+    LANGDETECT_AVAILABLE = False
+
+DEFAULT_DETECTOR = os.environ.get("LANGUAGE_DETECTOR", "script")
+DEFAULT_CACHE_SIZE = int(os.environ.get("LANGUAGE_CACHE_SIZE", 4096))
+
+UNKNOWN = 'unknown'
+
+# Буквы, которые есть в казахской кириллице и нет в русской
+KAZAKH_PATTERN = re.compile('[әғқңөұүіһ]')
+CYRILLIC_PATTERN = re.compile('[\u0400-\u04ff]')
+LATIN_PATTERN = re.compile('[a-z\u00c0-\u024f]')
+NON_LETTERS_PATTERN = re.compile(r'[^\w]+|[\d_]+')
+
+# Доля кириллицы среди букв, при которой текст считается русским без n-грамм
+SCRIPT_DOMINANCE = 0.8
+
+# Минимальная доля триграмм текста, найденных в профиле языка
+NGRAM_MIN_SCORE = 0.08
+
+# Частые триграммы (пробел - граница слова), по убыванию частоты
+NGRAM_PROFILES: Dict[str, List[str]] = {
+    'ru': [
+        ' по', ' на', ' пр', 'ть ', ' не', 'ого', ' ко', 'ени', ' за', 'ост',
+        ' в ', 'ова', ' с ', 'ани', 'то ', 'ет ', 'про', ' то', 'ств', 'ния',
+        ' ка', ' ра', 'ли ', 'ом ', 'ать', 'ой ', 'его', ' от', 'ает', 'ест',
+        ' мо', ' до', ' во', 'ра ', 'ста', 'при', 'как', 'ак ', ' ме', 'ый ',
+        'ие ', 'ся ', 'ные', ' чт', 'что', ' ес', 'ит ', 'ель', 'ить', 'ная',
+        'ном', 'ных', ' де', 'ере', 'чер', 'рез', 'ла ', 'ло ', 'ки ', 'ка ',
+        'ты ', 'ую ', 'ему', 'мне', ' мн', 'где', ' гд', 'де ', 'оди', 'вод',
+        'ите', ' ба', 'бал', 'ала', 'лан', 'анс',
+    ],
+    'kk': [
+        'ның', 'нің', ' жә', 'жән', 'әне', 'не ', 'ған', 'ген', 'лар', 'лер',
+        'дар', 'дер', 'тар', 'тер', 'мен', 'ен ', 'ін ', 'ың ', 'ің ', 'ады',
+        'еді', 'ды ', 'ді ', 'ға ', 'ге ', 'қа ', 'ке ', 'сы ', 'сі ', 'ым ',
+        'ім ', ' қа', 'қал', 'ала', 'лай', 'ай ', ' сә', 'сәл', 'әле', 'лем',
+        'рах', 'ахм', 'хме', 'мет', 'ет ', ' ке', ' бі', 'бір', 'ір ', ' ба',
+        'бар', 'ар ', ' жо', 'жоқ', 'оқ ', 'тыр', 'тір', 'ып ', 'іп ', 'ауы',
+    ],
+    'en': [
+        ' th', 'the', 'he ', ' an', 'and', 'nd ', 'ing', 'ng ', ' to', 'to ',
+        ' of', 'of ', ' in', 'in ', 'ed ', 'er ', 'ion', ' a ', ' is', 'is ',
+        'es ', 'on ', ' it', 'at ', 're ', 'ent', 'tio', 'for', ' fo', 'or ',
+        ' wh', 'wha', 'hat', ' ho', 'how', 'ow ', ' my', 'my ', ' ca', 'can',
+        'an ', ' do', 'do ', 'oes', ' yo', 'you', 'ou ', ' pa', 'pay', ' wo',
+        'wor', 'ork', ' dr', 'dri', 'riv', 'ive', 'ver', ' ap', 'app', ' he',
+        'hel', 'ell', 'llo', 'lo ', 'whe', 'her', 'ere', 'anc', 'nce', 'ce ',
+        ' or', 'ord', 'rde', 'der', 'not',
+    ],
+}
+
+
+def _trigrams(text: str) -> List[str]:
+    padded = f" {' '.join(NON_LETTERS_PATTERN.sub(' ', text).split())} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class NGramLanguageModel:
+    """Сравнение триграмм текста с профилями частых триграмм языков"""
+
+    def __init__(self, profiles: Optional[Dict[str, List[str]]] = None, min_score: float = NGRAM_MIN_SCORE):
+        self.min_score = min_score
+        # Вес триграммы убывает с рангом в профиле (1.0 .. 0.5)
+        self._weights = {
+            language: {trigram: 1.0 - 0.5 * rank / len(trigrams)
+                       for rank, trigram in reversed(list(enumerate(trigrams)))}
+            for language, trigrams in (profiles or NGRAM_PROFILES).items()
+        }
+
+    def scores(self, text: str) -> Dict[str, float]:
+        trigrams = _trigrams(text)
+        if not trigrams:
+            return {language: 0.0 for language in self._weights}
+        return {language: sum(weights.get(trigram, 0.0) for trigram in trigrams) / len(trigrams)
+                for language, weights in self._weights.items()}
+
+    def __call__(self, text: str) -> Optional[str]:
+        """Язык с лучшим счетом или None, если совпадений слишком мало"""
+        scores = self.scores(text)
+        language = max(scores, key=scores.get)
+        return language if scores[language] >= self.min_score else None
+
+
+class LanguageDetector:
+    """Классы символов, затем n-граммы для неоднозначных текстов; результаты мемоизируются"""
+
+    def __init__(self, fallback: Optional[Callable[[str], Optional[str]]] = None,
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        self.fallback = NGramLanguageModel() if fallback is None else fallback
+        self._cached = lru_cache(maxsize=cache_size)(self._detect)
+
+    def detect(self, text: str) -> str:
+        """Код языка ('ru', 'kk', 'en') или 'unknown'"""
+        return self._cached(text)
+
+    def _detect(self, text: str) -> str:
+        text = text.lower()
+        if KAZAKH_PATTERN.search(text):
+            return 'kk'
+
+        cyrillic = len(CYRILLIC_PATTERN.findall(text))
+        latin = len(LATIN_PATTERN.findall(text))
+        if not cyrillic and not latin:
+            return UNKNOWN
+        if cyrillic / (cyrillic + latin) >= SCRIPT_DOMINANCE:
+            return 'ru'
+
+        # Латиница (английский или транслит) и смесь алфавитов
+        language = self.fallback(text) if self.fallback else None
+        if language:
+            return language
+        return 'ru' if cyrillic >= latin else UNKNOWN
+
+    def stats(self) -> Dict[str, int]:
+        info = self._cached.cache_info()
+        return {'detector': 'script', 'hits': info.hits, 'misses': info.misses,
+                'size': info.currsize, 'max_size': info.maxsize}
+
+
+class LangdetectDetector:
+    """Прежнее поведение: langdetect на каждом вызове, без кэша"""
+
+    def detect(self, text: str) -> str:
+        try:
+            return langdetect_detect(text)
+        except LangDetectException:
+            return UNKNOWN
+
+    def stats(self) -> Dict[str, str]:
+        return {'detector': 'langdetect'}
+
+
+def create_language_detector(name: str = DEFAULT_DETECTOR):
+    """Детектор по имени: 'script' (по умолчанию) или 'langdetect' (прежний)"""
+    if name == 'langdetect':
+        if LANGDETECT_AVAILABLE:
+            logger.info("🌐 Определение языка: langdetect")
+            return LangdetectDetector()
+        logger.warning("⚠️ langdetect не установлен, используется определение по алфавиту")
+    return LanguageDetector()
+
+
+__all__ = [
+    'LanguageDetector', 'LangdetectDetector', 'NGramLanguageModel', 'create_language_detector',
+    'LANGDETECT_AVAILABLE', 'DEFAULT_DETECTOR', 'UNKNOWN'
+]
@@ -0,0 +1,97 @@
+"""
+Фоновая загрузка тяжелых компонентов.
+
+Модель эмбеддингов (torch/onnxruntime), FAISS и полные ML клиенты грузятся
+десятки секунд. Если делать это при импорте модуля, сервер не отвечает
+даже на /health, пока загрузка не закончится. BackgroundLoader выполняет
+загрузку в отдельном потоке: сервис сразу работает на лексическом поиске,
+а компонент включается, когда готов. Его состояние отдается отдельно от
+liveness (эндпоинт /ready).
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class BackgroundLoader:
+    """Однократная загрузка компонента в фоновом потоке с отслеживанием состояния"""
+
+    def __init__(self, name: str, factory: Callable[[], Any],
+                 on_ready: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.factory = factory
+        self.on_ready = on_ready
+        self.state = PENDING
+        self.value: Any = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, background: bool = True) -> 'BackgroundLoader':
+        """
+        Запускает загрузку (повторный вызов ничего не делает). С
+        background=False загрузка выполняется в текущем потоке - для
+        скриптов и тестов, которым компонент нужен сразу.
+        """
+        with self._lock:
+            if self.state != PENDING:
+                return self
+            self.state = LOADING
+            self.started_at = time.monotonic()
+        if background:
+            threading.Thread(target=self._run, name=f"loader-{self.name}", daemon=True).start()
+            logger.info(f"⏳ Фоновая загрузка: {self.name}")
+        else:
+            self._run()
+        return self
+
+    def _run(self):
+        try:
+            value = self.factory()
+            if self.on_ready is not None:
+                self.on_ready(value)
+            self.value = value
+            self.state = READY
+            logger.info(f"✅ {self.name} загружен за {time.monotonic() - self.started_at:.1f}с")
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+            logger.warning(f"⚠️ Ошибка фоновой загрузки {self.name}: {e}")
+        finally:
+            self.finished_at = time.monotonic()
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ждет окончания загрузки; True, если компонент готов"""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        if self.started_at is None:
+            elapsed = None
+        else:
+            elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 2)
+        return {
+            'name': self.name,
+            'state': self.state,
+            'elapsed_seconds': elapsed,
+            'error': self.error
+        }
+
+
+__all__ = ['BackgroundLoader', 'PENDING', 'LOADING', 'READY', 'FAILED']
@@ -1,16 +1,32 @@
 import json
-import re
+import hmac
 import os
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, NamedTuple, Optional
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from langdetect import detect
-from langdetect.lang_detect_exception import LangDetectException
+from faq_index import FAQIndex, tokenize
+from text_similarity import similarity_ratio, batch_similarity
+from word_stemmer import word_stemmer
+from query_cache import QueryCache
+from shared_cache import create_shared_cache
+from kb_reloader import KBReloader
+from keyword_automaton import KeywordAutomaton
+from text_normalizer import clean_text
+from language_detector import create_language_detector
+
+# Векторизованный скоринг ключевых слов (требует NumPy)
+try:
+    from keyword_scorer import KeywordMatrixScorer
+    KEYWORD_MATRIX_AVAILABLE = True
+except ImportError:
+    KEYWORD_MATRIX_AVAILABLE = False
+    print("⚠️ NumPy недоступен, используется поэлементный скоринг ключевых слов")
 
 # Импорт улучшенного морфологического анализатора
 try:
@@ -51,6 +67,7 @@ class ChatResponse(BaseModel):
     confidence: float
     source: str  # "kb" или "llm"
     timestamp: str
+    kb_version: int = 0  # версия снимка базы знаний, которым обработан запрос
 
 # Загрузка данных
 def load_json_file(filename: str) -> Dict[str, Any]:
@@ -76,6 +93,13 @@ def load_json_file(filename: str) -> Dict[str, Any]:
     logger.error(f"Файл {filename} не найден ни в одном из путей: {possible_paths}")
     return {}
 
+def find_data_file(filename: str) -> Optional[str]:
+    """Возвращает первый существующий путь к файлу данных (те же пути, что и load_json_file)"""
+    for path in [filename, f"../{filename}", f"./{filename}"]:
+        if os.path.exists(path):
+            return path
+    return None
+
 # Глобальные данные
 fixtures = load_json_file("fixtures.json")
 kb_data = load_json_file("kb.json")
@@ -102,52 +126,85 @@ if isinstance(kb_data, list):
 
 # Предобработка текста
 def preprocess_text(text: str) -> str:
-    """Убирает эмодзи и спецсимволы"""
-    # Убираем эмодзи
-    emoji_pattern = re.compile("["
-        u"\U0001F600-\U0001F64F"  # emoticons
-        u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-        u"\U0001F680-\U0001F6FF"  # transport & map symbols
-        u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-        u"\U00002702-\U000027B0"
-        u"\U000024C2-\U0001F251"
-        "]+", flags=re.UNICODE)
-    
-    text = emoji_pattern.sub('', text)
-    
-    # Убираем лишние пробелы и спецсимволы
-    text = re.sub(r'[^\w\s\-.,!?]', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    return text
-
-# Определение языка
+    """Убирает эмодзи и спецсимволы (общая таблица translate из text_normalizer)"""
+    return clean_text(text)
+
+# Определение языка: по алфавиту с n-граммами и мемоизацией
+# (LANGUAGE_DETECTOR=langdetect - прежний langdetect для сравнения)
+language_detector = create_language_detector()
+
 def detect_language(text: str) -> str:
     """Определяет язык текста"""
-    try:
-        lang = detect(text)
-        if lang in ['ru', 'kk']:
-            return 'ru'  # Русский/казахский
-        elif lang == 'en':
-            return 'en'
-        else:
-            return 'ru'  # По умолчанию русский
-    except LangDetectException:
-        return 'ru'
+    lang = language_detector.detect(text)
+    if lang in ['ru', 'kk']:
+        return 'ru'  # Русский/казахский
+    elif lang == 'en':
+        return 'en'
+    else:
+        return 'ru'  # По умолчанию русский
 
 # Классификация интентов
+# Ключевые слова интентов: списки проверяются одним автоматом Ахо-Корасик
+# Предварительный заказ - сразу FAQ с высокой уверенностью
+PREORDER_PHRASES = ['предварительный заказ', 'предзаказ', 'заранее', 'зарезервировать']
+
+# Специфичные FAQ слова: приоритет FAQ над конфликтующими интентами
+SPECIFIC_FAQ_WORDS = ['расценка', 'доставка', 'моточасы', 'баланс', 'приложение']
+
+# FAQ интенты (включаем все ключевые слова из базы знаний)
+FAQ_KEYWORDS = ['цена', 'стоимость', 'тариф', 'расчет', 'сколько стоит', 
+               'промокод', 'скидка', 'промо', 'код', 'ввести',
+               'отменить', 'отмена', 'отказ',
+               'связаться', 'позвонить', 'водитель', 'контакт',
+               'не приехал', 'опоздал', 'ждать', 'проблема',
+               'предварительный заказ', 'предзаказ', 'заранее', 'время',
+               'зарезервировать', 'вызов', 'назначить время',
+               # Добавляем все ключевые слова из FAQ (удалены слова связанные с наценкой)
+               'комфорт', 'класс', 'машина', 'премиум', 'камри', 'дороже', 'удобство',
+               'расценка', 'таксометр', 'калькулятор', 'предварительно', 'оценка',
+               'доставка', 'заказ', 'курьер', 'посылка', 'откуда', 'куда', 'телефон', 'получатель',
+               'регистрация', 'заказы', 'лента заказов', 'баланс', 'id', 'клиент', 'пробный',
+               'пополнение', 'qiwi', 'cyberplat', 'касса24', 'единица', 'kaspi', 'visa', 'mastercard',
+               'моточасы', 'минуты', 'поездка', 'время', 'тариф', 'длительные заказы',
+               'ожидание', 'поехали', 'остановить', 'заказ выполнен', 'клиент', 'адрес',
+               'приложение', 'не работает', 'обновление', 'google play', 'app store', 'gps', 'вылетает', 'зависает',
+               'работает', 'груз', 'отправить', 'расстояние', 'товары', 'документы']
+
+# Статус поездки (только специфичные слова)
+RIDE_STATUS_KEYWORDS = ['где водитель', 'статус поездки', 'активные поездки']
+
+# Чек (только специфичные слова)
+RECEIPT_KEYWORDS = ['чек', 'квитанция', 'документ', 'справка', 'отправить чек']
+
+# Карты (только специфичные слова, исключаем "оплата" и "доплата")
+CARDS_KEYWORDS = ['карта', 'карты', 'основная карта', 'привязать карту', 'основная']
+
+# Жалобы
+COMPLAINT_KEYWORDS = ['списали дважды', 'двойное списание', 'жалоба', 'неправильно списали']
+
+# Один проход по тексту вместо отдельного `keyword in text` на каждое слово
+intent_automaton = KeywordAutomaton({
+    'preorder': PREORDER_PHRASES,
+    'specific_faq': SPECIFIC_FAQ_WORDS,
+    'faq': FAQ_KEYWORDS,
+    'ride_status': RIDE_STATUS_KEYWORDS,
+    'receipt': RECEIPT_KEYWORDS,
+    'cards': CARDS_KEYWORDS,
+    'complaint': COMPLAINT_KEYWORDS
+})
+
 def classify_intent(text: str) -> tuple[str, float]:
     """Классифицирует запрос пользователя"""
     text_lower = text.lower()
+    matches = intent_automaton.counts(text_lower)
     
     # Специальная логика для предварительного заказа - проверяем в первую очередь
-    if any(phrase in text_lower for phrase in ['предварительный заказ', 'предзаказ', 'заранее', 'зарезервировать']):
+    if matches['preorder']:
         return 'faq', 0.9  # Сразу возвращаем FAQ с высокой уверенностью
     
     # Специальная логика для исключения конфликтующих слов
     # Если запрос содержит специфичные FAQ слова, приоритизируем FAQ
-    specific_faq_words = ['расценка', 'доставка', 'моточасы', 'баланс', 'приложение']
-    if any(word in text_lower for word in specific_faq_words):
+    if matches['specific_faq']:
         # Добавляем большой бонус для FAQ и обнуляем cards
         faq_bonus = 10
         cards_penalty = -10  # Штраф для cards
@@ -155,43 +212,12 @@ def classify_intent(text: str) -> tuple[str, float]:
         faq_bonus = 0
         cards_penalty = 0
     
-    # FAQ интенты (включаем все ключевые слова из базы знаний)
-    faq_keywords = ['цена', 'стоимость', 'тариф', 'расчет', 'сколько стоит', 
-                   'промокод', 'скидка', 'промо', 'код', 'ввести',
-                   'отменить', 'отмена', 'отказ',
-                   'связаться', 'позвонить', 'водитель', 'контакт',
-                   'не приехал', 'опоздал', 'ждать', 'проблема',
-                   'предварительный заказ', 'предзаказ', 'заранее', 'время',
-                   'зарезервировать', 'вызов', 'назначить время',
-                   # Добавляем все ключевые слова из FAQ (удалены слова связанные с наценкой)
-                   'комфорт', 'класс', 'машина', 'премиум', 'камри', 'дороже', 'удобство',
-                   'расценка', 'таксометр', 'калькулятор', 'предварительно', 'оценка',
-                   'доставка', 'заказ', 'курьер', 'посылка', 'откуда', 'куда', 'телефон', 'получатель',
-                   'регистрация', 'заказы', 'лента заказов', 'баланс', 'id', 'клиент', 'пробный',
-                   'пополнение', 'qiwi', 'cyberplat', 'касса24', 'единица', 'kaspi', 'visa', 'mastercard',
-                   'моточасы', 'минуты', 'поездка', 'время', 'тариф', 'длительные заказы',
-                   'ожидание', 'поехали', 'остановить', 'заказ выполнен', 'клиент', 'адрес',
-                   'приложение', 'не работает', 'обновление', 'google play', 'app store', 'gps', 'вылетает', 'зависает',
-                   'работает', 'груз', 'отправить', 'расстояние', 'товары', 'документы']
-    
-    # Статус поездки (только специфичные слова)
-    ride_status_keywords = ['где водитель', 'статус поездки', 'активные поездки']
-    
-    # Чек (только специфичные слова)
-    receipt_keywords = ['чек', 'квитанция', 'документ', 'справка', 'отправить чек']
-    
-    # Карты (только специфичные слова, исключаем "оплата" и "доплата")
-    cards_keywords = ['карта', 'карты', 'основная карта', 'привязать карту', 'основная']
-    
-    # Жалобы
-    complaint_keywords = ['списали дважды', 'двойное списание', 'жалоба', 'неправильно списали']
-    
     # Подсчет совпадений
-    faq_score = sum(1 for keyword in faq_keywords if keyword in text_lower) + faq_bonus
-    ride_score = sum(1 for keyword in ride_status_keywords if keyword in text_lower)
-    receipt_score = sum(1 for keyword in receipt_keywords if keyword in text_lower)
-    cards_score = sum(1 for keyword in cards_keywords if keyword in text_lower) + cards_penalty
-    complaint_score = sum(1 for keyword in complaint_keywords if keyword in text_lower)
+    faq_score = matches['faq'] + faq_bonus
+    ride_score = matches['ride_status']
+    receipt_score = matches['receipt']
+    cards_score = matches['cards'] + cards_penalty
+    complaint_score = matches['complaint']
     
     
     scores = {
@@ -274,36 +300,76 @@ def escalate_to_human(user_id: str, description: str) -> Dict[str, Any]:
     }
 
 # ТРЕХУРОВНЕВАЯ СИСТЕМА ПОИСКА
-def search_with_three_filters(query: str, faq_items: List[Dict]) -> List[tuple]:
+
+# Специальные приоритеты для ключевых слов
+PRIORITY_KEYWORDS = {
+    # Высокий приоритет - уникальные слова
+    'комфорт': 15, 'камри': 15, 'премиум': 15, 'класс': 15, 'машина': 15, 'дороже': 15, 'удобство': 15,
+    'моточасы': 15, 'минуты': 15, 'поездка': 15, 'время': 15, 'длительные заказы': 15,
+    'баланс': 15, 'пополнение': 15, 'qiwi': 15, 'cyberplat': 15, 'касса24': 15, 'единица': 15, 'kaspi': 15, 'visa': 15, 'mastercard': 15,
+    'приложение': 15, 'google play': 15, 'app store': 15, 'gps': 15, 'вылетает': 15, 'зависает': 15,
+    'водитель': 15, 'регистрация': 15, 'лента заказов': 15, 'заказы': 15, 'id': 15, 'клиент': 15, 'пробный': 15,
+    
+    # Очень высокий приоритет - уникальные слова для расценки
+    'расценка': 20, 'таксометр': 20, 'калькулятор': 20, 'предварительно': 20, 'оценка': 20,
+    
+    # Высокий приоритет - специфичные слова
+    'доставка': 15, 'курьер': 15, 'посылка': 15, 'отправить': 15, 'заказ': 15, 'откуда': 15, 'куда': 15, 'телефон': 15, 'получатель': 15,
+    'предварительный заказ': 15, 'предзаказ': 15, 'заранее': 15,
+    'ожидание': 15, 'поехали': 15, 'остановить': 15, 'заказ выполнен': 15, 'клиент': 15, 'адрес': 15,
+    'работает': 15, 'груз': 15, 'расстояние': 15, 'товары': 15, 'документы': 15,
+    
+    # Низкий приоритет - общие слова (могут конфликтовать)
+    'цена': 3, 'стоимость': 3, 'тариф': 3
+}
+
+def search_with_three_filters(query: str, faq_items: List[Dict], index: Optional[FAQIndex] = None,
+                              keyword_scorer: Optional["KeywordMatrixScorer"] = None) -> List[tuple]:
     """
     Трехуровневая система поиска с приоритетами:
     1. question_variations (приоритет 0.5)
     2. keywords (приоритет 0.3) 
     3. answer content (приоритет 0.2)
+    
+    Оцениваются только кандидаты из инвертированного индекса FAQIndex;
+    если кандидатов нет, выполняется полный проход (для опечаток).
+    Filter 2 для всех FAQ сразу считается KeywordMatrixScorer, если он передан.
     """
     if not query or not faq_items:
         return []
     
+    if index is None or index.items is not faq_items:
+        index = FAQIndex(faq_items, extract_word_root)
+        keyword_scorer = None
+    
     results = []
     query_lower = query.lower().strip()
     
     # Предобработка запроса
-    query_words = re.sub(r'[^\w\s]', ' ', query_lower).split()
-    query_words = [word for word in query_words if len(word) > 2]
+    query_words = tokenize(query_lower)
     
     # Специальная логика для исключения конфликтующих FAQ
     # Если запрос содержит специфичные слова, исключаем конфликтующие FAQ
     # (логика для наценки удалена, так как FAQ о наценке удален)
     
-    for item in faq_items:
+    candidate_ids = index.candidates(query_words) or range(len(index))
+    keyword_scores = keyword_scorer.score_all(query_words) if keyword_scorer is not None else None
+    
+    for idx in candidate_ids:
+        item = index.items[idx]
+        
         # Filter 1: Question Variations (приоритет 0.5)
-        variations_score = search_question_variations(query_lower, item.get("question_variations", []))
+        variations_score = search_question_variations(query_lower, index.variations[idx])
         
         # Filter 2: Keywords (приоритет 0.3)
-        keywords_score = search_keywords(query_words, item.get("keywords", []))
+        if keyword_scores is not None:
+            keywords_score = float(keyword_scores[idx])
+        else:
+            keywords_score = search_keywords(query_words, index.keywords[idx], index.keyword_roots[idx])
         
         # Filter 3: Answer Content (приоритет 0.2)
-        answer_score = search_answer_content(query_words, item.get("answer", ""))
+        answer_score = search_answer_content(query_words, index.answers[idx], index.answer_words[idx],
+                                             index.answer_word_sets[idx])
         
         # Общий балл с приоритетами
         total_score = (
@@ -330,16 +396,17 @@ def search_question_variations(query: str, variations: List[str]) -> float:
         return 0.0
     
     best_score = 0.0
+    variations_lower = [variation.lower() for variation in variations]
     
-    for variation in variations:
-        variation_lower = variation.lower()
-        
+    # Схожесть ниже 70% не учитывается, поэтому расстояние считается с ограничением
+    similarities = batch_similarity(query, variations_lower, min_similarity=0.7)
+    
+    for variation_lower, similarity in zip(variations_lower, similarities):
         # Точное совпадение
         if query == variation_lower:
             return 1.0
         
         # Очень близкое совпадение (90%+)
-        similarity = calculate_text_similarity(query, variation_lower)
         if similarity > 0.9:
             best_score = max(best_score, similarity)
         
@@ -359,43 +426,22 @@ def search_question_variations(query: str, variations: List[str]) -> float:
     return best_score
 
 
-def search_keywords(query_words: List[str], keywords: List[str]) -> float:
+def search_keywords(query_words: List[str], keywords: List[str],
+                    keyword_roots: Optional[List[str]] = None) -> float:
     """Filter 2: Улучшенный поиск по ключевым словам с приоритизацией"""
     if not query_words or not keywords:
         return 0.0
     
-    # Специальные приоритеты для ключевых слов
-    priority_keywords = {
-        # Высокий приоритет - уникальные слова
-        'комфорт': 15, 'камри': 15, 'премиум': 15, 'класс': 15, 'машина': 15, 'дороже': 15, 'удобство': 15,
-        'моточасы': 15, 'минуты': 15, 'поездка': 15, 'время': 15, 'длительные заказы': 15,
-        'баланс': 15, 'пополнение': 15, 'qiwi': 15, 'cyberplat': 15, 'касса24': 15, 'единица': 15, 'kaspi': 15, 'visa': 15, 'mastercard': 15,
-        'приложение': 15, 'google play': 15, 'app store': 15, 'gps': 15, 'вылетает': 15, 'зависает': 15,
-        'водитель': 15, 'регистрация': 15, 'лента заказов': 15, 'заказы': 15, 'id': 15, 'клиент': 15, 'пробный': 15,
-        
-        # Очень высокий приоритет - уникальные слова для расценки
-        'расценка': 20, 'таксометр': 20, 'калькулятор': 20, 'предварительно': 20, 'оценка': 20,
-        
-        # Высокий приоритет - специфичные слова
-        'доставка': 15, 'курьер': 15, 'посылка': 15, 'отправить': 15, 'заказ': 15, 'откуда': 15, 'куда': 15, 'телефон': 15, 'получатель': 15,
-        'предварительный заказ': 15, 'предзаказ': 15, 'заранее': 15,
-        'ожидание': 15, 'поехали': 15, 'остановить': 15, 'заказ выполнен': 15, 'клиент': 15, 'адрес': 15,
-        'работает': 15, 'груз': 15, 'расстояние': 15, 'товары': 15, 'документы': 15,
-        
-        # Низкий приоритет - общие слова (могут конфликтовать)
-        'цена': 3, 'стоимость': 3, 'тариф': 3
-    }
-    
     total_score = 0.0
     max_possible = len(keywords) * 20  # Максимум баллов за ключевые слова
     
-    for keyword in keywords:
+    for i, keyword in enumerate(keywords):
         keyword_lower = keyword.lower().strip()
-        keyword_root = extract_word_root(keyword_lower)
+        keyword_root = keyword_roots[i] if keyword_roots is not None else extract_word_root(keyword_lower)
         max_similarity = 0
         
         # Получаем приоритет ключевого слова
-        keyword_priority = priority_keywords.get(keyword_lower, 5)  # По умолчанию 5
+        keyword_priority = PRIORITY_KEYWORDS.get(keyword_lower, 5)  # По умолчанию 5
         
         for word in query_words:
             word_lower = word.lower().strip()
@@ -434,20 +480,24 @@ def search_keywords(query_words: List[str], keywords: List[str]) -> float:
     return total_score / max_possible if max_possible > 0 else 0.0
 
 
-def search_answer_content(query_words: List[str], answer: str) -> float:
+def search_answer_content(query_words: List[str], answer: str,
+                          answer_words: Optional[List[str]] = None,
+                          answer_word_set: Optional[frozenset] = None) -> float:
     """Filter 3: Поиск по содержимому ответов"""
     if not query_words or not answer:
         return 0.0
     
     answer_lower = answer.lower()
-    answer_words = re.sub(r'[^\w\s]', ' ', answer_lower).split()
-    answer_words = [word for word in answer_words if len(word) > 2]
+    if answer_words is None:
+        answer_words = tokenize(answer_lower)
+    if answer_word_set is None:
+        answer_word_set = set(answer_words)
     
     if not answer_words:
         return 0.0
     
     # TF-IDF подсчет
-    common_words = set(query_words).intersection(set(answer_words))
+    common_words = answer_word_set.intersection(query_words)
     if not common_words:
         return 0.0
     
@@ -472,39 +522,12 @@ def search_answer_content(query_words: List[str], answer: str) -> float:
     return min(1.0, tfidf_score + position_bonus + phrase_bonus)
 
 
-def calculate_text_similarity(text1: str, text2: str) -> float:
-    """Вычисляет схожесть между двумя текстами"""
-    if not text1 or not text2:
-        return 0.0
-    
-    # Точное совпадение
-    if text1 == text2:
-        return 1.0
-    
-    # Левенштейн расстояние
-    def levenshtein_distance(s1, s2):
-        if len(s1) < len(s2):
-            return levenshtein_distance(s2, s1)
-        if len(s2) == 0:
-            return len(s1)
-        
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
-    
-    distance = levenshtein_distance(text1, text2)
-    max_len = max(len(text1), len(text2))
-    similarity = 1 - (distance / max_len)
-    
-    return max(0.0, similarity)
+def calculate_text_similarity(text1: str, text2: str, min_similarity: float = 0.0) -> float:
+    """
+    Вычисляет схожесть между двумя текстами (1 - расстояние Левенштейна / длина).
+    Если задан min_similarity, схожесть ниже порога возвращается как 0.0 без полного расчета.
+    """
+    return similarity_ratio(text1, text2, min_similarity)
 
 
 def calculate_word_similarity(word1, word2):
@@ -537,30 +560,9 @@ def calculate_word_similarity(word1, word2):
         if common_len >= 4:
             return 0.7 + (common_len / min_len) * 0.2
     
-    # Левенштейн расстояние для опечаток
-    def levenshtein_distance(s1, s2):
-        if len(s1) < len(s2):
-            return levenshtein_distance(s2, s1)
-        if len(s2) == 0:
-            return len(s1)
-        
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
-    
-    # Проверяем опечатки
+    # Проверяем опечатки (Левенштейн, учитывается только схожесть выше 60%)
     if len(w1) >= 3 and len(w2) >= 3:
-        distance = levenshtein_distance(w1, w2)
-        max_len = max(len(w1), len(w2))
-        similarity = 1 - (distance / max_len)
+        similarity = similarity_ratio(w1, w2, min_similarity=0.6)
         
         if similarity > 0.6:  # 60% схожести
             return similarity * 0.5
@@ -590,81 +592,63 @@ def calculate_word_similarity(word1, word2):
 
 
 def extract_word_root(word):
-    """Извлекает корень слова, убирая окончания, суффиксы и приставки"""
-    if len(word) < 4:
-        return word
-    
-    root = word.lower()
-    
-    # Специальные случаи для конкретных слов
-    special_cases = {
-        'доставка': 'достав', 'доставки': 'достав', 'доставку': 'достав', 'доставке': 'достав',
-        'доставщик': 'достав', 'доставщица': 'достав', 'доставлять': 'достав',
-        'передоставка': 'достав', 'поддоставка': 'достав',
-        'водитель': 'води', 'водители': 'води', 'водительница': 'води', 'водить': 'води',
-        'водит': 'води', 'водила': 'води', 'водило': 'води', 'водили': 'води',
-        'заказ': 'заказ', 'заказы': 'заказ', 'заказывать': 'заказ', 'заказчик': 'заказ',
-        'заказчица': 'заказ', 'перезаказ': 'заказ', 'подзаказ': 'заказ',
-        'ценообразование': 'цен', 'переоценка': 'цен', 'оценка': 'цен',
-        'карточка': 'карт', 'картографический': 'карт', 'картограф': 'карт',
-        'балансировка': 'баланс', 'балансировать': 'баланс',
-        'тарификация': 'тариф', 'тарифицировать': 'тариф'
-    }
-    
-    if root in special_cases:
-        return special_cases[root]
-    
-    # Русские окончания (по длине от длинных к коротким)
-    russian_endings = [
-        'оваться', 'иваться', 'еваться', 'аться', 'иться', 'еться', 'уться',
-        'ование', 'ирование', 'евание', 'ание', 'ение', 'ение',
-        'ский', 'ская', 'ское', 'ские', 'ского', 'ской', 'скую', 'ским', 'ском', 'ских', 'скими',
-        'ость', 'есть', 'ство', 'тель', 'тельница',
-        'ый', 'ая', 'ое', 'ые', 'ого', 'ой', 'ую', 'ым', 'ом', 'их', 'ыми',
-        'ия', 'ий', 'ие', 'ию', 'ием', 'ии', 'иями', 'иях',
-        'ик', 'иц', 'ич', 'ищ', 'ник', 'ниц', 'щик', 'щиц',
-        'а', 'о', 'у', 'ы', 'и', 'е', 'ю', 'ем', 'ом', 'ах', 'ями', 'ях',
-        'ть', 'ти', 'л', 'ла', 'ло', 'ли', 'н', 'на', 'но', 'ны'
-    ]
-    
-    # Приставки (по длине от длинных к коротким)
-    prefixes = [
-        'пере', 'пред', 'под', 'над', 'при', 'раз', 'рас', 'из', 'ис',
-        'от', 'об', 'в', 'во', 'за', 'на', 'до', 'по', 'со', 'вы', 'у'
-    ]
-    
-    # Убираем окончания (от длинных к коротким)
-    for ending in sorted(russian_endings, key=len, reverse=True):
-        if root.endswith(ending) and len(root) > len(ending) + 2:
-            root = root[:-len(ending)]
-            break
-    
-    # Убираем приставки (от длинных к коротким)
-    for prefix in sorted(prefixes, key=len, reverse=True):
-        if root.startswith(prefix) and len(root) > len(prefix) + 3:
-            root = root[len(prefix):]
-            break
-    
-    # Минимальная длина корня
-    return root if len(root) >= 3 else word.lower()
+    """Извлекает корень слова, убирая окончания, суффиксы и приставки (мемоизировано)"""
+    return word_stemmer.stem(word)
+
 
+class KBState(NamedTuple):
+    """База знаний и производные структуры поиска (один снимок KBReloader)"""
+    kb_data: Dict[str, Any]
+    faq_index: FAQIndex
+    keyword_scorer: Optional["KeywordMatrixScorer"]
 
-def search_faq(text: str) -> Optional[Dict[str, Any]]:
+
+def build_kb_state(data: Dict[str, Any]) -> KBState:
+    """Строит индекс FAQ (токены, корни, posting-листы) и матричный скоринг ключевых слов"""
+    index = FAQIndex(data.get("faq", []), extract_word_root)
+    word_stemmer.pin(index.roots)
+    scorer = KeywordMatrixScorer(
+        index.keywords, index.keyword_roots, PRIORITY_KEYWORDS,
+        calculate_word_similarity, extract_word_root
+    ) if KEYWORD_MATRIX_AVAILABLE else None
+    return KBState(data, index, scorer)
+
+
+def read_kb_state() -> KBState:
+    """Читает kb.json для перезагрузки: ошибка чтения оставляет прежний снимок"""
+    path = find_data_file("kb.json")
+    if path is None:
+        raise FileNotFoundError("kb.json не найден")
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("kb.json должен содержать объект с ключом faq")
+    return build_kb_state(data)
+
+
+# Индекс FAQ строится при загрузке базы знаний и перестраивается в фоне при
+# изменении kb.json (опрос раз в KB_RELOAD_INTERVAL секунд, 0 - без опроса)
+kb_reloader = KBReloader([find_data_file("kb.json")], read_kb_state, initial=build_kb_state(kb_data))
+kb_reloader.start()
+
+
+def search_faq(text: str, state: Optional[KBState] = None) -> Optional[Dict[str, Any]]:
     """Трехуровневый поиск в базе знаний FAQ с приоритетами"""
-    if not text or not kb_data:
+    state = state or kb_reloader.snapshot.value
+    if not text or not state.kb_data:
         return None
     
-    faq_items = kb_data.get("faq", [])
+    faq_items = state.kb_data.get("faq", [])
     if not faq_items:
         return None
     
     logger.info(f"🔍 Трехуровневый поиск для: '{text}'")
     
     # Используем новую трехуровневую систему поиска
-    results = search_with_three_filters(text, faq_items)
+    results = search_with_three_filters(text, faq_items, state.faq_index, state.keyword_scorer)
     logger.info(f"🔍 Трехуровневый поиск результатов: {len(results)}")
-    for i, (item, total_score, variations_score, keywords_score, answer_score) in enumerate(results[:3]):
-        logger.info(f"🔍 Результат {i+1}: {item.get('question', '')} (total: {total_score:.2f}, v: {variations_score:.2f}, k: {keywords_score:.2f}, a: {answer_score:.2f})")
+    for i, (item, total_score, filter_scores) in enumerate(results[:3]):
+        logger.info(f"🔍 Результат {i+1}: {item.get('question', '')} (total: {total_score:.2f}, v: {filter_scores['variations']:.2f}, k: {filter_scores['keywords']:.2f}, a: {filter_scores['answer']:.2f})")
     
     if results:
         best_match, best_score, filter_scores = results[0]
@@ -688,7 +672,7 @@ def search_faq(text: str) -> Optional[Dict[str, Any]]:
     # Fallback к морфологическому анализу если трехуровневый поиск не дал результатов
     if MORPHOLOGY_AVAILABLE:
         try:
-            result = enhance_classification_with_morphology(text, kb_data)
+            result = enhance_classification_with_morphology(text, state.kb_data)
             confidence = result.get('confidence', 0)
             logger.info(f"🔍 Fallback морфологический анализ: confidence={confidence:.2f}")
             
@@ -701,6 +685,17 @@ def search_faq(text: str) -> Optional[Dict[str, Any]]:
     logger.info(f"❌ Трехуровневый поиск не нашел подходящих результатов")
     return None
 
+# Кэш результатов /chat: интент, номер FAQ и уверенность по нормализованному тексту.
+# Сбрасывается при публикации нового снимка базы знаний. Если задан SHARED_CACHE_URL
+# (redis://host:port/db), вторым уровнем служит общий кэш всех воркеров
+shared_cache = create_shared_cache(os.environ.get("SHARED_CACHE_URL"))
+query_cache = QueryCache(
+    max_size=int(os.environ.get("QUERY_CACHE_SIZE", 2048)),
+    ttl_seconds=float(os.environ.get("QUERY_CACHE_TTL", 3600)),
+    kb_version=kb_reloader,
+    shared=shared_cache
+)
+
 # Основной эндпоинт
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
@@ -715,8 +710,27 @@ async def chat(request: ChatRequest):
     detected_lang = detect_language(processed_text)
     final_locale = request.locale if request.locale in ['ru', 'kz', 'en'] else detected_lang
     
-    # Классификация интента
-    intent, confidence = classify_intent(processed_text)
+    # Снимок базы знаний берется один раз: перезагрузка во время запроса его не меняет
+    snapshot = kb_reloader.snapshot
+    state = snapshot.value
+    
+    # Классификация интента и поиск FAQ (повторные формулировки берутся из кэша;
+    # номер FAQ в записи относится к снимку с тем же fingerprint)
+    faq_result = None
+    cached = await query_cache.aget(processed_text)
+    if cached is not None and cached.get("kb") == snapshot.fingerprint:
+        intent, confidence = cached["intent"], cached["confidence"]
+        if cached["faq_id"] is not None:
+            faq_result = state.faq_index.items[cached["faq_id"]]
+        logger.info(f"⚡ Кэш: '{processed_text}' -> intent={intent}, faq_id={cached['faq_id']}")
+    else:
+        intent, confidence = classify_intent(processed_text)
+        if intent == "faq":
+            faq_result = search_faq(processed_text, state)
+        faq_id = state.faq_index.position(faq_result) if faq_result else None
+        if faq_result is None or faq_id is not None:
+            await query_cache.aset(processed_text, {"intent": intent, "faq_id": faq_id, "confidence": confidence,
+                                                    "kb": snapshot.fingerprint})
     
     logger.info(f"User: {request.user_id}, Intent: {intent}, Confidence: {confidence}, Locale: {final_locale}")
     
@@ -741,9 +755,6 @@ async def chat(request: ChatRequest):
         response_text = result.get("message", "Не удалось создать тикет")
         
     else:  # FAQ
-        # Поиск в базе знаний
-        faq_result = search_faq(processed_text)
-        
         if faq_result:
             response_text = faq_result.get("answer", "Не удалось найти ответ")
             source = "kb"
@@ -759,7 +770,8 @@ async def chat(request: ChatRequest):
         intent=intent,
         confidence=confidence,
         source=source,
-        timestamp=datetime.now().isoformat()
+        timestamp=datetime.now().isoformat(),
+        kb_version=snapshot.version
     )
 
 # Дополнительные эндпоинты
@@ -768,6 +780,33 @@ async def health_check():
     """Проверка здоровья сервиса"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Статистика кэшей поиска"""
+    keyword_scorer = kb_reloader.snapshot.value.keyword_scorer
+    return {
+        "query_cache": query_cache.stats(),
+        "word_stemmer": word_stemmer.cache_info(),
+        "keyword_scorer": keyword_scorer.cache_info() if keyword_scorer is not None else None,
+        "kb": kb_reloader.stats(),
+        "language_detector": language_detector.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/admin/kb/reload")
+async def reload_kb(x_admin_token: Optional[str] = Header(None)):
+    """Перезагрузка базы знаний (заголовок X-Admin-Token; без ADMIN_TOKEN эндпоинт отключен)"""
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    
+    reloaded = await run_in_threadpool(kb_reloader.reload)
+    if not reloaded:
+        raise HTTPException(status_code=500, detail=f"Не удалось перезагрузить базу знаний: {kb_reloader.last_error}")
+    return {"status": "reloaded", "kb": kb_reloader.stats(), "timestamp": datetime.now().isoformat()}
+
 @app.get("/webapp")
 async def webapp():
     """Возвращает веб-приложение"""
@@ -0,0 +1,220 @@
+"""
+Кэш результатов запросов /chat.
+
+Ключ - текст запроса после preprocess_text, приведенный к нижнему регистру
+со схлопнутыми пробелами. Значение - интент, номер найденного FAQ и
+уверенность. Записи живут ограниченное время (TTL), вытесняются по LRU и
+автоматически сбрасываются при изменении файла базы знаний.
+
+Вторым уровнем может быть подключен общий кэш (shared_cache.CacheBackend):
+ключи в нем включают хэш содержимого базы знаний, поэтому все воркеры
+видят одни и те же записи и не получают устаревшие после правки базы.
+Обращение к общему кэшу сетевое и блокирующее: из async эндпоинтов
+используются aget/aset, которые выполняют его в пуле потоков, а
+локальный уровень проверяют сразу.
+"""
+
+import os
+import json
+import asyncio
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from shared_cache import CacheBackend
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query_key(text: str) -> str:
+    """Нормализует текст запроса для ключа кэша: нижний регистр и одиночные пробелы"""
+    return ' '.join(text.lower().split())
+
+
+class KBFileVersion:
+    """Версия базы знаний по mtime/размеру файлов (проверка не чаще check_interval секунд)"""
+
+    def __init__(self, paths: List[str], check_interval: float = 1.0):
+        self.paths = [path for path in paths if path]
+        self.check_interval = check_interval
+        self.version = 0
+        self._signature = self._read_signature()
+        self.fingerprint = self._read_fingerprint()
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _read_signature(self) -> Tuple:
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def _read_fingerprint(self) -> str:
+        """Хэш содержимого файлов (одинаков у всех воркеров и реплик)"""
+        digest = hashlib.sha1()
+        for path in self.paths:
+            try:
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(b'-')
+        return digest.hexdigest()[:16]
+
+    def current(self) -> int:
+        """Возвращает номер версии, увеличивая его при изменении файлов"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self.version
+
+        with self._lock:
+            if now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                signature = self._read_signature()
+                if signature != self._signature:
+                    self._signature = signature
+                    self.fingerprint = self._read_fingerprint()
+                    self.version += 1
+                    logger.info(f"🔄 База знаний изменилась, версия {self.version}")
+        return self.version
+
+
+class QueryCache:
+    """LRU/TTL кэш результатов запросов с инвалидацией по версии базы знаний"""
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 3600.0,
+                 kb_version: Optional[KBFileVersion] = None,
+                 shared: Optional[CacheBackend] = None, namespace: str = "faq"):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.kb_version = kb_version
+        self.shared = shared
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._version = kb_version.current() if kb_version else 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        """Сбрасывает кэш, если изменилась версия базы знаний (вызывается под блокировкой)"""
+        if self.kb_version is None:
+            return
+        version = self.kb_version.current()
+        if version != self._version:
+            self._version = version
+            self._entries.clear()
+            self.invalidations += 1
+
+    def _shared_key(self, key: str) -> str:
+        fingerprint = self.kb_version.fingerprint if self.kb_version else "static"
+        return f"aparu:{self.namespace}:{fingerprint}:{key}"
+
+    def _store_local(self, key: str, value: Dict[str, Any]):
+        """Сохраняет запись в локальном LRU (вызывается под блокировкой)"""
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            if self.shared is None:
+                self.misses += 1
+        return None
+
+    def _get_shared(self, key: str) -> Optional[Dict[str, Any]]:
+        """Второй уровень: общий кэш воркеров (сетевой вызов - вне блокировки)"""
+        raw = self.shared.get(self._shared_key(key))
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            value = json.loads(raw)
+            self._store_local(key, value)
+            self.shared_hits += 1
+        return value
+
+    def _set_local(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._check_version()
+            self._store_local(key, value)
+
+    def _set_shared(self, key: str, value: Dict[str, Any]):
+        self.shared.set(self._shared_key(key), json.dumps(value, ensure_ascii=False), self.ttl_seconds)
+
+    def get(self, text: str) -> Optional[Dict[str, Any]]:
+        """Возвращает закэшированный результат или None"""
+        key = normalize_query_key(text)
+        value = self._get_local(key)
+        if value is None and self.shared is not None:
+            value = self._get_shared(key)
+        return value
+
+    def set(self, text: str, value: Dict[str, Any]):
+        """Сохраняет результат запроса"""
+        key = normalize_query_key(text)
+        self._set_local(key, value)
+        if self.shared is not None:
+            self._set_shared(key, value)
+
+    async def aget(self, text: str) -> Optional[Dict[str, Any]]:
+        """get для async кода: общий кэш опрашивается в пуле потоков"""
+        key = normalize_query_key(text)
+        value = self._get_local(key)
+        if value is None and self.shared is not None:
+            value = await asyncio.to_thread(self._get_shared, key)
+        return value
+
+    async def aset(self, text: str, value: Dict[str, Any]):
+        """set для async кода: запись в общий кэш в пуле потоков"""
+        key = normalize_query_key(text)
+        self._set_local(key, value)
+        if self.shared is not None:
+            await asyncio.to_thread(self._set_shared, key, value)
+
+    def clear(self):
+        """Полностью очищает кэш"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кэша для эндпоинта"""
+        with self._lock:
+            total = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.shared_hits) / total if total else 0.0,
+                'shared': type(self.shared).__name__ if self.shared is not None else None,
+                'shared_available': getattr(self.shared, 'available', self.shared is not None),
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'kb_version': self._version
+            }
+
+
+__all__ = ['QueryCache', 'KBFileVersion', 'normalize_query_key']
@@ -0,0 +1,377 @@
+"""
+Общий (между воркерами) уровень кэша: запрос -> ответ и ответы LLM.
+
+- CacheBackend - минимальный интерфейс: get/set/delete и пакетные
+  get_many/set_many.
+- InMemoryCacheBackend - в памяти процесса (тесты, один воркер).
+- RedisCacheBackend - Redis-совместимый клиент по протоколу RESP без
+  внешних зависимостей; пакетные операции отправляются одним конвейером
+  (pipeline). Работает и с настоящим Redis, и с LocalCacheServer.
+- LocalCacheServer - локальный TCP-сервер с подмножеством команд Redis
+  (PING, GET, SET EX/PX, MGET, DEL, DBSIZE, FLUSHDB) для офлайн-запуска:
+  python backend/shared_cache.py --port 6380
+
+Ошибки сети не ломают запросы: операция считается промахом и логируется.
+После сетевой ошибки RedisCacheBackend размыкает цепь (circuit breaker):
+SHARED_CACHE_RETRY_AFTER секунд общий кэш пропускается без обращения к
+сокету, затем следующий запрос пробует подключиться снова. Вызовы
+блокирующие - из async кода их выполняют в пуле потоков.
+"""
+
+import os
+import time
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд пропускать общий кэш после сетевой ошибки
+DEFAULT_RETRY_AFTER = float(os.environ.get("SHARED_CACHE_RETRY_AFTER", 30.0))
+
+
+class CacheBackend:
+    """Интерфейс общего кэша (значения - строки)"""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None):
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    def close(self):
+        pass
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Кэш в памяти процесса с TTL"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._alive(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def delete(self, key: str) -> int:
+        with self._lock:
+            return 1 if self._data.pop(key, None) is not None else 0
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        with self._lock:
+            return [self._alive(key) for key in keys]
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(1 for key in list(self._data) if self._alive(key) is not None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RESPError(Exception):
+    """Ошибка, возвращенная сервером по протоколу RESP"""
+
+
+def _encode_command(*args) -> bytes:
+    """Кодирует команду как массив bulk-строк RESP"""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+def _read_reply(stream):
+    """Читает один ответ RESP из файлового объекта"""
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Соединение с кэшем закрыто")
+    prefix, payload = line[:1], line[1:-2]
+    if prefix == b'+':
+        return payload.decode('utf-8')
+    if prefix == b'-':
+        return RESPError(payload.decode('utf-8'))
+    if prefix == b':':
+        return int(payload)
+    if prefix == b'$':
+        length = int(payload)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2].decode('utf-8')
+    if prefix == b'*':
+        count = int(payload)
+        if count < 0:
+            return None
+        return [_read_reply(stream) for _ in range(count)]
+    raise ConnectionError(f"Неизвестный ответ RESP: {line!r}")
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis-совместимый клиент (RESP) с конвейерными пакетными операциями"""
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 0.5,
+                 retry_after: float = DEFAULT_RETRY_AFTER):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._sock: Optional[socket.socket] = None
+        self._stream = None
+        self._lock = threading.Lock()
+        # Цепь разомкнута до этого момента (time.monotonic): кэш пропускается
+        self._open_until = 0.0
+        self.failures = 0
+        self.skipped = 0
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._stream = sock.makefile('rb')
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            self._send(setup)
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._stream.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._stream = None
+
+    def _send(self, commands: List[tuple]) -> list:
+        """Отправляет команды одним пакетом и читает все ответы"""
+        self._sock.sendall(b''.join(_encode_command(*command) for command in commands))
+        replies = [_read_reply(self._stream) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RESPError):
+                raise reply
+        return replies
+
+    @property
+    def available(self) -> bool:
+        """False, пока цепь разомкнута после сетевой ошибки"""
+        return time.monotonic() >= self._open_until
+
+    def execute(self, commands: List[tuple]) -> Optional[list]:
+        """Выполняет конвейер команд; при сетевой ошибке или разомкнутой цепи возвращает None"""
+        # Проверка до блокировки: запросы не ждут, пока другой поток упирается в таймаут
+        if not self.available:
+            self.skipped += 1
+            return None
+        with self._lock:
+            if not self.available:
+                self.skipped += 1
+                return None
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._send(commands)
+                except (OSError, ConnectionError) as e:
+                    self._disconnect()
+                    if attempt:
+                        self._open_until = time.monotonic() + self.retry_after
+                        self.failures += 1
+                        logger.warning(f"⚠️ Общий кэш {self.host}:{self.port} недоступен, "
+                                       f"пропускается {self.retry_after:.0f}с: {e}")
+                except RESPError as e:
+                    logger.warning(f"⚠️ Ошибка общего кэша: {e}")
+                    return None
+        return None
+
+    def ping(self) -> bool:
+        replies = self.execute([('PING',)])
+        return bool(replies) and replies[0] == 'PONG'
+
+    def get(self, key: str) -> Optional[str]:
+        replies = self.execute([('GET', key)])
+        return replies[0] if replies else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self.execute([self._set_command(key, value, ttl)])
+
+    def delete(self, key: str) -> int:
+        replies = self.execute([('DEL', key)])
+        return replies[0] if replies else 0
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        replies = self.execute([('MGET', *keys)])
+        return replies[0] if replies else [None] * len(keys)
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None):
+        if items:
+            self.execute([self._set_command(key, value, ttl) for key, value in items.items()])
+
+    @staticmethod
+    def _set_command(key: str, value: str, ttl: Optional[float]) -> tuple:
+        if ttl:
+            return ('SET', key, value, 'PX', int(ttl * 1000))
+        return ('SET', key, value)
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+    """Обработчик подмножества команд Redis для LocalCacheServer"""
+
+    def handle(self):
+        store: InMemoryCacheBackend = self.server.store
+        while True:
+            try:
+                command = _read_reply(self.rfile)
+            except (ConnectionError, OSError, ValueError):
+                return
+            if not isinstance(command, list) or not command:
+                self._write_error("ERR protocol error")
+                continue
+            name, args = command[0].upper(), command[1:]
+            try:
+                self._dispatch(store, name, args)
+            except (IndexError, ValueError):
+                self._write_error(f"ERR wrong arguments for '{name.lower()}' command")
+
+    def _dispatch(self, store: InMemoryCacheBackend, name: str, args: list):
+        if name == 'PING':
+            self.wfile.write(b'+PONG\r\n')
+        elif name in ('SELECT', 'AUTH'):
+            self.wfile.write(b'+OK\r\n')
+        elif name == 'GET':
+            self._write_bulk(store.get(args[0]))
+        elif name == 'SET':
+            ttl = None
+            options = [arg.upper() for arg in args[2::2]]
+            values = args[3::2]
+            for option, value in zip(options, values):
+                if option == 'EX':
+                    ttl = float(value)
+                elif option == 'PX':
+                    ttl = float(value) / 1000
+            store.set(args[0], args[1], ttl)
+            self.wfile.write(b'+OK\r\n')
+        elif name == 'MGET':
+            values = store.get_many(args)
+            self.wfile.write(b'*%d\r\n' % len(values))
+            for value in values:
+                self._write_bulk(value)
+        elif name == 'DEL':
+            self.wfile.write(b':%d\r\n' % sum(store.delete(key) for key in args))
+        elif name == 'DBSIZE':
+            self.wfile.write(b':%d\r\n' % store.size())
+        elif name == 'FLUSHDB':
+            store.clear()
+            self.wfile.write(b'+OK\r\n')
+        else:
+            self._write_error(f"ERR unknown command '{name.lower()}'")
+
+    def _write_bulk(self, value: Optional[str]):
+        if value is None:
+            self.wfile.write(b'$-1\r\n')
+        else:
+            data = value.encode('utf-8')
+            self.wfile.write(b'$%d\r\n%s\r\n' % (len(data), data))
+
+    def _write_error(self, message: str):
+        self.wfile.write(b'-%s\r\n' % message.encode('utf-8'))
+
+
+class LocalCacheServer(socketserver.ThreadingTCPServer):
+    """Локальная замена Redis для разработки и тестов"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6380):
+        super().__init__((host, port), _RESPHandler)
+        self.store = InMemoryCacheBackend()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def create_shared_cache(url: Optional[str]) -> Optional[CacheBackend]:
+    """
+    Создает общий кэш по URL (переменная SHARED_CACHE_URL):
+    redis://[:password@]host:port/db или memory://. Пустой URL - кэш отключен.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == 'memory':
+        return InMemoryCacheBackend()
+    if parsed.scheme == 'redis':
+        db = int(parsed.path.lstrip('/') or 0)
+        backend = RedisCacheBackend(parsed.hostname or 'localhost', parsed.port or 6379, db, parsed.password)
+        logger.info(f"✅ Общий кэш: redis://{backend.host}:{backend.port}/{db}")
+        return backend
+    logger.error(f"❌ Неизвестная схема общего кэша: {url}")
+    return None
+
+
+__all__ = ['CacheBackend', 'InMemoryCacheBackend', 'RedisCacheBackend', 'LocalCacheServer',
+           'create_shared_cache', 'DEFAULT_RETRY_AFTER']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальный Redis-совместимый кэш-сервер")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = LocalCacheServer(options.host, options.port)
+    logger.info(f"🚀 Локальный кэш-сервер: redis://{options.host}:{server.port}/0")
+    server.serve_forever()
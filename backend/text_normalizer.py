@@ -0,0 +1,141 @@
+"""
+Общая нормализация текста запросов и базы знаний.
+
+preprocess_text компилировал регулярку эмодзи на каждом вызове и делал еще
+два некомпилированных re.sub; normalize_text_advanced, normalize_text_simple
+и EnhancedMorphologicalAnalyzer.normalize_text повторяли свой конвейер
+lower -> re.sub(r'[^\\w\\s]') -> re.sub(r'\\s+') -> split. Здесь все это
+сведено к одному str.translate по таблице и одному split:
+
+- таблица переходов символов строится заранее для латиницы, кириллицы,
+  знаков препинания и частых символов/эмодзи: решение для символа
+  (удалить / заменить пробелом / оставить) вычисляется скомпилированными
+  регулярками один раз, дальше translate работает на C. Прочие символы
+  определяются на лету без кэширования, так что таблица не растет;
+- пробелы схлопываются через split(), семантика \\s и str.split совпадает.
+
+Результат совпадает с прежними функциями символ в символ.
+"""
+
+import re
+from typing import Iterable, List, Optional, Set
+
+# Эмодзи и пиктограммы (диапазоны прежнего preprocess_text)
+EMOJI_PATTERN = re.compile("["
+    u"\U0001F600-\U0001F64F"  # emoticons
+    u"\U0001F300-\U0001F5FF"  # symbols & pictographs
+    u"\U0001F680-\U0001F6FF"  # transport & map symbols
+    u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    u"\U00002702-\U000027B0"
+    u"\U000024C2-\U0001F251"
+    "]", flags=re.UNICODE)
+
+# Символы, которые clean_text удаляет (кроме букв, цифр, пробелов и -.,!?)
+SYMBOL_PATTERN = re.compile(r'[^\w\s\-.,!?]')
+
+# Символы, которые fold_words заменяет пробелом (все, кроме букв, цифр и пробелов)
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+# Разделитель текстов в пакетной нормализации: не буква и не пробел,
+# поэтому не склеивает и не разрывает слова соседних текстов
+_BATCH_SEPARATOR = '\x00'
+
+# Символы с заранее вычисленными решениями: латиница и кириллица,
+# общая пунктуация, символы и dingbats, пиктограммы и эмодзи
+_PREBUILT_RANGES = ((0x0000, 0x0530), (0x2000, 0x27C0), (0x1F300, 0x1F700))
+
+
+def _prebuilt_codepoints() -> Iterable[int]:
+    for start, stop in _PREBUILT_RANGES:
+        yield from range(start, stop)
+
+
+class _CleanTable(dict):
+    """Таблица translate для clean_text: эмодзи и спецсимволы удаляются"""
+
+    def __init__(self):
+        super().__init__((codepoint, self._resolve(codepoint)) for codepoint in _prebuilt_codepoints())
+
+    @staticmethod
+    def _resolve(codepoint: int) -> Optional[str]:
+        char = chr(codepoint)
+        return None if EMOJI_PATTERN.match(char) or SYMBOL_PATTERN.match(char) else char
+
+    def __missing__(self, codepoint: int) -> Optional[str]:
+        # Редкий символ: без записи в таблицу, чтобы ее размер оставался постоянным
+        return self._resolve(codepoint)
+
+
+class _FoldTable(dict):
+    """Таблица translate для fold_words: пунктуация и символы заменяются пробелом"""
+
+    def __init__(self, keep: str = ''):
+        super().__init__((codepoint, self._resolve(codepoint)) for codepoint in _prebuilt_codepoints())
+        self.update({ord(char): char for char in keep})
+
+    @staticmethod
+    def _resolve(codepoint: int) -> str:
+        char = chr(codepoint)
+        return ' ' if PUNCTUATION_PATTERN.match(char) else char
+
+    def __missing__(self, codepoint: int) -> str:
+        return self._resolve(codepoint)
+
+
+_CLEAN_TABLE = _CleanTable()
+_FOLD_TABLE = _FoldTable()
+_BATCH_FOLD_TABLE = _FoldTable(keep=_BATCH_SEPARATOR)
+
+
+def clean_text(text: str) -> str:
+    """Убирает эмодзи и спецсимволы, схлопывает пробелы (как прежний preprocess_text)"""
+    return ' '.join(text.translate(_CLEAN_TABLE).split())
+
+
+def fold_words(text: str) -> List[str]:
+    """Нижний регистр, пунктуация -> пробел, разбиение на слова"""
+    if not text:
+        return []
+    return text.lower().translate(_FOLD_TABLE).split()
+
+
+def _filter_words(words: List[str], stop_words: Set[str], min_length: int) -> List[str]:
+    if not stop_words and min_length <= 1:
+        return words
+    return [word for word in words if word not in stop_words and len(word) >= min_length]
+
+
+def normalize_words(text: str, stop_words: Optional[Set[str]] = None, min_length: int = 0) -> List[str]:
+    """Слова текста без стоп-слов и слов короче min_length"""
+    return _filter_words(fold_words(text), stop_words or set(), min_length)
+
+
+def normalize_text(text: str, stop_words: Optional[Set[str]] = None, min_length: int = 0) -> str:
+    """normalize_words, собранные обратно в строку через пробел"""
+    return ' '.join(normalize_words(text, stop_words, min_length))
+
+
+def normalize_many(texts: Iterable[str], stop_words: Optional[Set[str]] = None, min_length: int = 0) -> List[str]:
+    """
+    Пакетная normalize_text: lower и translate выполняются один раз для всех
+    текстов, склеенных через разделитель. Результат равен
+    [normalize_text(text, ...) for text in texts].
+    """
+    texts = [text or '' for text in texts]
+    if not texts:
+        return []
+    stop_words = stop_words or set()
+
+    joined = _BATCH_SEPARATOR.join(texts)
+    if joined.count(_BATCH_SEPARATOR) != len(texts) - 1:
+        # Разделитель встречается в самих текстах - нормализуем по одному
+        return [normalize_text(text, stop_words, min_length) for text in texts]
+
+    parts = joined.lower().translate(_BATCH_FOLD_TABLE).split(_BATCH_SEPARATOR)
+    return [' '.join(_filter_words(part.split(), stop_words, min_length)) for part in parts]
+
+
+__all__ = [
+    'EMOJI_PATTERN', 'SYMBOL_PATTERN', 'PUNCTUATION_PATTERN',
+    'clean_text', 'fold_words', 'normalize_words', 'normalize_text', 'normalize_many'
+]
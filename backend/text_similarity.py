@@ -0,0 +1,198 @@
+"""
+Общий движок схожести строк (расстояние Левенштейна) для поиска FAQ.
+
+- Ограниченное расстояние: вызывающему коду важно только, превышает ли
+  схожесть порог (0.6/0.7/0.8/0.9), поэтому расчет прекращается, как только
+  расстояние гарантированно выходит за допустимую границу.
+- Короткие строки считаются битово-параллельным алгоритмом Майерса,
+  длинные - полосовой (banded) динамикой только по диагоналям |i - j| <= k.
+- Если установлен rapidfuzz, используется его C-реализация с тем же API.
+- batch_similarity сравнивает один запрос со всеми вариантами, переиспользуя
+  предвычисленные битовые маски запроса.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rf_levenshtein
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Максимальная длина строки-шаблона для алгоритма Майерса
+MYERS_MAX_LEN = 64
+
+
+class _MyersPattern:
+    """Предвычисленные битовые маски символов шаблона для алгоритма Майерса"""
+
+    __slots__ = ('text', 'length', 'peq', 'mask', 'high_bit')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        peq: Dict[str, int] = {}
+        for i, char in enumerate(text):
+            peq[char] = peq.get(char, 0) | (1 << i)
+        self.peq = peq
+        self.mask = (1 << self.length) - 1
+        self.high_bit = 1 << (self.length - 1) if self.length else 0
+
+    def distance(self, other: str, max_distance: Optional[int] = None) -> int:
+        """Расстояние Левенштейна до other (Hyyrö/Myers, по столбцу на символ)"""
+        m = self.length
+        if max_distance is not None and abs(m - len(other)) > max_distance:
+            return max_distance + 1
+        if m == 0:
+            return len(other)
+
+        peq, mask, high_bit = self.peq, self.mask, self.high_bit
+        pv, mv = mask, 0
+        score = m
+        remaining = len(other)
+
+        for char in other:
+            eq = peq.get(char, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | (~(xh | pv) & mask)
+            mh = pv & xh
+
+            if ph & high_bit:
+                score += 1
+            elif mh & high_bit:
+                score -= 1
+
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            pv = mh | (~(xv | ph) & mask)
+            mv = ph & xv
+
+            remaining -= 1
+            # Расстояние уменьшается максимум на 1 за символ
+            if max_distance is not None and score - remaining > max_distance:
+                return max_distance + 1
+
+        return score
+
+
+def _banded_distance(s1: str, s2: str, max_distance: int) -> int:
+    """Расстояние Левенштейна с ограничением: считаются только диагонали |i - j| <= max_distance"""
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    len1, len2 = len(s1), len(s2)
+    k = max_distance
+    big = k + 1
+
+    previous_row = [j if j <= k else big for j in range(len2 + 1)]
+    for i in range(1, len1 + 1):
+        c1 = s1[i - 1]
+        lo = max(1, i - k)
+        hi = min(len2, i + k)
+        current_row = [big] * (len2 + 1)
+        current_row[0] = i if i <= k else big
+        row_min = current_row[0]
+        for j in range(lo, hi + 1):
+            cost = previous_row[j - 1] + (c1 != s2[j - 1])
+            insertion = previous_row[j] + 1
+            deletion = current_row[j - 1] + 1
+            value = min(cost, insertion, deletion)
+            if value > big:
+                value = big
+            current_row[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > k:
+            return big
+        previous_row = current_row
+
+    return min(previous_row[len2], big)
+
+
+def levenshtein_distance(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """
+    Расстояние Левенштейна между строками.
+    Если задан max_distance и расстояние его превышает, возвращается max_distance + 1.
+    """
+    if s1 == s2:
+        return 0
+    if max_distance is not None and abs(len(s1) - len(s2)) > max_distance:
+        return max_distance + 1
+
+    if RAPIDFUZZ_AVAILABLE:
+        return _rf_levenshtein.distance(s1, s2, score_cutoff=max_distance)
+
+    shorter, longer = (s1, s2) if len(s1) <= len(s2) else (s2, s1)
+    if len(shorter) <= MYERS_MAX_LEN or max_distance is None:
+        return _MyersPattern(shorter).distance(longer, max_distance)
+    return _banded_distance(s1, s2, max_distance)
+
+
+def _max_distance_for(max_len: int, min_similarity: float) -> Optional[int]:
+    """Максимальное расстояние, при котором схожесть еще может достигать min_similarity"""
+    if min_similarity <= 0:
+        return None
+    # +1 - запас на округление: точное значение все равно пересчитывается
+    return int((1 - min_similarity) * max_len) + 1
+
+
+def similarity_ratio(s1: str, s2: str, min_similarity: float = 0.0) -> float:
+    """
+    Нормализованная схожесть 1 - distance / max_len.
+    Если схожесть заведомо ниже min_similarity, возвращается 0.0 без полного расчета.
+    """
+    if not s1 or not s2:
+        return 0.0
+    if s1 == s2:
+        return 1.0
+
+    max_len = max(len(s1), len(s2))
+    max_distance = _max_distance_for(max_len, min_similarity)
+    distance = levenshtein_distance(s1, s2, max_distance)
+    if max_distance is not None and distance > max_distance:
+        return 0.0
+
+    return max(0.0, 1 - (distance / max_len))
+
+
+def batch_similarity(query: str, candidates: List[str], min_similarity: float = 0.0) -> List[float]:
+    """Схожесть запроса с каждым кандидатом (маски запроса строятся один раз)"""
+    if not query:
+        return [0.0] * len(candidates)
+
+    pattern = None
+    if not RAPIDFUZZ_AVAILABLE and len(query) <= MYERS_MAX_LEN:
+        pattern = _MyersPattern(query)
+
+    results = []
+    for candidate in candidates:
+        if not candidate:
+            results.append(0.0)
+            continue
+        if candidate == query:
+            results.append(1.0)
+            continue
+
+        max_len = max(len(query), len(candidate))
+        max_distance = _max_distance_for(max_len, min_similarity)
+        if max_distance is not None and abs(len(query) - len(candidate)) > max_distance:
+            results.append(0.0)
+            continue
+
+        if pattern is not None:
+            distance = pattern.distance(candidate, max_distance)
+        else:
+            distance = levenshtein_distance(query, candidate, max_distance)
+
+        if max_distance is not None and distance > max_distance:
+            results.append(0.0)
+        else:
+            results.append(max(0.0, 1 - (distance / max_len)))
+
+    return results
+
+
+__all__ = ['levenshtein_distance', 'similarity_ratio', 'batch_similarity', 'RAPIDFUZZ_AVAILABLE']
@@ -0,0 +1,147 @@
+"""
+Мемоизированный стеммер для extract_word_root.
+
+Словарь особых случаев, окончания и приставки компилируются один раз в
+обратное (суффиксное) и прямое (префиксное) деревья. Корни слов из базы
+знаний закрепляются при построении FAQ индекса, остальные слова
+кэшируются в ограниченном LRU.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Специальные случаи для конкретных слов
+SPECIAL_CASES = {
+    'доставка': 'достав', 'доставки': 'достав', 'доставку': 'достав', 'доставке': 'достав',
+    'доставщик': 'достав', 'доставщица': 'достав', 'доставлять': 'достав',
+    'передоставка': 'достав', 'поддоставка': 'достав',
+    'водитель': 'води', 'водители': 'води', 'водительница': 'води', 'водить': 'води',
+    'водит': 'води', 'водила': 'води', 'водило': 'води', 'водили': 'води',
+    'заказ': 'заказ', 'заказы': 'заказ', 'заказывать': 'заказ', 'заказчик': 'заказ',
+    'заказчица': 'заказ', 'перезаказ': 'заказ', 'подзаказ': 'заказ',
+    'ценообразование': 'цен', 'переоценка': 'цен', 'оценка': 'цен',
+    'карточка': 'карт', 'картографический': 'карт', 'картограф': 'карт',
+    'балансировка': 'баланс', 'балансировать': 'баланс',
+    'тарификация': 'тариф', 'тарифицировать': 'тариф'
+}
+
+# Русские окончания
+RUSSIAN_ENDINGS = [
+    'оваться', 'иваться', 'еваться', 'аться', 'иться', 'еться', 'уться',
+    'ование', 'ирование', 'евание', 'ание', 'ение', 'ение',
+    'ский', 'ская', 'ское', 'ские', 'ского', 'ской', 'скую', 'ским', 'ском', 'ских', 'скими',
+    'ость', 'есть', 'ство', 'тель', 'тельница',
+    'ый', 'ая', 'ое', 'ые', 'ого', 'ой', 'ую', 'ым', 'ом', 'их', 'ыми',
+    'ия', 'ий', 'ие', 'ию', 'ием', 'ии', 'иями', 'иях',
+    'ик', 'иц', 'ич', 'ищ', 'ник', 'ниц', 'щик', 'щиц',
+    'а', 'о', 'у', 'ы', 'и', 'е', 'ю', 'ем', 'ом', 'ах', 'ями', 'ях',
+    'ть', 'ти', 'л', 'ла', 'ло', 'ли', 'н', 'на', 'но', 'ны'
+]
+
+# Приставки
+PREFIXES = [
+    'пере', 'пред', 'под', 'над', 'при', 'раз', 'рас', 'из', 'ис',
+    'от', 'об', 'в', 'во', 'за', 'на', 'до', 'по', 'со', 'вы', 'у'
+]
+
+# Маркер конца аффикса в узле дерева
+_END = ''
+
+
+def _build_trie(affixes: Iterable[str]) -> Dict:
+    """Строит дерево символов: в узле с ключом _END хранится длина аффикса"""
+    trie: Dict = {}
+    for affix in affixes:
+        node = trie
+        for char in affix:
+            node = node.setdefault(char, {})
+        node[_END] = len(affix)
+    return trie
+
+
+def _match_lengths(trie: Dict, chars: Iterable[str]) -> List[int]:
+    """Длины всех аффиксов из дерева, совпавших с началом последовательности chars"""
+    lengths = []
+    node = trie
+    for char in chars:
+        node = node.get(char)
+        if node is None:
+            break
+        if _END in node:
+            lengths.append(node[_END])
+    return lengths
+
+
+class WordStemmer:
+    """Стеммер с суффиксным/префиксным деревьями и LRU-кэшем корней"""
+
+    def __init__(self, cache_size: int = 50000):
+        self.special_cases = dict(SPECIAL_CASES)
+        # Окончания хранятся в обратном порядке символов
+        self.suffix_trie = _build_trie(ending[::-1] for ending in RUSSIAN_ENDINGS)
+        self.prefix_trie = _build_trie(PREFIXES)
+
+        # Закрепленные корни словаря базы знаний (не вытесняются из кэша)
+        self.pinned: Dict[str, str] = {}
+        self._cached_stem = lru_cache(maxsize=cache_size)(self._stem)
+
+    def _stem(self, word: str) -> str:
+        """Извлекает корень слова, убирая окончания, суффиксы и приставки"""
+        if len(word) < 4:
+            return word
+
+        root = word.lower()
+
+        if root in self.special_cases:
+            return self.special_cases[root]
+
+        # Убираем самое длинное окончание, после которого остается больше 2 символов
+        for length in reversed(_match_lengths(self.suffix_trie, reversed(root))):
+            if len(root) > length + 2:
+                root = root[:-length]
+                break
+
+        # Убираем самую длинную приставку, после которой остается больше 3 символов
+        for length in reversed(_match_lengths(self.prefix_trie, root)):
+            if len(root) > length + 3:
+                root = root[length:]
+                break
+
+        # Минимальная длина корня
+        return root if len(root) >= 3 else word.lower()
+
+    def stem(self, word: str) -> str:
+        """Возвращает корень слова (из закрепленного словаря или LRU-кэша)"""
+        root = self.pinned.get(word)
+        if root is None:
+            root = self._cached_stem(word)
+        return root
+
+    def pin(self, roots: Dict[str, str]):
+        """
+        Закрепляет предвычисленные корни словаря базы знаний вместо прежних:
+        при перезагрузке базы закреплен только словарь нового снимка
+        """
+        # Замена словаря целиком атомарна для параллельных вызовов stem
+        self.pinned = dict(roots)
+        logger.info(f"✅ Закреплено корней словаря: {len(self.pinned)}")
+
+    def cache_info(self) -> Dict[str, int]:
+        """Статистика кэша корней"""
+        info = self._cached_stem.cache_info()
+        return {
+            'pinned': len(self.pinned),
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'max_size': info.maxsize
+        }
+
+
+# Глобальный экземпляр стеммера
+word_stemmer = WordStemmer()
+
+__all__ = ['WordStemmer', 'word_stemmer']
@@ -1,5 +1,8 @@
 import asyncio
+import json
+import time
 import logging
+from typing import AsyncIterator, Dict, Any, Tuple
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
@@ -15,6 +18,12 @@ BOT_TOKEN = os.getenv("BOT_TOKEN", "YOUR_BOT_TOKEN_HERE")
 # URL вашего FastAPI сервера
 API_URL = os.getenv("API_URL", "https://taxi-support-ai-assistant-production.up.railway.app")
 
+# Потоковые ответы через /chat/stream: сообщение дописывается по мере генерации
+# Включать, только если API_URL отдает /chat/stream (local_llm_server, hybrid_main)
+USE_STREAMING = os.getenv("USE_STREAMING", "false").lower() == "true"
+# Минимальный интервал между правками сообщения (лимиты Telegram API)
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", 1.0))
+
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
 
@@ -79,6 +88,92 @@ async def support_handler(message: types.Message):
         reply_markup=keyboard
     )
 
+def add_source_label(response_text: str, source: str) -> str:
+    """Добавляет информацию об источнике ответа"""
+    if source == "kb":
+        response_text += "\n\n📚 Ответ из базы знаний"
+    elif source == "llm":
+        response_text += "\n\n🤖 Ответ от ИИ"
+    return response_text
+
+async def iter_sse_events(response) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Разбирает поток Server-Sent Events на пары (event, data)"""
+    event = "message"
+    async for raw_line in response.content:
+        line = raw_line.decode("utf-8").rstrip("\r\n")
+        if not line:
+            event = "message"
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[5:].strip())
+
+async def stream_answer(session, message: types.Message, payload: Dict[str, Any]) -> bool:
+    """
+    Запрашивает потоковый ответ и редактирует сообщение по мере прихода токенов.
+    Возвращает False, если ответ не начал приходить (сервер не поддерживает
+    /chat/stream или недоступен) - тогда вызывающий код обращается к /chat.
+    """
+    import aiohttp
+    
+    sent = None
+    text = ""
+    # Строка, которая сейчас видна пользователю (вместе с курсором)
+    shown = ""
+    last_edit = 0.0
+    final_text = None
+    source = "unknown"
+    
+    try:
+        async with session.post(
+            f"{API_URL}/chat/stream",
+            json=payload,
+            headers={"Content-Type": "application/json", "Accept": "text/event-stream"}
+        ) as response:
+            if response.status in (404, 405):
+                return False
+            if response.status != 200:
+                await message.answer("Извините, произошла ошибка при обработке запроса.")
+                return True
+            
+            async for event, data in iter_sse_events(response):
+                if event == "token":
+                    text += data.get("text", "")
+                    if not text.strip():
+                        continue
+                    # Первый токен - сразу новое сообщение, дальше правки не чаще STREAM_EDIT_INTERVAL
+                    if sent is None:
+                        shown = text.strip()
+                        sent = await message.answer(shown)
+                        last_edit = time.monotonic()
+                    elif time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL and text.strip() + " ▌" != shown:
+                        try:
+                            await sent.edit_text(text.strip() + " ▌")
+                            shown = text.strip() + " ▌"
+                        except Exception as e:
+                            logger.debug(f"Не удалось обновить сообщение: {e}")
+                        last_edit = time.monotonic()
+                elif event == "done":
+                    final_text = data.get("response") or text.strip()
+                    source = data.get("source", source)
+                elif event == "error":
+                    logger.error(f"Ошибка потока ответа: {data.get('message')}")
+                    final_text = text.strip() or "Извините, не удалось получить ответ."
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        if sent is None:
+            logger.warning(f"⚠️ Потоковый ответ недоступен, используем /chat: {e}")
+            return False
+        # Поток оборвался после первых токенов - оставляем то, что успели показать
+        logger.error(f"Поток ответа оборвался: {e}")
+    
+    final_text = add_source_label(final_text or text.strip() or "Извините, не удалось получить ответ.", source)
+    if sent is None:
+        await message.answer(final_text)
+    elif final_text != shown:
+        # Финальная правка обязательна, если на экране остался курсор
+        await sent.edit_text(final_text)
+    return True
+
 @dp.message()
 async def text_handler(message: types.Message):
     """Обработчик текстовых сообщений - обрабатывает через API"""
@@ -86,16 +181,22 @@ async def text_handler(message: types.Message):
         # Показываем индикатор печати
         await bot.send_chat_action(message.chat.id, "typing")
         
+        payload = {
+            "text": message.text,
+            "user_id": str(message.from_user.id),
+            "locale": message.from_user.language_code or "RU"
+        }
+        
         # Отправляем запрос к API
         import aiohttp
         async with aiohttp.ClientSession() as session:
+            # Потоковый ответ: пользователь видит текст с первого токена
+            if USE_STREAMING and await stream_answer(session, message, payload):
+                return
+            
             async with session.post(
                 f"{API_URL}/chat",
-                json={
-                    "text": message.text,
-                    "user_id": str(message.from_user.id),
-                    "locale": message.from_user.language_code or "RU"
-                },
+                json=payload,
                 headers={"Content-Type": "application/json"}
             ) as response:
                 if response.status == 200:
@@ -103,11 +204,7 @@ async def text_handler(message: types.Message):
                     response_text = data.get("response", "Извините, не удалось получить ответ.")
                     
                     # Добавляем информацию об источнике ответа
-                    source = data.get("source", "unknown")
-                    if source == "kb":
-                        response_text += "\n\n📚 Ответ из базы знаний"
-                    elif source == "llm":
-                        response_text += "\n\n🤖 Ответ от ИИ"
+                    response_text = add_source_label(response_text, data.get("source", "unknown"))
                     
                     await message.answer(response_text)
                 else:
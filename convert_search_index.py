@@ -0,0 +1,83 @@
+"""
+Конвертер поискового индекса senior_ai_search_index.pkl (FAISS + pickle)
+в каталог senior_ai_search_index (memmap float32 + манифест, см. backend/embedding_store.py)
+
+Одноразовый переход без пересчета эмбеддингов: матрица question_embeddings
+из pickle уже построена SeniorAIParser в порядке базы знаний (вопрос пункта,
+затем его вариации), поэтому номера пунктов строк восстанавливаются по
+senior_ai_knowledge_base.json. Pickle загружается целиком - запускать только
+для собственного доверенного файла (для разбора нужен faiss).
+"""
+
+import os
+import sys
+import json
+import pickle
+import logging
+from typing import Dict, Set
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from embedding_store import EmbeddingStore, kb_hash
+
+EMBEDDINGS_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+def convert_search_index(pickle_path: str = "senior_ai_search_index.pkl",
+                         knowledge_base_path: str = "senior_ai_knowledge_base.json",
+                         output_path: str = "senior_ai_search_index") -> bool:
+    """Переносит матрицу эмбеддингов из pickle в формат EmbeddingStore"""
+    if not os.path.exists(pickle_path):
+        logger.error(f"Файл {pickle_path} не найден!")
+        return False
+
+    try:
+        with open(knowledge_base_path, 'r', encoding='utf-8') as f:
+            knowledge_base = json.load(f)
+        with open(pickle_path, 'rb') as f:
+            index_data = pickle.load(f)
+
+        embeddings = index_data['question_embeddings']
+        text_to_item = index_data['text_to_item']
+
+        # Строки матрицы - тексты пунктов в порядке базы знаний
+        texts, row_to_item_id = [], []
+        for item_id, item in enumerate(knowledge_base):
+            for text in [item['question']] + item.get('variations', []):
+                texts.append(text)
+                row_to_item_id.append(item_id)
+
+        if len(texts) != len(embeddings):
+            logger.error(f"❌ В индексе {len(embeddings)} строк, в базе знаний {len(texts)} текстов")
+            return False
+        # Пункты базы, в которых встречается текст (один текст может быть у нескольких)
+        text_items: Dict[str, Set[int]] = {}
+        for text, item_id in zip(texts, row_to_item_id):
+            text_items.setdefault(text, set()).add(item_id)
+
+        for text in texts:
+            indexed = text_to_item.get(text)
+            if indexed is None or indexed.get('id') is None:
+                logger.error(f"❌ Текст '{text}' отсутствует в индексе: база знаний изменилась")
+                return False
+            # id пункта в pickle - номер с 1; другой пункт значит, что база переупорядочена
+            if indexed['id'] - 1 not in text_items[text]:
+                logger.error(f"❌ Текст '{text}' в индексе относится к пункту {indexed['id']}, "
+                             f"а в базе знаний - к {sorted(i + 1 for i in text_items[text])}")
+                return False
+
+        EmbeddingStore.save(output_path, embeddings, row_to_item_id,
+                            model=EMBEDDINGS_MODEL_NAME, kb=kb_hash(knowledge_base))
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Ошибка конвертации: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = convert_search_index(*sys.argv[1:2])
+    if success:
+        print("🎉 Конвертация завершена успешно!")
+    else:
+        print("❌ Ошибка конвертации!")
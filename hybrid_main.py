@@ -8,13 +8,16 @@ import json
 import re
 import logging
 import requests
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import os
 
+from ollama_async_client import get_ollama_client, normalize_question, stream_generate_sse, single_answer_sse, SSE_HEADERS
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -55,6 +58,11 @@ class HybridAIClient:
         self.local_model_url = os.environ.get("LOCAL_MODEL_URL", "https://32f43b95cbea.ngrok-free.app")
         self.model_name = "aparu-senior-ai"
         self.local_available = False
+        self.ollama = get_ollama_client(
+            self.local_model_url,
+            timeout=120,  # Увеличиваем таймаут для LLM
+            headers={"ngrok-skip-browser-warning": "true"}
+        )
         
         # Проверяем доступность локальной модели
         self._check_local_model()
@@ -75,7 +83,7 @@ class HybridAIClient:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к локальной модели: {e}")
     
-    def get_answer(self, question: str) -> Dict[str, Any]:
+    async def get_answer(self, question: str) -> Dict[str, Any]:
         """Получает ответ от гибридной системы"""
         start_time = datetime.now()
         
@@ -83,8 +91,8 @@ class HybridAIClient:
         if self.local_available:
             try:
                 logger.info("🧠 Запрашиваем ответ от локальной LLM модели...")
-                response = self._query_local_llm(question)
-                if response and response.get('response'):
+                response = await self._query_local_llm(question)
+                if response and response.get('answer'):
                     processing_time = (datetime.now() - start_time).total_seconds()
                     logger.info(f"✅ LLM ответ получен за {processing_time:.2f}с")
                     return response
@@ -95,11 +103,10 @@ class HybridAIClient:
         logger.info("🔄 Fallback к простому поиску...")
         return self._simple_search(question)
     
-    def _query_local_llm(self, question: str) -> Dict[str, Any]:
-        """Запрашивает ответ от локальной LLM модели"""
-        try:
-            # Системный промпт для APARU
-            system_prompt = """Ты — AI-ассистент службы поддержки такси-агрегатора APARU. 
+    def _build_payload(self, question: str) -> Dict[str, Any]:
+        """Собирает запрос к LLM (общий для обычного и потокового ответа)"""
+        # Системный промпт для APARU
+        system_prompt = """Ты — AI-ассистент службы поддержки такси-агрегатора APARU. 
 Отвечай на вопросы пользователей о:
 - Наценках и тарифах
 - Доставке и курьерских услугах  
@@ -107,43 +114,54 @@ class HybridAIClient:
 - Проблемах с приложением
 
 Отвечай кратко, вежливо и по существу. Если не знаешь ответ, предложи обратиться в службу поддержки."""
-            
-            payload = {
-                "model": self.model_name,
-                "prompt": f"{system_prompt}\n\nВопрос: {question}",
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "max_tokens": 500
-                }
+        
+        payload = {
+            "model": self.model_name,
+            "prompt": f"{system_prompt}\n\nВопрос: {normalize_question(question)}",
+            "stream": False,
+            "options": {
+                "temperature": 0.7,
+                "max_tokens": 500
             }
+        }
+        return payload
+    
+    async def _query_local_llm(self, question: str) -> Dict[str, Any]:
+        """Запрашивает ответ от локальной LLM модели"""
+        try:
+            payload = self._build_payload(question)
             
-            response = requests.post(
-                f"{self.local_model_url}/api/generate",
-                json=payload,
-                timeout=120,  # Увеличиваем таймаут для LLM
-                headers={"ngrok-skip-browser-warning": "true"}
+            data = await self.ollama.generate(
+                payload["model"], payload["prompt"], options=payload["options"]
             )
+            answer = data.get('response', '').strip()
             
-            if response.status_code == 200:
-                data = response.json()
-                answer = data.get('response', '').strip()
-                
-                if answer:
-                    return {
-                        "answer": answer,
-                        "category": "llm_generated",
-                        "confidence": 0.9,
-                        "source": "local_llm"
-                    }
+            if answer:
+                return {
+                    "answer": answer,
+                    "category": "llm_generated",
+                    "confidence": 0.9,
+                    "source": "local_llm"
+                }
             
-            logger.warning(f"⚠️ LLM вернул неожиданный ответ: {response.status_code}")
+            logger.warning(f"⚠️ LLM вернул пустой ответ")
             return None
             
         except Exception as e:
             logger.error(f"❌ Ошибка запроса к LLM: {e}")
             return None
     
+    def stream_answer(self, question: str) -> AsyncIterator[str]:
+        """Потоковый ответ LLM в формате SSE (fallback - простой поиск)"""
+        if not self.local_available:
+            result = self._simple_search(question)
+            return single_answer_sse(result["answer"], result["source"])
+        payload = self._build_payload(question)
+        return stream_generate_sse(
+            self.ollama, payload["model"], payload["prompt"], options=payload["options"],
+            source="local_llm", fallback=lambda: self._simple_search(question)
+        )
+    
     def _simple_search(self, question: str) -> Dict[str, Any]:
         """Простой поиск по ключевым словам (fallback)"""
         question_lower = question.lower()
@@ -195,11 +213,16 @@ async def health():
         timestamp=datetime.now().isoformat()
     )
 
+@app.get("/llm/stats")
+async def llm_stats():
+    """Статистика запросов к LLM (в том числе объединенных одинаковых запросов)"""
+    return hybrid_client.ollama.stats()
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Основной эндпоинт для чата"""
     try:
-        result = hybrid_client.get_answer(request.text)
+        result = await hybrid_client.get_answer(request.text)
         
         return ChatResponse(
             response=result["answer"],
@@ -221,6 +244,15 @@ async def chat(request: ChatRequest):
             suggestions=[]
         )
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Потоковый ответ: токены LLM по мере генерации (Server-Sent Events)"""
+    return StreamingResponse(
+        hybrid_client.stream_answer(request.text),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -1,9 +1,16 @@
 import json
+import asyncio
 import logging
-import requests
+import hashlib
 import os
+import sys
 from typing import Dict, Any, Optional
 
+# Общий кэш воркеров из backend/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from shared_cache import create_shared_cache
+from ollama_async_client import get_ollama_client, normalize_question, OllamaError
+
 logger = logging.getLogger(__name__)
 
 class LLMClient:
@@ -11,10 +18,15 @@ class LLMClient:
         self.use_ollama = use_ollama
         self.model_name = model_name
         
+        # Общий кэш ответов LLM: прогретый ответ одного воркера доступен всем
+        self.shared_cache = create_shared_cache(os.getenv("SHARED_CACHE_URL"))
+        self.cache_ttl = float(os.getenv("LLM_CACHE_TTL", 86400))
+        
         if use_ollama:
             # Проверяем переменные окружения для внешнего LLM
             self.llm_url = os.getenv("LLM_URL", "http://localhost:11434")
             self.ollama_url = f"{self.llm_url}/api/generate"
+            self.ollama = get_ollama_client(self.llm_url)
             self.llm_enabled = os.getenv("LLM_ENABLED", "true").lower() == "true"
             
             if not self.llm_enabled:
@@ -24,19 +36,19 @@ class LLMClient:
             # Fallback to simple responses without heavy ML libraries
             logger.warning("Heavy ML libraries not available, using fallback responses")
 
-    def generate_response(self, prompt: str, max_length: int = 200) -> str:
+    async def generate_response(self, prompt: str, max_length: int = 200) -> str:
         """Генерирует ответ от LLM модели"""
         try:
             if self.use_ollama:
-                return self._generate_with_ollama(prompt, max_length)
+                return await self._generate_with_ollama(prompt, max_length)
             else:
                 return self._generate_fallback(prompt)
         except Exception as e:
             logger.error(f"Ошибка генерации ответа: {e}")
             return "Извините, произошла ошибка при генерации ответа."
 
-    def _generate_with_ollama(self, prompt: str, max_length: int) -> str:
-        """Генерация через Ollama API"""
+    async def _generate_with_ollama(self, prompt: str, max_length: int) -> str:
+        """Генерация через Ollama API (неблокирующий общий клиент)"""
         try:
             payload = {
                 "model": self.model_name,
@@ -48,13 +60,24 @@ class LLMClient:
                 }
             }
             
-            response = requests.post(self.ollama_url, json=payload, timeout=30)
-            response.raise_for_status()
+            cache_key = None
+            if self.shared_cache is not None:
+                payload_hash = hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+                cache_key = f"aparu:llm:{payload_hash.hexdigest()}"
+                # Сетевой блокирующий вызов - в пуле потоков, не в цикле событий
+                cached = await asyncio.to_thread(self.shared_cache.get, cache_key)
+                if cached is not None:
+                    logger.info("⚡ Ответ LLM взят из общего кэша")
+                    return cached
             
-            result = response.json()
+            result = await self.ollama.generate(
+                payload["model"], payload["prompt"], options=payload["options"], timeout=30
+            )
+            if cache_key is not None and result.get("response"):
+                await asyncio.to_thread(self.shared_cache.set, cache_key, result["response"], self.cache_ttl)
             return result.get("response", "Не удалось получить ответ от модели.")
             
-        except requests.exceptions.RequestException as e:
+        except OllamaError as e:
             logger.error(f"Ошибка запроса к Ollama: {e}")
             return self._generate_fallback(prompt)
 
@@ -87,7 +110,7 @@ class LLMClient:
 - Для жалоб всегда предлагай эскалацию к человеку
 - Используй только русский, казахский или английский язык в зависимости от locale
 
-Запрос пользователя: {user_message}
+Запрос пользователя: {normalize_question(user_message)}
 
 Ответ:"""
 
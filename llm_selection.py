@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+🎯 ВЫБОР ОТВЕТА LLM ИЗ КОРОТКОГО СПИСКА КАНДИДАТОВ
+Вместо всей базы знаний в промпт попадают только top-k кандидатов,
+найденных лексическим индексом (токены, корни и префиксы корней из
+backend/faq_index.py). Инструкции вынесены в неизменный префикс промпта,
+поэтому Ollama переиспользует его KV-кэш между запросами; описания
+пунктов базы форматируются один раз при загрузке.
+"""
+
+import os
+import re
+import sys
+import math
+import logging
+from typing import Dict, Any, List, Optional
+
+# Лексический индекс и стеммер из backend/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from faq_index import FAQIndex, tokenize, ROOT_PREFIX_LEN
+from word_stemmer import word_stemmer
+
+from prompt_assembly import canonicalize, PREFIX_SEPARATOR
+from ollama_async_client import normalize_question
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHORTLIST_SIZE = int(os.environ.get("LLM_SHORTLIST_SIZE", 5))
+
+# Бюджет длины промпта в символах: при num_ctx 1024 и ~3 символах кириллицы
+# на токен промпт длиннее обрезался бы Ollama с начала, вместе с инструкциями
+DEFAULT_MAX_PROMPT_CHARS = int(os.environ.get("LLM_PROMPT_MAX_CHARS", 2800))
+
+DEFAULT_INSTRUCTIONS = """Ты — поисковая система для FAQ APARU. Твоя задача — выбрать готовый ответ из списка кандидатов.
+
+ИНСТРУКЦИИ:
+1. Сравни вопрос пользователя с вариациями вопросов и ключевыми словами кандидатов
+2. Верни ТОЛЬКО номер подходящего кандидата (например: "1", "2", "3")
+3. НЕ генерируй новый текст и НЕ объясняй свой выбор"""
+
+# Вес совпадения термина: слово, корень, префикс корня
+TERM_WEIGHTS = (1.0, 0.8, 0.5)
+
+_NUMBER_RE = re.compile(r'\d+')
+
+
+class KBCandidateSelector:
+    """Лексический shortlist базы знаний и промпт выбора ответа по номеру"""
+
+    def __init__(self, knowledge_base: List[Dict[str, Any]], top_k: int = DEFAULT_SHORTLIST_SIZE,
+                 instructions: str = DEFAULT_INSTRUCTIONS, answer_preview: int = 100,
+                 max_prompt_chars: int = DEFAULT_MAX_PROMPT_CHARS):
+        self.knowledge_base = knowledge_base
+        self.top_k = top_k
+        self.answer_preview = answer_preview
+        self.max_prompt_chars = max_prompt_chars
+
+        # Разные форматы баз знаний приводятся к полям FAQIndex
+        self.index = FAQIndex([self._as_faq_item(item) for item in knowledge_base], word_stemmer.stem)
+
+        total = len(knowledge_base)
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + total / len(ids)) for term, ids in self.index.postings.items()
+        }
+
+        # Неизменный (канонический) префикс промпта и готовые описания пунктов базы
+        self.prefix = canonicalize(instructions)
+        self.entries = [self._format_entry(item) for item in knowledge_base]
+
+        logger.info(f"✅ Shortlist для LLM: {total} пунктов базы, top-{top_k}")
+
+    @staticmethod
+    def _variations(item: Dict[str, Any]) -> List[str]:
+        variations = list(item.get("question_variations") or item.get("variations") or [])
+        question = item.get("question")
+        if question and question not in variations:
+            variations.insert(0, question)
+        return variations
+
+    def _as_faq_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "question_variations": self._variations(item),
+            "keywords": item.get("keywords", []),
+            "answer": item.get("answer", "")
+        }
+
+    def _format_entry(self, item: Dict[str, Any]) -> str:
+        answer = item.get("answer", "")
+        if len(answer) > self.answer_preview:
+            answer = answer[:self.answer_preview] + "..."
+        lines = [f"ВОПРОСЫ: {'; '.join(self._variations(item)[:3])}"]
+        keywords = item.get("keywords", [])
+        if keywords:
+            lines.append(f"   КЛЮЧЕВЫЕ СЛОВА: {', '.join(keywords[:5])}")
+        lines.append(f"   ОТВЕТ: {answer}")
+        return "\n".join(lines)
+
+    def shortlist(self, question: str, top_k: Optional[int] = None) -> List[int]:
+        """Номера пунктов базы (с 0), отсортированные по лексической близости к вопросу"""
+        top_k = top_k or self.top_k
+        question_lower = question.lower()
+        scores: Dict[int, float] = {}
+
+        for word in tokenize(question_lower):
+            root = self.index.root_of(word)
+            terms = [word, root]
+            if len(root) >= ROOT_PREFIX_LEN:
+                terms.append(root[:ROOT_PREFIX_LEN])
+
+            # Для каждого пункта учитывается лучший совпавший термин слова
+            best: Dict[int, float] = {}
+            for term, weight in zip(terms, TERM_WEIGHTS):
+                points = weight * self.idf.get(term, 0.0)
+                for idx in self.index.postings.get(term, ()):
+                    if points > best.get(idx, 0.0):
+                        best[idx] = points
+            for idx, points in best.items():
+                scores[idx] = scores.get(idx, 0.0) + points
+
+        # Ключевые фразы целиком в вопросе
+        for idx, keywords in enumerate(self.index.keywords):
+            for keyword in keywords:
+                if keyword and keyword in question_lower:
+                    scores[idx] = scores.get(idx, 0.0) + 1.0
+
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+        shortlist = [idx for idx, score in ranked[:top_k] if score > 0]
+
+        # Наименее близкие кандидаты отбрасываются, пока промпт не уложится в контекст
+        while len(shortlist) > 1 and len(self.build_prompt(question, shortlist)) > self.max_prompt_chars:
+            shortlist.pop()
+        return shortlist
+
+    def build_prompt(self, question: str, candidates: List[int]) -> str:
+        """Префикс + пронумерованные кандидаты + вопрос (вопрос в конце, чтобы префикс не менялся)"""
+        return self.prefix + PREFIX_SEPARATOR + self.build_body(question, candidates)
+
+    def build_body(self, question: str, candidates: List[int]) -> str:
+        """Переменная часть промпта: кандидаты и вопрос"""
+        parts = ["КАНДИДАТЫ:\n"]
+        for number, idx in enumerate(candidates, 1):
+            parts.append(f"{number}. {self.entries[idx]}\n")
+        parts.append(f"ВОПРОС ПОЛЬЗОВАТЕЛЯ: \"{normalize_question(question)}\"\n\nНомер ответа (1-{len(candidates)}):")
+        return "\n".join(parts)
+
+    def resolve(self, llm_answer: str, candidates: List[int]) -> Optional[int]:
+        """Номер пункта базы по ответу LLM (номер в списке кандидатов) или None"""
+        numbers = _NUMBER_RE.findall(llm_answer)
+        if not numbers:
+            return None
+        number = int(numbers[0])
+        if 1 <= number <= len(candidates):
+            return candidates[number - 1]
+        return None
+
+
+__all__ = ['KBCandidateSelector', 'DEFAULT_INSTRUCTIONS', 'DEFAULT_SHORTLIST_SIZE']
@@ -8,13 +8,19 @@ import json
 import re
 import logging
 import requests
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import os
 
+from ollama_async_client import (
+    get_ollama_client, normalize_question, OllamaTimeoutError, stream_generate_sse, single_answer_sse, SSE_HEADERS
+)
+from prompt_assembly import get_prompt_assembler
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -50,10 +56,47 @@ class HealthResponse(BaseModel):
     timestamp: str
 
 class LocalLLMClient:
+    # Оптимизированный системный промпт для быстрых ответов
+    SYSTEM_PROMPT = """Ты — AI-ассистент службы поддержки такси APARU.
+Отвечай КРАТКО и ТОЧНО на вопросы о:
+- Наценках и тарифах
+- Доставке и курьерских услугах
+- Балансе и платежах
+- Проблемах с приложением
+
+Правила:
+1. Отвечай только по существу
+2. Максимум 2-3 предложения
+3. Используй простые слова
+4. Если не знаешь - скажи "Обратитесь в поддержку"
+
+Примеры хороших ответов:
+- "Наценка - дополнительная плата за высокий спрос"
+- "Для доставки: приложение → Доставка → адреса → заказ"
+- "Пополнить баланс: Профиль → Пополнить → способ оплаты"
+- "Приложение не работает? Перезапустите и обновите\""""
+    
+    # УЛЬТРА-БЫСТРЫЕ параметры для максимальной скорости
+    LLM_OPTIONS = {
+        "temperature": 0.05,  # Минимальная температура
+        "num_predict": 50,    # Очень короткие ответы
+        "num_ctx": 512,       # Контекст вмещает системный префикс целиком
+        "repeat_penalty": 1.0,
+        "top_k": 5,           # Минимальный выбор
+        "top_p": 0.7,         # Минимальная вероятность
+        "stop": ["\n", ".", "!", "?", "Ответ:"]  # Ранние стоп-слова
+    }
+    
     def __init__(self):
         self.ollama_url = "http://localhost:11434"
         self.model_name = "aparu-senior-ai"
         self.llm_available = False
+        self.ollama = get_ollama_client(self.ollama_url)
+        # Стабильный системный префикс, keep_alive и прогрев модели
+        self.assembler = get_prompt_assembler(self.ollama)
+        self.system_prefix = self.assembler.register(
+            self.model_name, "local_llm", self.SYSTEM_PROMPT, self.LLM_OPTIONS
+        )
         
         # Проверяем доступность Ollama
         self._check_ollama()
@@ -70,7 +113,7 @@ class LocalLLMClient:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к Ollama: {e}")
     
-    def get_answer(self, question: str) -> Dict[str, Any]:
+    async def get_answer(self, question: str) -> Dict[str, Any]:
         """Получает ответ от LLM модели"""
         start_time = datetime.now()
         
@@ -78,8 +121,8 @@ class LocalLLMClient:
         if self.llm_available:
             try:
                 logger.info("🧠 Запрашиваем ответ от LLM модели...")
-                response = self._query_llm(question)
-                if response and response.get('response'):
+                response = await self._query_llm(question)
+                if response and response.get('answer'):
                     processing_time = (datetime.now() - start_time).total_seconds()
                     logger.info(f"✅ LLM ответ получен за {processing_time:.2f}с")
                     return response
@@ -90,73 +133,55 @@ class LocalLLMClient:
         logger.info("🔄 Fallback к простому поиску...")
         return self._simple_search(question)
     
-    def _query_llm(self, question: str) -> Dict[str, Any]:
+    def _build_payload(self, question: str) -> Dict[str, Any]:
+        """Собирает запрос к Ollama (общий для обычного и потокового ответа)"""
+        # Промпт = стабильный системный префикс + вопрос (префикс берется из KV-кэша)
+        return {
+            "model": self.model_name,
+            "prompt": self.assembler.build(self.system_prefix, f"{normalize_question(question)}:"),
+            "stream": False,
+            "options": self.system_prefix.options
+        }
+    
+    async def _query_llm(self, question: str) -> Dict[str, Any]:
         """Запрашивает оптимизированный ответ от LLM модели"""
         try:
-            # Оптимизированный системный промпт для быстрых ответов
-            system_prompt = """Ты — AI-ассистент службы поддержки такси APARU. 
-Отвечай КРАТКО и ТОЧНО на вопросы о:
-- Наценках и тарифах
-- Доставке и курьерских услугах  
-- Балансе и платежах
-- Проблемах с приложением
-
-Правила:
-1. Отвечай только по существу
-2. Максимум 2-3 предложения
-3. Используй простые слова
-4. Если не знаешь - скажи "Обратитесь в поддержку"
-
-Примеры хороших ответов:
-- "Наценка - дополнительная плата за высокий спрос"
-- "Для доставки: приложение → Доставка → адреса → заказ"
-- "Пополнить баланс: Профиль → Пополнить → способ оплаты"
-- "Приложение не работает? Перезапустите и обновите" """
-            
-            # УЛЬТРА-БЫСТРЫЕ параметры для максимальной скорости
-            payload = {
-                "model": self.model_name,
-                "prompt": f"{system_prompt}\n\n{question}:",
-                "stream": False,
-                "options": {
-                    "temperature": 0.05,  # Минимальная температура
-                    "num_predict": 50,    # Очень короткие ответы
-                    "num_ctx": 128,       # Минимальный контекст
-                    "repeat_penalty": 1.0,
-                    "top_k": 5,           # Минимальный выбор
-                    "top_p": 0.7,         # Минимальная вероятность
-                    "stop": ["\n", ".", "!", "?", "Ответ:"]  # Ранние стоп-слова
-                }
-            }
-            
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload,
+            data = await self.assembler.generate(
+                self.system_prefix, f"{normalize_question(question)}:", client=self.ollama,
                 timeout=15  # Максимально короткий таймаут
             )
+            answer = data.get('response', '').strip()
             
-            if response.status_code == 200:
-                data = response.json()
-                answer = data.get('response', '').strip()
-                
-                if answer:
-                    return {
-                        "answer": answer,
-                        "category": "llm_generated",
-                        "confidence": 0.95,
-                        "source": "ultra_fast_llm"
-                    }
+            if answer:
+                return {
+                    "answer": answer,
+                    "category": "llm_generated",
+                    "confidence": 0.95,
+                    "source": "ultra_fast_llm"
+                }
             
-            logger.warning(f"⚠️ LLM вернул неожиданный ответ: {response.status_code}")
+            logger.warning(f"⚠️ LLM вернул пустой ответ")
             return None
             
-        except requests.exceptions.Timeout:
+        except OllamaTimeoutError:
             logger.error(f"❌ LLM таймаут (>20с)")
             return None
         except Exception as e:
             logger.error(f"❌ Ошибка запроса к LLM: {e}")
             return None
     
+    def stream_answer(self, question: str) -> AsyncIterator[str]:
+        """Потоковый ответ LLM в формате SSE (fallback - простой поиск)"""
+        if not self.llm_available:
+            result = self._simple_search(question)
+            return single_answer_sse(result["answer"], result["source"])
+        payload = self._build_payload(question)
+        return stream_generate_sse(
+            self.ollama, payload["model"], payload["prompt"], options=payload["options"],
+            timeout=15, source="ultra_fast_llm", fallback=lambda: self._simple_search(question),
+            **self.assembler.request_options()
+        )
+    
     def _simple_search(self, question: str) -> Dict[str, Any]:
         """Простой поиск по ключевым словам (fallback)"""
         question_lower = question.lower()
@@ -190,6 +215,16 @@ class LocalLLMClient:
 # Глобальный экземпляр
 local_llm_client = LocalLLMClient()
 
+@app.on_event("startup")
+async def startup():
+    """Фоновый прогрев системного префикса (модель не выгружается при простое)"""
+    if local_llm_client.llm_available:
+        local_llm_client.assembler.start_warmup()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await local_llm_client.assembler.stop_warmup()
+
 @app.get("/")
 async def root():
     return {
@@ -208,11 +243,18 @@ async def health():
         timestamp=datetime.now().isoformat()
     )
 
+@app.get("/llm/stats")
+async def llm_stats():
+    """Статистика запросов к LLM (объединенные запросы, переиспользование префикса)"""
+    stats = local_llm_client.ollama.stats()
+    stats['prompt_assembly'] = local_llm_client.assembler.stats()
+    return stats
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Основной эндпоинт для чата"""
     try:
-        result = local_llm_client.get_answer(request.text)
+        result = await local_llm_client.get_answer(request.text)
         
         return ChatResponse(
             response=result["answer"],
@@ -234,6 +276,15 @@ async def chat(request: ChatRequest):
             suggestions=[]
         )
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Потоковый ответ: токены LLM по мере генерации (Server-Sent Events)"""
+    return StreamingResponse(
+        local_llm_client.stream_answer(request.text),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 if __name__ == "__main__":
     import uvicorn
     
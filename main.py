@@ -5,14 +5,24 @@
 """
 
 import json
+import hmac
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import os
+import sys
+
+# Общие модули поиска и кэширования из backend/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from query_cache import QueryCache, normalize_query_key
+from shared_cache import create_shared_cache
+from kb_reloader import KBReloader
+from keyword_automaton import KeywordAutomaton
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -42,6 +52,7 @@ class ChatResponse(BaseModel):
     source: str
     timestamp: str
     suggestions: List[str] = []
+    kb_version: int = 0  # версия снимка базы знаний, которым обработан запрос
 
 class HealthResponse(BaseModel):
     status: str
@@ -49,9 +60,12 @@ class HealthResponse(BaseModel):
     timestamp: str
 
 class RailwayOptimizedClient:
+    FALLBACK_ANSWER = "Извините, не могу найти ответ на ваш вопрос. Обратитесь в службу поддержки."
+    
     def __init__(self):
-        # Загружаем базу знаний
-        self.knowledge_base = self._load_knowledge_base()
+        # База знаний: снимок BZ.txt, при изменении файла перечитывается в фоне
+        # и публикуется заменой ссылки (запросы в работе дорабатывают на старом)
+        self.kb_reloader = KBReloader(["BZ.txt"], self._read_knowledge_base, initial=self._load_knowledge_base())
         
         # Морфологические формы для поиска
         self.morphological_forms = {
@@ -66,9 +80,35 @@ class RailwayOptimizedClient:
             "промокод": ["промокод", "промокода", "скидка", "скидки", "бонус", "бонуса"],
             "отмена": ["отмена", "отмены", "отменить", "отмены"]
         }
+        # Все формы ищутся за один проход по вопросу
+        self.morphological_automaton = KeywordAutomaton(self.morphological_forms)
+        
+        # Кэш результатов поиска (сбрасывается при публикации нового снимка BZ.txt),
+        # вторым уровнем - общий кэш воркеров, если задан SHARED_CACHE_URL
+        self.query_cache = QueryCache(
+            max_size=int(os.environ.get("QUERY_CACHE_SIZE", 2048)),
+            ttl_seconds=float(os.environ.get("QUERY_CACHE_TTL", 3600)),
+            kb_version=self.kb_reloader,
+            shared=create_shared_cache(os.environ.get("SHARED_CACHE_URL")),
+            namespace="bz"
+        )
         
         logger.info(f"✅ Загружена база знаний: {len(self.knowledge_base)} ответов")
     
+    @property
+    def knowledge_base(self) -> List[Dict[str, Any]]:
+        """База знаний текущего снимка"""
+        return self.kb_reloader.snapshot.value
+    
+    @staticmethod
+    def _read_knowledge_base() -> List[Dict[str, Any]]:
+        """Читает BZ.txt для перезагрузки: ошибка чтения оставляет прежний снимок"""
+        with open("BZ.txt", "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            raise ValueError("BZ.txt должен содержать список ответов")
+        return data
+    
     def _load_knowledge_base(self) -> List[Dict[str, Any]]:
         """Загружает базу знаний для поиска ответов"""
         try:
@@ -81,13 +121,46 @@ class RailwayOptimizedClient:
             return []
     
     def find_best_answer(self, question: str) -> Dict[str, Any]:
+        """Находит лучший ответ из базы знаний (повторные формулировки берутся из кэша)"""
+        question = normalize_query_key(question)
+        
+        # Снимок базы берется один раз на запрос; номер ответа в кэше относится
+        # к снимку с тем же fingerprint
+        snapshot = self.kb_reloader.snapshot
+        knowledge_base = snapshot.value
+        
+        cached = self.query_cache.get(question)
+        if cached is not None and cached.get("kb") == snapshot.fingerprint:
+            faq_id = cached["faq_id"]
+            return {
+                "answer": knowledge_base[faq_id].get("answer", "Ответ не найден") if faq_id is not None else self.FALLBACK_ANSWER,
+                "category": cached["intent"],
+                "confidence": cached["confidence"],
+                "source": cached["source"],
+                "faq_id": faq_id,
+                "kb_version": snapshot.version
+            }
+        
+        result = self._find_best_answer(question, knowledge_base)
+        if result["source"] != "error":
+            self.query_cache.set(question, {
+                "intent": result["category"],
+                "faq_id": result.get("faq_id"),
+                "confidence": result["confidence"],
+                "source": result["source"],
+                "kb": snapshot.fingerprint
+            })
+        result["kb_version"] = snapshot.version
+        return result
+    
+    def _find_best_answer(self, question: str, knowledge_base: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Находит лучший ответ из базы знаний"""
         start_time = datetime.now()
         
         try:
             # 1. Пробуем морфологический поиск
             logger.info("🔍 Используем морфологический поиск...")
-            result = self._enhanced_morphological_search(question)
+            result = self._enhanced_morphological_search(question, knowledge_base)
             
             if result:
                 processing_time = (datetime.now() - start_time).total_seconds()
@@ -96,7 +169,7 @@ class RailwayOptimizedClient:
             
             # 2. Fallback к простому поиску по ключевым словам
             logger.info("🔄 Fallback к простому поиску...")
-            result = self._enhanced_simple_search(question)
+            result = self._enhanced_simple_search(question, knowledge_base)
             processing_time = (datetime.now() - start_time).total_seconds()
             logger.info(f"✅ Fallback завершен за {processing_time:.2f}с")
             
@@ -111,28 +184,28 @@ class RailwayOptimizedClient:
                 "source": "error"
             }
     
-    def _enhanced_morphological_search(self, question: str) -> Optional[Dict[str, Any]]:
+    def _enhanced_morphological_search(self, question: str, knowledge_base: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """Улучшенный морфологический поиск"""
         question_lower = question.lower()
         
-        # Ищем точные совпадения с морфологическими формами
-        for base_word, forms in self.morphological_forms.items():
-            for form in forms:
-                if form in question_lower:
-                    # Находим соответствующую категорию в базе знаний
-                    category = self._find_category_by_keyword(base_word)
-                    if category:
-                        return {
-                            "answer": category["answer"],
-                            "category": f"morphological_match_{base_word}",
-                            "confidence": 0.9,
-                            "source": "morphological_search"
-                        }
+        # Ищем точные совпадения с морфологическими формами (базовые слова
+        # в порядке объявления, первое с найденной категорией побеждает)
+        for base_word in self.morphological_automaton.matched_groups(question_lower):
+            # Находим соответствующую категорию в базе знаний
+            category_index = self._find_category_by_keyword(base_word, knowledge_base)
+            if category_index is not None:
+                return {
+                    "answer": knowledge_base[category_index]["answer"],
+                    "category": f"morphological_match_{base_word}",
+                    "confidence": 0.9,
+                    "source": "morphological_search",
+                    "faq_id": category_index
+                }
         
         return None
     
-    def _find_category_by_keyword(self, keyword: str) -> Optional[Dict[str, Any]]:
-        """Находит категорию по ключевому слову"""
+    def _find_category_by_keyword(self, keyword: str, knowledge_base: List[Dict[str, Any]]) -> Optional[int]:
+        """Находит номер категории в базе знаний по ключевому слову"""
         keyword_mapping = {
             "наценка": 0, "доплата": 0, "надбавка": 0, "коэффициент": 0,
             "комфорт": 1, "тариф": 1, "класс": 1,
@@ -147,19 +220,20 @@ class RailwayOptimizedClient:
         }
         
         category_index = keyword_mapping.get(keyword)
-        if category_index is not None and category_index < len(self.knowledge_base):
-            return self.knowledge_base[category_index]
+        if category_index is not None and category_index < len(knowledge_base):
+            return category_index
         
         return None
     
-    def _enhanced_simple_search(self, question: str) -> Dict[str, Any]:
+    def _enhanced_simple_search(self, question: str, knowledge_base: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Улучшенный простой поиск по ключевым словам (fallback)"""
         question_lower = question.lower()
         
         best_match = None
+        best_index = None
         best_score = 0
         
-        for item in self.knowledge_base:
+        for index, item in enumerate(knowledge_base):
             keywords = item.get("keywords", [])
             variations = item.get("question_variations", [])
             
@@ -181,25 +255,29 @@ class RailwayOptimizedClient:
             if total_score > best_score:
                 best_score = total_score
                 best_match = item
+                best_index = index
         
         if best_match and best_score > 0:
             return {
                 "answer": best_match.get("answer", "Ответ не найден"),
                 "category": "keyword_match",
                 "confidence": min(0.9, best_score * 0.2),
-                "source": "keyword_search"
+                "source": "keyword_search",
+                "faq_id": best_index
             }
         
         # Fallback
         return {
-            "answer": "Извините, не могу найти ответ на ваш вопрос. Обратитесь в службу поддержки.",
+            "answer": self.FALLBACK_ANSWER,
             "category": "unknown",
             "confidence": 0.0,
-            "source": "fallback"
+            "source": "fallback",
+            "faq_id": None
         }
 
-# Глобальный экземпляр
+# Глобальный экземпляр (опрос BZ.txt раз в KB_RELOAD_INTERVAL секунд)
 railway_client = RailwayOptimizedClient()
+railway_client.kb_reloader.start()
 
 @app.get("/")
 async def root():
@@ -231,11 +309,35 @@ async def webapp():
             status_code=404
         )
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Статистика кэша результатов поиска"""
+    return {
+        "query_cache": railway_client.query_cache.stats(),
+        "kb": railway_client.kb_reloader.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/admin/kb/reload")
+async def reload_kb(x_admin_token: Optional[str] = Header(None)):
+    """Перезагрузка BZ.txt (заголовок X-Admin-Token; без ADMIN_TOKEN эндпоинт отключен)"""
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token or "", admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    
+    reloaded = await run_in_threadpool(railway_client.kb_reloader.reload)
+    if not reloaded:
+        raise HTTPException(status_code=500, detail=f"Не удалось перезагрузить базу знаний: {railway_client.kb_reloader.last_error}")
+    return {"status": "reloaded", "kb": railway_client.kb_reloader.stats(), "timestamp": datetime.now().isoformat()}
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Основной эндпоинт для чата"""
     try:
-        result = railway_client.find_best_answer(request.text)
+        # Поиск и общий кэш (сетевой, блокирующий) - в пуле потоков, не в цикле событий
+        result = await run_in_threadpool(railway_client.find_best_answer, request.text)
         
         return ChatResponse(
             response=result["answer"],
@@ -243,7 +345,8 @@ async def chat(request: ChatRequest):
             confidence=result["confidence"],
             source=result["source"],
             timestamp=datetime.now().isoformat(),
-            suggestions=[]
+            suggestions=[],
+            kb_version=result.get("kb_version", 0)
         )
     
     except Exception as e:
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+⚡ ОБЩИЙ АСИНХРОННЫЙ КЛИЕНТ OLLAMA
+Неблокирующие запросы к Ollama для всех *_main.py сервисов:
+- пул keep-alive соединений (httpx.AsyncClient), без TCP/TLS рукопожатия на каждый запрос
+- таймаут на каждый вызов (ожидание в очереди + сам запрос)
+- ограничение числа одновременных запросов к модели (asyncio.Semaphore)
+- await generate(...) / await chat(...) возвращают JSON ответа Ollama целиком
+- одинаковые одновременные запросы (single-flight) ждут одну генерацию,
+  каждый - не дольше своего таймаута; ключ - точный запрос, поэтому вызывающий
+  код нормализует вопрос пользователя (normalize_question) до сборки промпта
+- generate_stream(...) отдает NDJSON чанки по мере генерации, а
+  stream_generate_sse(...) превращает их в Server-Sent Events для /chat/stream
+
+Один экземпляр на адрес Ollama и набор настроек: get_ollama_client(url, ...).
+"""
+
+import os
+import json
+import time
+import hashlib
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Set, AsyncIterator, Awaitable, Callable
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+# load_duration дольше секунды - модель загружалась заново (холодный старт)
+COLD_LOAD_NS = 1_000_000_000
+
+
+class OllamaError(Exception):
+    """Ошибка запроса к Ollama (сеть, HTTP статус, некорректный ответ)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaTimeoutError(OllamaError):
+    """Запрос к Ollama не уложился в таймаут"""
+
+
+# Знаки в конце вопроса, не меняющие его смысла
+QUESTION_TRAILING_CHARS = " \t\n?!.…,;:"
+
+
+def normalize_question(question: str) -> str:
+    """
+    Вопрос пользователя для промпта: нижний регистр, одиночные пробелы, без
+    знаков в конце. "Приложение не работает?" и "приложение  не работает"
+    дают одинаковый промпт и объединяются single-flight.
+    """
+    return ' '.join(question.lower().split()).rstrip(QUESTION_TRAILING_CHARS)
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов: первый вызов с ключом
+    запускает работу, остальные ждут его результат (или исключение).
+    Работа выполняется отдельной задачей, поэтому отмена или таймаут одного
+    из ожидающих (клиент закрыл соединение) не отменяет ответ для остальных.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Результат fn() для ключа. timeout ограничивает ожидание присоединившегося
+        вызова (asyncio.TimeoutError); срок первого вызова задает сама fn.
+        """
+        self.calls += 1
+        task = self._tasks.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        self.executed += 1
+        task = asyncio.ensure_future(fn())
+        self._tasks[key] = task
+        task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Исключение уже получили ожидающие; без них не логируем "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'executed': self.executed,
+            'coalesced': self.coalesced,
+            'in_flight_keys': len(self._tasks),
+            'coalesce_rate': self.coalesced / self.calls if self.calls else 0.0
+        }
+
+
+class AsyncOllamaClient:
+    """Асинхронный клиент Ollama с пулом соединений и ограничением параллелизма"""
+
+    def __init__(self, base_url: str = DEFAULT_OLLAMA_URL, max_connections: int = 20,
+                 max_concurrency: int = 4, timeout: float = 30.0, connect_timeout: float = 5.0,
+                 headers: Optional[Dict[str, str]] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.headers = dict(headers or {})
+        # Свой транспорт (например, httpx.MockTransport в тестах)
+        self.transport = transport
+
+        # httpx.AsyncClient и семафор привязаны к циклу событий - создаются лениво
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Задачи закрытия пулов прежних циклов событий (ссылки, чтобы их не собрал GC)
+        self._closing: Set[asyncio.Task] = set()
+        self.single_flight = SingleFlight()
+        # Метрики Ollama по моделям: prompt_eval_count, eval_duration, загрузки модели
+        self.model_stats: Dict[str, Dict[str, int]] = {}
+
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_time = 0.0
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        """Возвращает клиент текущего цикла событий (пересоздает при смене цикла)"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._close_stale(self._client, self._loop, loop)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    def _close_stale(self, client: httpx.AsyncClient, old_loop: Optional[asyncio.AbstractEventLoop],
+                     loop: asyncio.AbstractEventLoop):
+        """Закрывает пул соединений прежнего цикла событий, чтобы он не утекал"""
+        async def close():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.debug(f"Не удалось закрыть прежний пул соединений: {e}")
+
+        if old_loop is not None and old_loop.is_running():
+            # Прежний цикл еще работает (другой поток) - закрываем в нем
+            asyncio.run_coroutine_threadsafe(close(), old_loop)
+        else:
+            task = loop.create_task(close())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]],
+                       timeout: float) -> Dict[str, Any]:
+        client = self._ensure_client()
+        async with self._semaphore:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                response = await client.request(
+                    method, path, json=payload,
+                    timeout=httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout)),
+                )
+            finally:
+                self.in_flight -= 1
+
+        if response.status_code != 200:
+            raise OllamaError(f"Ollama вернул {response.status_code}: {response.text[:200]}",
+                              status_code=response.status_code)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise OllamaError(f"Некорректный JSON от Ollama: {e}")
+
+    async def request_json(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                           timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Выполняет JSON запрос с общим таймаутом на ожидание в очереди и ответ.
+        Подходит и для прокси к другим LLM сервисам с тем же пулом соединений.
+        """
+        timeout = timeout or self.timeout
+        started = time.perf_counter()
+        self.requests += 1
+        try:
+            return await asyncio.wait_for(self._request(method, path, payload, timeout), timeout)
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            self.timeouts += 1
+            raise OllamaTimeoutError(f"Ollama не ответил за {timeout:.1f}с")
+        except httpx.HTTPError as e:
+            self.errors += 1
+            raise OllamaError(f"Ошибка соединения с Ollama: {e}")
+        except OllamaError:
+            self.errors += 1
+            raise
+        finally:
+            self.total_time += time.perf_counter() - started
+
+    def _flight_key(self, path: str, payload: Dict[str, Any]) -> str:
+        """Ключ single-flight: хэш пути и запроса целиком (промпт сравнивается точно)"""
+        raw = json.dumps([path, payload], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _coalesced(self, path: str, payload: Dict[str, Any],
+                         timeout: Optional[float], coalesce: bool) -> Dict[str, Any]:
+        async def call() -> Dict[str, Any]:
+            data = await self.request_json("POST", path, payload, timeout)
+            self.record_eval(payload["model"], data)
+            return data
+
+        if not coalesce:
+            return await call()
+        key = self._flight_key(path, payload)
+        # Присоединившийся к чужой генерации ждет не дольше собственного таймаута
+        timeout = timeout or self.timeout
+        try:
+            return await self.single_flight.do(key, call, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise OllamaTimeoutError(f"Ollama не ответил за {timeout:.1f}с")
+
+    def record_eval(self, model: str, data: Dict[str, Any]):
+        """Учитывает метрики вычисления из финального ответа Ollama (длительности - в наносекундах)"""
+        stats = self.model_stats.setdefault(model, {
+            'calls': 0, 'prompt_eval_count': 0, 'prompt_eval_duration': 0,
+            'eval_count': 0, 'eval_duration': 0, 'load_duration': 0, 'cold_loads': 0
+        })
+        stats['calls'] += 1
+        for field in ('prompt_eval_count', 'prompt_eval_duration', 'eval_count', 'eval_duration', 'load_duration'):
+            stats[field] += data.get(field) or 0
+        if (data.get('load_duration') or 0) >= COLD_LOAD_NS:
+            stats['cold_loads'] += 1
+
+    async def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                       timeout: Optional[float] = None, coalesce: bool = True, **extra) -> Dict[str, Any]:
+        """
+        POST /api/generate без стриминга; extra - дополнительные поля (system, keep_alive, ...).
+        При coalesce=True одинаковые одновременные запросы получают один общий ответ.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": False, **extra}
+        if options:
+            payload["options"] = options
+        return await self._coalesced("/api/generate", payload, timeout, coalesce)
+
+    async def chat(self, model: str, messages: List[Dict[str, str]],
+                   options: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+                   coalesce: bool = True, **extra) -> Dict[str, Any]:
+        """POST /api/chat без стриминга (с объединением одинаковых запросов)"""
+        payload = {"model": model, "messages": messages, "stream": False, **extra}
+        if options:
+            payload["options"] = options
+        return await self._coalesced("/api/chat", payload, timeout, coalesce)
+
+    async def stream_lines(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                           timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Потоковый запрос: отдает строки ответа по мере поступления.
+        timeout ограничивает ожидание каждого следующего чанка (в том числе первого токена).
+        """
+        timeout = timeout or self.timeout
+        client = self._ensure_client()
+        started = time.perf_counter()
+        self.requests += 1
+        try:
+            async with self._semaphore:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                try:
+                    async with client.stream(
+                        method, path, json=payload,
+                        timeout=httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout)),
+                    ) as response:
+                        if response.status_code != 200:
+                            body = (await response.aread()).decode("utf-8", "replace")
+                            raise OllamaError(f"Ollama вернул {response.status_code}: {body[:200]}",
+                                              status_code=response.status_code)
+                        async for line in response.aiter_lines():
+                            if line:
+                                yield line
+                finally:
+                    self.in_flight -= 1
+        except httpx.TimeoutException:
+            self.timeouts += 1
+            raise OllamaTimeoutError(f"Ollama не прислал данные за {timeout:.1f}с")
+        except httpx.HTTPError as e:
+            self.errors += 1
+            raise OllamaError(f"Ошибка соединения с Ollama: {e}")
+        except OllamaError:
+            self.errors += 1
+            raise
+        finally:
+            self.total_time += time.perf_counter() - started
+
+    async def generate_stream(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                              timeout: Optional[float] = None, **extra) -> AsyncIterator[Dict[str, Any]]:
+        """POST /api/generate со стримингом: отдает NDJSON чанки ({"response": "...", "done": ...})"""
+        payload = {"model": model, "prompt": prompt, "stream": True, **extra}
+        if options:
+            payload["options"] = options
+        async for line in self.stream_lines("POST", "/api/generate", payload, timeout):
+            try:
+                chunk = json.loads(line)
+            except ValueError as e:
+                raise OllamaError(f"Некорректный NDJSON от Ollama: {e}")
+            if chunk.get("error"):
+                raise OllamaError(f"Ollama: {chunk['error']}")
+            if chunk.get("done"):
+                self.record_eval(model, chunk)
+            yield chunk
+            if chunk.get("done"):
+                return
+
+    async def tags(self, timeout: Optional[float] = None) -> List[str]:
+        """Список моделей, загруженных в Ollama"""
+        data = await self.request_json("GET", "/api/tags", None, timeout)
+        return [model.get("name", "") for model in data.get("models", [])]
+
+    async def is_available(self, model: Optional[str] = None, timeout: float = 5.0) -> bool:
+        """Проверяет доступность Ollama (и наличие модели, если указана)"""
+        try:
+            names = await self.tags(timeout)
+        except OllamaError as e:
+            logger.warning(f"⚠️ Ollama недоступен: {e}")
+            return False
+        return model is None or any(model in name for name in names)
+
+    async def aclose(self):
+        """Закрывает пул соединений"""
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика запросов к Ollama"""
+        return {
+            'base_url': self.base_url,
+            'requests': self.requests,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'max_concurrency': self.max_concurrency,
+            'avg_time': self.total_time / self.requests if self.requests else 0.0,
+            'single_flight': self.single_flight.stats(),
+            'models': {model: dict(stats) for model, stats in self.model_stats.items()}
+        }
+
+
+def sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Форматирует одно событие Server-Sent Events"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def single_answer_sse(answer: str, source: str) -> AsyncIterator[str]:
+    """Готовый ответ (поиск по базе, fallback) в виде SSE потока из одного фрагмента"""
+    yield sse_event({"text": answer}, "token")
+    yield sse_event({"response": answer, "source": source}, "done")
+
+
+async def stream_generate_sse(client: AsyncOllamaClient, model: str, prompt: str,
+                              options: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+                              source: str = "llm", fallback: Optional[Callable[[], Dict[str, Any]]] = None,
+                              **extra) -> AsyncIterator[str]:
+    """
+    Транслирует стриминг Ollama в SSE:
+    - event: token  {"text": "..."} - очередной фрагмент ответа
+    - event: done   {"response": полный ответ, "source", "eval_count", ...}
+    - event: error  {"message": "..."} - если ответ оборвался
+    Если ошибка случилась до первого токена и задан fallback, вместо ошибки
+    отправляется его ответ ({"answer", "source", ...}) одним токеном.
+    """
+    parts: List[str] = []
+    try:
+        async for chunk in client.generate_stream(model, prompt, options=options, timeout=timeout, **extra):
+            text = chunk.get("response", "")
+            if text:
+                parts.append(text)
+                yield sse_event({"text": text}, "token")
+            if chunk.get("done"):
+                yield sse_event({
+                    "response": "".join(parts).strip(),
+                    "source": source,
+                    "eval_count": chunk.get("eval_count"),
+                    "eval_duration": chunk.get("eval_duration"),
+                    "total_duration": chunk.get("total_duration")
+                }, "done")
+                return
+    except OllamaError as e:
+        logger.error(f"❌ Ошибка стриминга LLM: {e}")
+        if not parts and fallback is not None:
+            result = fallback()
+            async for event in single_answer_sse(result["answer"], result.get("source", "fallback")):
+                yield event
+        else:
+            yield sse_event({"message": str(e), "response": "".join(parts).strip()}, "error")
+        return
+
+    # Поток закрылся без done - отдаем то, что успели получить
+    yield sse_event({"response": "".join(parts).strip(), "source": source}, "done")
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+# Общие клиенты по адресу Ollama и настройкам
+_clients: Dict[str, AsyncOllamaClient] = {}
+
+
+def get_ollama_client(base_url: Optional[str] = None, **kwargs) -> AsyncOllamaClient:
+    """
+    Возвращает общий клиент для адреса Ollama (по умолчанию OLLAMA_URL).
+    Размер пула, лимит параллелизма и таймаут берутся из OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_CONCURRENCY и OLLAMA_TIMEOUT, если не заданы явно. Клиент общий
+    для вызовов с одинаковыми настройками: вызов с другим timeout, headers или
+    max_concurrency получает отдельный клиент со своим пулом.
+    """
+    base_url = (base_url or os.environ.get("OLLAMA_URL", DEFAULT_OLLAMA_URL)).rstrip("/")
+    kwargs.setdefault("max_connections", int(os.environ.get("OLLAMA_MAX_CONNECTIONS", 20)))
+    kwargs.setdefault("max_concurrency", int(os.environ.get("OLLAMA_MAX_CONCURRENCY", 4)))
+    kwargs.setdefault("timeout", float(os.environ.get("OLLAMA_TIMEOUT", 30)))
+    settings = {name: repr(sorted(value.items()) if isinstance(value, dict) else value)
+                for name, value in kwargs.items()}
+    key = json.dumps([base_url, settings], sort_keys=True)
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncOllamaClient(base_url, **kwargs)
+        _clients[key] = client
+    return client
+
+
+__all__ = ['AsyncOllamaClient', 'OllamaError', 'OllamaTimeoutError', 'SingleFlight', 'get_ollama_client',
+           'normalize_question',
+           'sse_event', 'single_answer_sse', 'stream_generate_sse', 'SSE_HEADERS']
@@ -10,6 +10,10 @@ import requests
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import os
+import asyncio
+
+from ollama_async_client import get_ollama_client, OllamaTimeoutError
+from llm_selection import KBCandidateSelector
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -21,8 +25,12 @@ class OptimizedSearchLLMClient:
         self.model_name = "aparu-senior-ai"
         self.ollama_available = False
         
+        self.ollama = get_ollama_client(self.ollama_url)
+        
         # Загружаем базу знаний для поиска
         self.knowledge_base = self._load_knowledge_base()
+        # Лексический shortlist: вместо фиксированного меню категорий LLM видит top-k пунктов базы
+        self.selector = KBCandidateSelector(self.knowledge_base)
         
         # Проверяем доступность Ollama
         self._check_ollama_model()
@@ -54,7 +62,7 @@ class OptimizedSearchLLMClient:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к Ollama: {e}")
     
-    def find_best_answer(self, question: str) -> Dict[str, Any]:
+    async def find_best_answer(self, question: str) -> Dict[str, Any]:
         """Находит лучший ответ из базы знаний"""
         start_time = datetime.now()
         
@@ -62,7 +70,7 @@ class OptimizedSearchLLMClient:
         if self.ollama_available:
             try:
                 logger.info("🔍 Используем улучшенный LLM для поиска ответа...")
-                result = self._optimized_llm_search_answer(question)
+                result = await self._optimized_llm_search_answer(question)
                 if result:
                     processing_time = (datetime.now() - start_time).total_seconds()
                     logger.info(f"✅ LLM поиск завершен за {processing_time:.2f}с")
@@ -74,36 +82,27 @@ class OptimizedSearchLLMClient:
         logger.info("🔄 Fallback к улучшенному простому поиску...")
         return self._enhanced_simple_search(question)
     
-    def _optimized_llm_search_answer(self, question: str) -> Dict[str, Any]:
-        """Использует улучшенный LLM для поиска ответа в базе знаний"""
+    async def _optimized_llm_search_answer(self, question: str) -> Dict[str, Any]:
+        """Использует улучшенный LLM для поиска ответа в базе знаний (выбор среди кандидатов из лексического индекса)"""
         try:
-            # УЛУЧШЕННЫЙ ПРОМПТ С ПРИМЕРАМИ
-            search_prompt = f"""Найди категорию для вопроса: "{question}"
-
-Категории APARU:
-1. НАЦЕНКА - доплата, дорого, повышение цены
-2. ДОСТАВКА - курьер, посылка, отправка
-3. БАЛАНС - пополнение, оплата, платеж
-4. ПРИЛОЖЕНИЕ - ошибка, не работает, глючит
-5. ТАРИФЫ - комфорт, эконом, виды поездок
-
-Примеры:
-Вопрос: "Что такое наценка?" → Ответ: 1
-Вопрос: "Как заказать доставку?" → Ответ: 2
-Вопрос: "Пополнить баланс" → Ответ: 3
-Вопрос: "Приложение не работает" → Ответ: 4
-Вопрос: "Тариф комфорт" → Ответ: 5
-
-Твой ответ (только номер 1-5):"""
+            candidates = self.selector.shortlist(question)
+            if not candidates:
+                logger.info("🔍 Нет лексических кандидатов - LLM не вызываем")
+                return None
+            if len(candidates) == 1:
+                # Единственный кандидат - выбирать LLM нечего
+                return self._kb_result(candidates[0], 0.9, "lexical_shortlist")
+            
+            prompt = self.selector.build_prompt(question, candidates)
 
             payload = {
                 "model": self.model_name,
-                "prompt": search_prompt,
+                "prompt": prompt,
                 "stream": False,
                 "options": {
                     "temperature": 0.01,  # Минимальная температура для точности
                     "num_predict": 3,      # Только номер
-                    "num_ctx": 512,        # Достаточный контекст
+                    "num_ctx": 1024,       # Список кандидатов (~2k символов) без обрезки инструкций
                     "repeat_penalty": 1.0,
                     "top_k": 1,            # Только лучший вариант
                     "top_p": 0.1,          # Минимальная вероятность
@@ -111,55 +110,36 @@ class OptimizedSearchLLMClient:
                 }
             }
             
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload,
-                timeout=12  # Оптимизированный таймаут
+            data = await self.ollama.generate(
+                payload["model"], payload["prompt"], options=payload["options"],
+                timeout=12
             )
+            answer = data.get('response', '').strip()
             
-            if response.status_code == 200:
-                data = response.json()
-                answer = data.get('response', '').strip()
-                
-                # Парсим номер категории
-                category_num = self._parse_category_number(answer)
-                if category_num:
-                    # Получаем ответ из базы знаний
-                    if 1 <= category_num <= len(self.knowledge_base):
-                        kb_item = self.knowledge_base[category_num - 1]
-                        return {
-                            "answer": kb_item.get("answer", "Ответ не найден"),
-                            "category": kb_item.get("question", f"Категория {category_num}"),
-                            "confidence": 0.95,
-                            "source": "optimized_llm_search"
-                        }
-                
-                logger.warning(f"⚠️ LLM вернул неожиданный ответ: {answer}")
-                return None
+            # Номер в списке кандидатов -> пункт базы знаний
+            kb_index = self.selector.resolve(answer, candidates)
+            if kb_index is not None:
+                return self._kb_result(kb_index, 0.95, "optimized_llm_search")
             
-            logger.warning(f"⚠️ LLM вернул ошибку: {response.status_code}")
+            logger.warning(f"⚠️ LLM вернул неожиданный ответ: '{answer}'")
             return None
             
-        except requests.exceptions.Timeout:
+        except OllamaTimeoutError:
             logger.error(f"❌ LLM поиск таймаут (>12с)")
             return None
         except Exception as e:
             logger.error(f"❌ Ошибка LLM поиска: {e}")
             return None
     
-    def _parse_category_number(self, answer: str) -> Optional[int]:
-        """Парсит номер категории из ответа LLM"""
-        try:
-            # Ищем число в ответе
-            import re
-            numbers = re.findall(r'\d+', answer)
-            if numbers:
-                num = int(numbers[0])
-                if 1 <= num <= 5:
-                    return num
-            return None
-        except:
-            return None
+    def _kb_result(self, kb_index: int, confidence: float, source: str) -> Dict[str, Any]:
+        """Ответ из пункта базы знаний"""
+        kb_item = self.knowledge_base[kb_index]
+        return {
+            "answer": kb_item.get("answer", "Ответ не найден"),
+            "category": kb_item.get("question", f"Категория {kb_index + 1}"),
+            "confidence": confidence,
+            "source": source
+        }
     
     def _enhanced_simple_search(self, question: str) -> Dict[str, Any]:
         """Улучшенный простой поиск по ключевым словам и синонимам"""
@@ -299,7 +279,7 @@ if __name__ == "__main__":
     
     for i, question in enumerate(test_questions, 1):
         print(f"{i:2d}. {question}")
-        result = client.find_best_answer(question)
+        result = asyncio.run(client.find_best_answer(question))
         print(f"    ✅ Ответ: {result['answer'][:100]}...")
         print(f"    📊 Категория: {result['category']}")
         print(f"    🎯 Уверенность: {result['confidence']}")
@@ -5,34 +5,40 @@
 Метрики: Top-1 ≥ 0.85, Top-3 ≥ 0.95
 """
 
+import os
+import sys
 import json
+import atexit
 import logging
 import pickle
 import re
+import threading
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 import hashlib
 
-# Импорты для нормализации текста
-try:
-    import nltk
-    from nltk.corpus import stopwords
-    from nltk.stem import SnowballStemmer
-    nltk.download('stopwords', quiet=True)
-    nltk.download('punkt', quiet=True)
-except ImportError:
+# Импорты для нормализации текста: NLTK (только стеммер, данные корпусов не
+# нужны) импортируется при инициализации обработки текста
+import importlib.util
+NLTK_AVAILABLE = importlib.util.find_spec("nltk") is not None
+if not NLTK_AVAILABLE:
     print("⚠️ NLTK не установлен, используем базовую нормализацию")
 
-# Импорты для эмбеддингов
-try:
-    from sentence_transformers import SentenceTransformer
-    import faiss
-    EMBEDDINGS_AVAILABLE = True
-except ImportError:
-    print("⚠️ Sentence Transformers не установлен, используем только fuzzy search")
-    EMBEDDINGS_AVAILABLE = False
+# Модель эмбеддингов (ONNX int8 или PyTorch) и микро-батчинг запросов из backend/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from embedding_backend import load_embedding_model, EMBEDDINGS_AVAILABLE
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH
+from embedding_store import normalize_rows
+from incremental_index import IncrementalEmbeddingIndex
+from lazy_loader import BackgroundLoader
+
+EMBEDDINGS_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+if not EMBEDDINGS_AVAILABLE:
+    print("⚠️ Эмбеддинги недоступны (нужны onnxruntime или sentence-transformers), используем только fuzzy search")
 
 # Импорты для fuzzy search
 try:
@@ -46,20 +52,30 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ProfessionalFAQAssistant:
-    def __init__(self, knowledge_base_path: str = "professional_aparu_knowledge.json"):
+    def __init__(self, knowledge_base_path: str = "professional_aparu_knowledge.json",
+                 lazy_embeddings: bool = False):
         self.knowledge_base_path = knowledge_base_path
         self.knowledge_base = []
         self.embeddings_model = None
+        # Эмбеддинги запросов считаются пакетами (микро-батчинг)
+        self.query_batcher = None
+        # Кэш эмбеддингов нормализованных запросов (общий для веток гибридного поиска)
+        self.embedding_cache = EmbeddingCache(model=EMBEDDINGS_MODEL_NAME, path=DEFAULT_CACHE_PATH)
+        if self.embedding_cache.path:
+            atexit.register(self.embedding_cache.save)
         self.embeddings_index = None
-        self.question_embeddings = []
+        # Изменения базы знаний и индекса эмбеддингов (построение, expand/update/delete)
+        self._index_lock = threading.RLock()
         self.stop_words = set()
         self.stemmer = None
         
         # Инициализация компонентов
         self._load_knowledge_base()
         self._initialize_text_processing()
-        self._initialize_embeddings()
-        self._build_search_indexes()
+        # Модель и индекс эмбеддингов строятся сразу или в фоновом потоке
+        # (lazy_embeddings): до готовности работает поиск по ключевым словам и fuzzy
+        self.embeddings_loader = BackgroundLoader("embeddings", self._load_embedding_components)
+        self.embeddings_loader.start(background=lazy_embeddings)
         
         # Логирование
         self.request_log = []
@@ -84,7 +100,8 @@ class ProfessionalFAQAssistant:
             ])
             
             # Стеммер для русского языка
-            if 'nltk' in globals():
+            if NLTK_AVAILABLE:
+                from nltk.stem import SnowballStemmer
                 self.stemmer = SnowballStemmer('russian')
             
             logger.info("✅ Обработка текста инициализирована")
@@ -97,7 +114,10 @@ class ProfessionalFAQAssistant:
         """Инициализирует модель эмбеддингов"""
         if EMBEDDINGS_AVAILABLE:
             try:
-                self.embeddings_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+                model = load_embedding_model(EMBEDDINGS_MODEL_NAME)
+                self.query_batcher = EmbeddingBatcher(model.encode)
+                # Модель публикуется последней: по ней поиск решает, включать ли эмбеддинги
+                self.embeddings_model = model
                 logger.info("✅ Модель эмбеддингов загружена")
             except Exception as e:
                 logger.warning(f"⚠️ Ошибка загрузки модели эмбеддингов: {e}")
@@ -105,6 +125,27 @@ class ProfessionalFAQAssistant:
         else:
             logger.warning("⚠️ Эмбеддинги недоступны")
     
+    def _load_embedding_components(self) -> bool:
+        """Загружает модель эмбеддингов и строит индекс (выполняется BackgroundLoader)"""
+        self._initialize_embeddings()
+        self._build_search_indexes()
+        if self.embeddings_model is None or self.embeddings_index is None:
+            raise RuntimeError("модель или индекс эмбеддингов недоступны, работает поиск по ключевым словам")
+        return True
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        """Готовность компонентов: лексический поиск доступен сразу, эмбеддинги - после загрузки"""
+        return {
+            'lexical': bool(self.knowledge_base),
+            'embeddings': self.embeddings_loader.ready,
+            'embeddings_loader': self.embeddings_loader.status()
+        }
+    
+    @staticmethod
+    def _item_texts(item: Dict[str, Any]) -> List[str]:
+        """Тексты пункта, по которым строятся эмбеддинги: вопрос и вариации"""
+        return [item['question'], *item.get('variations', [])]
+    
     def _build_search_indexes(self):
         """Строит поисковые индексы"""
         if not self.knowledge_base:
@@ -113,26 +154,36 @@ class ProfessionalFAQAssistant:
         # Строим эмбеддинги для вопросов
         if self.embeddings_model:
             try:
-                questions = []
-                for item in self.knowledge_base:
-                    questions.append(item['question'])
-                    questions.extend(item.get('variations', []))
-                
-                self.question_embeddings = self.embeddings_model.encode(questions)
-                
-                # Создаем FAISS индекс
-                dimension = self.question_embeddings.shape[1]
-                self.embeddings_index = faiss.IndexFlatIP(dimension)
-                
-                # Нормализуем эмбеддинги для cosine similarity
-                faiss.normalize_L2(self.question_embeddings)
-                self.embeddings_index.add(self.question_embeddings)
+                with self._index_lock:
+                    questions = []
+                    item_ids = []
+                    for idx, item in enumerate(self.knowledge_base):
+                        if item.get('deleted'):
+                            continue
+                        texts = self._item_texts(item)
+                        questions.extend(texts)
+                        item_ids.extend([idx] * len(texts))
+                    
+                    # Строки матрицы нормализуются для cosine similarity, у каждой - номер пункта
+                    self.embeddings_index = IncrementalEmbeddingIndex.from_vectors(
+                        self.embeddings_model.encode(questions), item_ids
+                    )
                 
-                logger.info(f"✅ FAISS индекс создан: {len(questions)} вопросов")
+                logger.info(f"✅ Индекс эмбеддингов создан: {len(questions)} вопросов")
             except Exception as e:
-                logger.warning(f"⚠️ Ошибка создания FAISS индекса: {e}")
+                logger.warning(f"⚠️ Ошибка создания индекса эмбеддингов: {e}")
                 self.embeddings_index = None
     
+    def _embed_item_texts(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Эмбеддинги только новых текстов (без перекодирования всей базы)"""
+        if self.embeddings_model is None or self.embeddings_index is None or not texts:
+            return None
+        try:
+            return self.embeddings_model.encode(texts)
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка эмбеддинга новых текстов: {e}")
+            return None
+    
     def normalize_text(self, text: str) -> str:
         """Нормализует текст"""
         # Приводим к нижнему регистру
@@ -161,19 +212,13 @@ class ProfessionalFAQAssistant:
             # Нормализуем запрос
             normalized_query = self.normalize_text(query)
             
-            # Создаем эмбеддинг для запроса
-            query_embedding = self.embeddings_model.encode([normalized_query])
-            faiss.normalize_L2(query_embedding)
+            # Эмбеддинг запроса: из кэша или в общем пакете с параллельными запросами
+            query_embedding = normalize_rows(
+                self.embedding_cache.get_or_compute(normalized_query, self.query_batcher.encode)
+            )
             
-            # Поиск в FAISS
-            scores, indices = self.embeddings_index.search(query_embedding, top_k)
-            
-            results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < len(self.knowledge_base):
-                    results.append((idx, float(score)))
-            
-            return results
+            # Строки -> пункты базы, лучшая вариация каждого пункта (удаленные не участвуют)
+            return self.embeddings_index.search_items(query_embedding, top_k)
         except Exception as e:
             logger.warning(f"⚠️ Ошибка поиска по эмбеддингам: {e}")
             return []
@@ -186,6 +231,8 @@ class ProfessionalFAQAssistant:
         results = []
         
         for idx, item in enumerate(self.knowledge_base):
+            if item.get('deleted'):
+                continue
             score = 0
             
             # Проверяем ключевые слова
@@ -225,6 +272,8 @@ class ProfessionalFAQAssistant:
             question_to_idx = {}
             
             for idx, item in enumerate(self.knowledge_base):
+                if item.get('deleted'):
+                    continue
                 all_questions.append(item['question'])
                 question_to_idx[item['question']] = idx
                 
@@ -295,6 +344,7 @@ class ProfessionalFAQAssistant:
                 item = self.knowledge_base[idx]
                 results.append({
                     'id': item.get('id', idx),
+                    'index': idx,
                     'question': item['question'],
                     'answer': item['answer'],
                     'category': item.get('category', 'general'),
@@ -357,39 +407,81 @@ class ProfessionalFAQAssistant:
             }
     
     def expand_knowledge_base(self, query: str, answer: str, category: str = 'general'):
-        """Дополняет базу знаний новыми вариациями"""
-        # Нормализуем запрос для поиска похожих
-        normalized_query = self.normalize_text(query)
-        
+        """Дополняет базу знаний новыми вариациями (в индекс эмбеддингов добавляется только новый текст)"""
         # Ищем похожие записи
         similar_results = self.hybrid_search(query, top_k=1)
         
-        if similar_results and similar_results[0]['confidence'] > 0.8:
-            # Добавляем как вариацию к существующей записи
-            similar_item = similar_results[0]
-            # Здесь можно добавить логику обновления базы знаний
-            self.knowledge_expansions.append({
-                'query': query,
-                'answer': answer,
-                'category': category,
-                'similar_item_id': similar_item['id'],
-                'timestamp': datetime.now().isoformat()
-            })
-            logger.info(f"📝 Добавлена вариация для записи {similar_item['id']}")
-        else:
-            # Добавляем как новую запись
-            new_item = {
-                'id': len(self.knowledge_base) + 1,
-                'question': query,
-                'answer': answer,
-                'variations': [],
-                'keywords': self._extract_keywords(query),
-                'category': category,
-                'confidence': 0.8,
-                'source': 'user_expansion'
-            }
-            self.knowledge_base.append(new_item)
-            logger.info(f"📝 Добавлена новая запись: {query[:50]}...")
+        # Под блокировкой: если индекс еще строится в фоне, дожидаемся его
+        with self._index_lock:
+            vectors = self._embed_item_texts([query])
+            if similar_results and similar_results[0]['confidence'] > 0.8:
+                # Добавляем как вариацию к существующей записи
+                similar_item = similar_results[0]
+                item_idx = similar_item['index']
+                variations = self.knowledge_base[item_idx].setdefault('variations', [])
+                if query not in variations:
+                    variations.append(query)
+                    if vectors is not None:
+                        self.embeddings_index.add(item_idx, vectors)
+                self.knowledge_expansions.append({
+                    'query': query,
+                    'answer': answer,
+                    'category': category,
+                    'similar_item_id': similar_item['id'],
+                    'timestamp': datetime.now().isoformat()
+                })
+                logger.info(f"📝 Добавлена вариация для записи {similar_item['id']}")
+            else:
+                # Добавляем как новую запись
+                new_item = {
+                    'id': len(self.knowledge_base) + 1,
+                    'question': query,
+                    'answer': answer,
+                    'variations': [],
+                    'keywords': self._extract_keywords(query),
+                    'category': category,
+                    'confidence': 0.8,
+                    'source': 'user_expansion'
+                }
+                self.knowledge_base.append(new_item)
+                if vectors is not None:
+                    self.embeddings_index.add(len(self.knowledge_base) - 1, vectors)
+                logger.info(f"📝 Добавлена новая запись: {query[:50]}...")
+    
+    def update_knowledge_item(self, item_idx: int, **fields) -> bool:
+        """
+        Обновляет поля записи (question, answer, variations, keywords, category).
+        При изменении вопроса или вариаций перекодируются только тексты этой записи.
+        """
+        allowed = {'question', 'answer', 'variations', 'keywords', 'category'}
+        updates = {key: value for key, value in fields.items() if key in allowed and value is not None}
+        
+        with self._index_lock:
+            # Запись читается под блокировкой: иначе вариация, добавленная
+            # expand_knowledge_base между чтением и записью, была бы потеряна
+            if not 0 <= item_idx < len(self.knowledge_base) or self.knowledge_base[item_idx].get('deleted'):
+                return False
+            item = {**self.knowledge_base[item_idx], **updates}
+            vectors = None
+            if 'question' in updates or 'variations' in updates:
+                vectors = self._embed_item_texts(self._item_texts(item))
+            self.knowledge_base[item_idx] = item
+            if vectors is not None:
+                self.embeddings_index.update_item(item_idx, vectors)
+        logger.info(f"📝 Обновлена запись {item.get('id', item_idx)}: {', '.join(updates)}")
+        return True
+    
+    def delete_knowledge_item(self, item_idx: int) -> bool:
+        """Удаляет запись из поиска (tombstone; строки индекса вычищаются фоновым сжатием)"""
+        with self._index_lock:
+            if not 0 <= item_idx < len(self.knowledge_base) or self.knowledge_base[item_idx].get('deleted'):
+                return False
+            # Позиции записей не сдвигаются: на них ссылаются строки индекса
+            self.knowledge_base[item_idx] = {**self.knowledge_base[item_idx], 'deleted': True}
+            if self.embeddings_index is not None:
+                self.embeddings_index.delete_item(item_idx)
+        logger.info(f"🗑️ Удалена запись {self.knowledge_base[item_idx].get('id', item_idx)}")
+        return True
     
     def _extract_keywords(self, text: str) -> List[str]:
         """Извлекает ключевые слова из текста"""
@@ -405,27 +497,33 @@ class ProfessionalFAQAssistant:
         total_variations = 0
         total_keywords = 0
         
-        for item in self.knowledge_base:
+        active_items = [item for item in self.knowledge_base if not item.get('deleted')]
+        for item in active_items:
             cat = item.get('category', 'general')
             categories[cat] = categories.get(cat, 0) + 1
             total_variations += len(item.get('variations', []))
             total_keywords += len(item.get('keywords', []))
         
         return {
-            'total_records': len(self.knowledge_base),
+            'total_records': len(active_items),
+            'deleted_records': len(self.knowledge_base) - len(active_items),
             'categories': categories,
             'total_variations': total_variations,
             'total_keywords': total_keywords,
-            'avg_variations_per_record': total_variations / len(self.knowledge_base) if self.knowledge_base else 0,
-            'avg_keywords_per_record': total_keywords / len(self.knowledge_base) if self.knowledge_base else 0,
+            'avg_variations_per_record': total_variations / len(active_items) if active_items else 0,
+            'avg_keywords_per_record': total_keywords / len(active_items) if active_items else 0,
             'total_requests': len(self.request_log),
             'knowledge_expansions': len(self.knowledge_expansions),
             'embeddings_available': self.embeddings_model is not None,
+            'embedding_batches': self.query_batcher.stats() if self.query_batcher else None,
+            'embedding_cache': self.embedding_cache.stats(),
+            'embeddings_loader': self.embeddings_loader.status(),
+            'embeddings_index': self.embeddings_index.stats() if self.embeddings_index else None,
             'fuzzy_available': FUZZY_AVAILABLE
         }
 
-# Глобальный экземпляр
-_professional_assistant = ProfessionalFAQAssistant()
+# Глобальный экземпляр (эмбеддинги грузятся в фоне, импорт не блокируется)
+_professional_assistant = ProfessionalFAQAssistant(lazy_embeddings=True)
 
 def ask_question(query: str) -> Dict[str, Any]:
     """Основной API для вопросов"""
@@ -435,10 +533,22 @@ def expand_knowledge(query: str, answer: str, category: str = 'general'):
     """API для дополнения базы знаний"""
     _professional_assistant.expand_knowledge_base(query, answer, category)
 
+def update_knowledge(item_idx: int, **fields) -> bool:
+    """API для изменения записи базы знаний"""
+    return _professional_assistant.update_knowledge_item(item_idx, **fields)
+
+def delete_knowledge(item_idx: int) -> bool:
+    """API для удаления записи базы знаний"""
+    return _professional_assistant.delete_knowledge_item(item_idx)
+
 def get_statistics() -> Dict[str, Any]:
     """API для получения статистики"""
     return _professional_assistant.get_statistics()
 
+def get_readiness() -> Dict[str, Any]:
+    """API для проверки готовности компонентов (readiness)"""
+    return _professional_assistant.get_readiness()
+
 if __name__ == "__main__":
     # Тестируем профессиональный ассистент
     assistant = ProfessionalFAQAssistant()
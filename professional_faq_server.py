@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
 """
 🚀 Профессиональный FAQ-ассистент APARU - FastAPI сервер
-API endpoints: POST /ask, GET /health
+API endpoints: POST /ask, GET /health (liveness), GET /ready (readiness)
 """
 
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from professional_faq_assistant import ProfessionalFAQAssistant, ask_question, expand_knowledge, get_statistics
+from professional_faq_assistant import (
+    ask_question, expand_knowledge, update_knowledge, delete_knowledge, get_statistics, get_readiness
+)
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -52,6 +56,13 @@ class ExpandRequest(BaseModel):
     answer: str
     category: str = "general"
 
+class UpdateRequest(BaseModel):
+    question: Optional[str] = None
+    answer: Optional[str] = None
+    variations: Optional[list] = None
+    keywords: Optional[list] = None
+    category: Optional[str] = None
+
 class HealthResponse(BaseModel):
     status: str
     timestamp: str
@@ -60,8 +71,8 @@ class HealthResponse(BaseModel):
 class StatisticsResponse(BaseModel):
     statistics: Dict[str, Any]
 
-# Инициализируем ассистент
-assistant = ProfessionalFAQAssistant()
+# Ассистент - глобальный экземпляр professional_faq_assistant: эмбеддинги
+# грузятся в фоне, второй экземпляр не создаем (модель грузилась бы дважды)
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -77,14 +88,32 @@ async def health_check():
         logger.error(f"Ошибка проверки здоровья: {e}")
         raise HTTPException(status_code=500, detail="Service unhealthy")
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Готовность компонентов. Сервис отвечает, как только загружена база
+    знаний (лексический поиск); эмбеддинги включаются после фоновой загрузки
+    и отражаются в components, но на готовность не влияют.
+    """
+    readiness = get_readiness()
+    return JSONResponse(
+        status_code=200 if readiness['lexical'] else 503,
+        content={
+            "ready": readiness['lexical'],
+            "components": readiness,
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
 @app.post("/ask", response_model=AskResponse)
 async def ask_faq(request: AskRequest):
     """Основной endpoint для вопросов"""
     try:
         logger.info(f"Получен вопрос: {request.question}")
         
-        # Получаем ответ от ассистента
-        result = ask_question(request.question)
+        # Получаем ответ от ассистента (в пуле потоков: параллельные запросы
+        # не блокируют цикл событий и попадают в общий пакет эмбеддингов)
+        result = await run_in_threadpool(ask_question, request.question)
         
         # Формируем ответ
         response = AskResponse(
@@ -110,7 +139,7 @@ async def expand_knowledge_base(request: ExpandRequest):
     try:
         logger.info(f"Дополнение базы: {request.question[:50]}...")
         
-        expand_knowledge(request.question, request.answer, request.category)
+        await run_in_threadpool(expand_knowledge, request.question, request.answer, request.category)
         
         return {
             "status": "success",
@@ -122,6 +151,23 @@ async def expand_knowledge_base(request: ExpandRequest):
         logger.error(f"Ошибка дополнения базы: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.put("/knowledge/{item_idx}")
+async def update_knowledge_item(item_idx: int, request: UpdateRequest):
+    """Изменение записи базы знаний (перекодируются только ее тексты)"""
+    updated = await run_in_threadpool(update_knowledge, item_idx, **request.model_dump())
+    if not updated:
+        raise HTTPException(status_code=404, detail="Record not found")
+    return {"status": "success", "message": "Запись обновлена", "timestamp": datetime.now().isoformat()}
+
+@app.delete("/knowledge/{item_idx}")
+async def delete_knowledge_item(item_idx: int):
+    """Удаление записи базы знаний из поиска"""
+    # Ждет _index_lock (при старте его держит построение индексов) - в пуле потоков
+    deleted = await run_in_threadpool(delete_knowledge, item_idx)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Record not found")
+    return {"status": "success", "message": "Запись удалена", "timestamp": datetime.now().isoformat()}
+
 @app.get("/statistics", response_model=StatisticsResponse)
 async def get_system_statistics():
     """Получение статистики системы"""
@@ -142,7 +188,9 @@ async def root():
         "endpoints": {
             "ask": "POST /ask - Задать вопрос",
             "health": "GET /health - Проверка здоровья",
+            "ready": "GET /ready - Готовность компонентов",
             "expand": "POST /expand - Дополнить базу знаний",
+            "knowledge": "PUT/DELETE /knowledge/{index} - Изменить или удалить запись",
             "statistics": "GET /statistics - Статистика системы"
         },
         "timestamp": datetime.now().isoformat()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+🧩 СБОРКА ПРОМПТОВ СО СТАБИЛЬНЫМ СИСТЕМНЫМ ПРЕФИКСОМ
+Ollama переиспользует уже вычисленный префикс промпта (KV-кэш), только если
+модель остается загруженной и префикс совпадает байт в байт. Поэтому:
+- системный префикс регистрируется один раз на модель и приводится к
+  каноническому виду (переводы строк, пробелы в концах строк);
+- промпт всегда собирается как префикс + разделитель + переменная часть;
+- каждый запрос передает keep_alive, а фоновый прогрев периодически
+  вычисляет префиксы заново, чтобы модель не выгружалась при простое;
+- из ответов Ollama учитываются prompt_eval_count / eval_duration и по ним
+  оценивается доля запросов, в которых префикс был взят из кэша.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Tuple
+
+from ollama_async_client import AsyncOllamaClient, OllamaError, get_ollama_client
+
+logger = logging.getLogger(__name__)
+
+# Сколько держать модель в памяти после запроса (формат Ollama: "30m", "1h", -1 - всегда)
+DEFAULT_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# Интервал фонового прогрева в секундах (0 - прогрев отключен)
+DEFAULT_WARMUP_INTERVAL = float(os.environ.get("OLLAMA_WARMUP_INTERVAL", 240))
+
+PREFIX_SEPARATOR = "\n\n"
+
+# Запрос считается попавшим в кэш префикса, если не вычислялось хотя бы 80% его токенов
+PREFIX_REUSE_RATIO = 0.8
+
+# Верхняя оценка символов на токен (для отсева прогрева, попавшего в кэш)
+MAX_CHARS_PER_TOKEN = 10
+
+
+def canonicalize(text: str) -> str:
+    """Канонический вид префикса: \\n вместо \\r\\n, без пробелов в концах строк и по краям"""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+class SystemPrefix:
+    """Зарегистрированный системный префикс модели и статистика его переиспользования"""
+
+    def __init__(self, model: str, name: str, text: str, options: Optional[Dict[str, Any]] = None):
+        self.model = model
+        self.name = name
+        self.text = text
+        # Опции генерации: другой num_ctx в Ollama означает перезагрузку модели и потерю кэша
+        self.options = dict(options or {})
+        # Число токенов префикса (prompt_eval_count прогрева без кэша)
+        self.token_count: Optional[int] = None
+        self.requests = 0
+        self.reused = 0
+        self.prompt_eval_count = 0
+        self.eval_duration = 0
+        self.warmups = 0
+        self.last_warmup: Optional[float] = None
+
+    def stats(self) -> Dict[str, Any]:
+        measured = self.requests if self.token_count else 0
+        return {
+            'model': self.model,
+            'chars': len(self.text),
+            'tokens': self.token_count,
+            'requests': self.requests,
+            'reused': self.reused,
+            'reuse_rate': self.reused / measured if measured else None,
+            'avg_prompt_eval_count': self.prompt_eval_count / self.requests if self.requests else 0.0,
+            'avg_eval_duration_ms': self.eval_duration / self.requests / 1e6 if self.requests else 0.0,
+            'warmups': self.warmups
+        }
+
+
+class PromptAssembler:
+    """Реестр системных префиксов, сборка промптов, keep_alive и фоновый прогрев моделей"""
+
+    def __init__(self, client: AsyncOllamaClient, keep_alive: str = DEFAULT_KEEP_ALIVE,
+                 warmup_interval: float = DEFAULT_WARMUP_INTERVAL):
+        self.client = client
+        self.keep_alive = keep_alive
+        self.warmup_interval = warmup_interval
+        self.prefixes: Dict[Tuple[str, str], SystemPrefix] = {}
+        self._warmup_task: Optional[asyncio.Task] = None
+
+    def register(self, model: str, name: str, text: str,
+                 options: Optional[Dict[str, Any]] = None) -> SystemPrefix:
+        """Регистрирует (или возвращает уже зарегистрированный) префикс модели"""
+        text = canonicalize(text)
+        prefix = self.prefixes.get((model, name))
+        if prefix is None:
+            prefix = SystemPrefix(model, name, text, options)
+            self.prefixes[(model, name)] = prefix
+            logger.info(f"🧩 Префикс '{name}' для {model}: {len(text)} символов")
+        elif prefix.text != text:
+            # Другой текст под тем же именем - старый KV-кэш больше не подходит
+            logger.warning(f"⚠️ Префикс '{name}' для {model} изменился, кэш будет прогрет заново")
+            prefix.text = text
+            prefix.token_count = None
+        return prefix
+
+    @staticmethod
+    def build(prefix: SystemPrefix, body: str) -> str:
+        """Промпт = канонический префикс + разделитель + переменная часть"""
+        return prefix.text + PREFIX_SEPARATOR + body
+
+    def request_options(self) -> Dict[str, Any]:
+        """Дополнительные поля запроса Ollama (keep_alive)"""
+        return {"keep_alive": self.keep_alive}
+
+    async def generate(self, prefix: SystemPrefix, body: str, options: Optional[Dict[str, Any]] = None,
+                       timeout: Optional[float] = None, client: Optional[AsyncOllamaClient] = None,
+                       **extra) -> Dict[str, Any]:
+        """Генерация по промпту префикс + body с keep_alive и учетом метрик"""
+        prompt = self.build(prefix, body)
+        extra.setdefault("keep_alive", self.keep_alive)
+        client = client or self.client
+        data = await client.generate(prefix.model, prompt, options=options or prefix.options,
+                                     timeout=timeout, **extra)
+        self.record(prefix, prompt, data)
+        return data
+
+    def record(self, prefix: SystemPrefix, prompt: str, data: Dict[str, Any]):
+        """
+        Учитывает prompt_eval_count/eval_duration ответа. Ollama сообщает только
+        число вычисленных токенов, поэтому полный размер промпта оценивается
+        по плотности токенов префикса (токены на символ).
+        """
+        prompt_eval_count = data.get("prompt_eval_count") or 0
+        prefix.requests += 1
+        prefix.prompt_eval_count += prompt_eval_count
+        prefix.eval_duration += data.get("eval_duration") or 0
+
+        if prefix.token_count and prompt_eval_count:
+            tokens_per_char = prefix.token_count / max(len(prefix.text), 1)
+            estimated_total = len(prompt) * tokens_per_char
+            cached = estimated_total - prompt_eval_count
+            if cached >= prefix.token_count * PREFIX_REUSE_RATIO:
+                prefix.reused += 1
+
+    async def warm_up(self, prefix: Optional[SystemPrefix] = None):
+        """Вычисляет префикс(ы) в Ollama: модель загружается, KV-кэш префикса заполняется"""
+        targets = [prefix] if prefix is not None else list(self.prefixes.values())
+        for target in targets:
+            try:
+                data = await self.client.generate(
+                    target.model, target.text, options={**target.options, "num_predict": 1},
+                    keep_alive=self.keep_alive
+                )
+            except OllamaError as e:
+                logger.warning(f"⚠️ Прогрев '{target.name}' ({target.model}) не удался: {e}")
+                continue
+            target.warmups += 1
+            target.last_warmup = time.time()
+            # Полное число токенов известно, только если префикс не был в кэше:
+            # ответ из кэша (единицы токенов на весь префикс) не принимаем за размер
+            tokens = data.get("prompt_eval_count") or 0
+            plausible = tokens >= len(target.text) // MAX_CHARS_PER_TOKEN
+            if plausible and tokens > (target.token_count or 0):
+                target.token_count = tokens
+
+    async def _warmup_loop(self):
+        while True:
+            await self.warm_up()
+            await asyncio.sleep(self.warmup_interval)
+
+    def start_warmup(self):
+        """Запускает фоновый прогрев (вызывается из startup события приложения)"""
+        if self.warmup_interval <= 0 or (self._warmup_task is not None and not self._warmup_task.done()):
+            return
+        self._warmup_task = asyncio.ensure_future(self._warmup_loop())
+        logger.info(f"🔥 Прогрев моделей каждые {self.warmup_interval:.0f}с, keep_alive={self.keep_alive}")
+
+    async def stop_warmup(self):
+        """Останавливает фоновый прогрев"""
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+            try:
+                await self._warmup_task
+            except asyncio.CancelledError:
+                pass
+            self._warmup_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика префиксов и метрики Ollama по моделям"""
+        return {
+            'keep_alive': self.keep_alive,
+            'warmup_interval': self.warmup_interval,
+            'prefixes': {f"{model}:{name}": prefix.stats() for (model, name), prefix in self.prefixes.items()},
+            'models': self.client.stats()['models']
+        }
+
+
+# Общие сборщики по клиентам Ollama
+_assemblers: Dict[int, PromptAssembler] = {}
+
+
+def get_prompt_assembler(client: Optional[AsyncOllamaClient] = None) -> PromptAssembler:
+    """Возвращает общий сборщик промптов для клиента Ollama"""
+    client = client or get_ollama_client()
+    assembler = _assemblers.get(id(client))
+    if assembler is None or assembler.client is not client:
+        assembler = PromptAssembler(client)
+        _assemblers[id(client)] = assembler
+    return assembler
+
+
+__all__ = ['PromptAssembler', 'SystemPrefix', 'canonicalize', 'get_prompt_assembler', 'PREFIX_SEPARATOR']
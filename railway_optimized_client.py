@@ -6,10 +6,15 @@
 
 import json
 import logging
-import re
+import os
+import sys
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+# Общая нормализация текста из backend/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from text_normalizer import normalize_text
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -111,23 +116,8 @@ class RailwayOptimizedClient:
     
     def normalize_text_simple(self, text: str) -> str:
         """Простая нормализация текста без тяжелых библиотек"""
-        if not text:
-            return ""
-        
-        # Приводим к нижнему регистру
-        text = text.lower()
-        
-        # Убираем лишние символы и нормализуем
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Разбиваем на слова
-        words = text.split()
-        
-        # Убираем стоп-слова
-        words = [word for word in words if word not in self.stop_words and len(word) > 2]
-        
-        return ' '.join(words)
+        # Нижний регистр, пунктуация, стоп-слова и слова короче 3 букв
+        return normalize_text(text, self.stop_words, min_length=3)
     
     def calculate_similarity_simple(self, text1: str, text2: str) -> float:
         """Простой расчет схожести без тяжелых библиотек"""
@@ -8,14 +8,16 @@ import json
 import re
 import logging
 import requests
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
 import os
 
+from ollama_async_client import get_ollama_client, OllamaError, sse_event, single_answer_sse, SSE_HEADERS
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -55,6 +57,8 @@ class RailwayProxyClient:
         # URL локального сервера (нужно настроить)
         self.local_server_url = os.environ.get("LOCAL_SERVER_URL", "http://localhost:8001")
         self.local_available = False
+        # Пул keep-alive соединений к локальному серверу
+        self.local_server = get_ollama_client(self.local_server_url, timeout=120)
         
         # Проверяем доступность локального сервера
         self._check_local_server()
@@ -71,7 +75,7 @@ class RailwayProxyClient:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к локальному серверу: {e}")
     
-    def get_answer(self, question: str) -> Dict[str, Any]:
+    async def get_answer(self, question: str) -> Dict[str, Any]:
         """Получает ответ от гибридной системы"""
         start_time = datetime.now()
         
@@ -79,8 +83,8 @@ class RailwayProxyClient:
         if self.local_available:
             try:
                 logger.info("🧠 Запрашиваем ответ от локального сервера...")
-                response = self._query_local_server(question)
-                if response and response.get('response'):
+                response = await self._query_local_server(question)
+                if response and response.get('answer'):
                     processing_time = (datetime.now() - start_time).total_seconds()
                     logger.info(f"✅ Ответ получен за {processing_time:.2f}с")
                     return response
@@ -91,7 +95,7 @@ class RailwayProxyClient:
         logger.info("🔄 Fallback к простому поиску...")
         return self._simple_search(question)
     
-    def _query_local_server(self, question: str) -> Dict[str, Any]:
+    async def _query_local_server(self, question: str) -> Dict[str, Any]:
         """Запрашивает ответ от локального сервера"""
         try:
             payload = {
@@ -100,28 +104,46 @@ class RailwayProxyClient:
                 "locale": "ru"
             }
             
-            response = requests.post(
-                f"{self.local_server_url}/chat",
-                json=payload,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "answer": data.get('response', ''),
-                    "category": data.get('intent', 'unknown'),
-                    "confidence": data.get('confidence', 0.0),
-                    "source": "local_server"
-                }
+            data = await self.local_server.request_json("POST", "/chat", payload)
+            return {
+                "answer": data.get('response', ''),
+                "category": data.get('intent', 'unknown'),
+                "confidence": data.get('confidence', 0.0),
+                "source": "local_server"
+            }
             
-            logger.warning(f"⚠️ Локальный сервер вернул неожиданный ответ: {response.status_code}")
+        except OllamaError as e:
+            logger.warning(f"⚠️ Локальный сервер вернул неожиданный ответ: {e}")
             return None
-            
         except Exception as e:
             logger.error(f"❌ Ошибка запроса к локальному серверу: {e}")
             return None
     
+    async def stream_answer(self, question: str) -> AsyncIterator[str]:
+        """Ретранслирует SSE поток /chat/stream локального сервера (fallback - простой поиск)"""
+        relayed = False
+        if self.local_available:
+            payload = {
+                "text": question,
+                "user_id": "railway_proxy",
+                "locale": "ru"
+            }
+            try:
+                async for line in self.local_server.stream_lines("POST", "/chat/stream", payload):
+                    relayed = True
+                    # Пустые строки-разделители событий отбрасываются при чтении - восстанавливаем их
+                    yield line + ("\n\n" if line.startswith("data:") else "\n")
+                return
+            except OllamaError as e:
+                logger.error(f"❌ Ошибка потока от локального сервера: {e}")
+                if relayed:
+                    yield sse_event({"message": str(e)}, "error")
+                    return
+        
+        result = self._simple_search(question)
+        async for event in single_answer_sse(result["answer"], result["source"]):
+            yield event
+    
     def _simple_search(self, question: str) -> Dict[str, Any]:
         """Улучшенный поиск по ключевым словам (fallback)"""
         question_lower = question.lower()
@@ -207,7 +229,7 @@ async def webapp():
 async def chat(request: ChatRequest):
     """Основной эндпоинт для чата"""
     try:
-        result = railway_proxy_client.get_answer(request.text)
+        result = await railway_proxy_client.get_answer(request.text)
         
         return ChatResponse(
             response=result["answer"],
@@ -229,6 +251,15 @@ async def chat(request: ChatRequest):
             suggestions=[]
         )
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Потоковый ответ: токены LLM по мере генерации (Server-Sent Events)"""
+    return StreamingResponse(
+        railway_proxy_client.stream_answer(request.text),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -10,6 +10,10 @@ import requests
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import os
+import asyncio
+
+from ollama_async_client import get_ollama_client, OllamaTimeoutError
+from llm_selection import KBCandidateSelector
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -20,9 +24,12 @@ class SearchBasedLLMClient:
         self.ollama_url = os.environ.get("OLLAMA_URL", "http://localhost:11434")
         self.model_name = "aparu-senior-ai"
         self.ollama_available = False
+        self.ollama = get_ollama_client(self.ollama_url)
         
         # Загружаем базу знаний для поиска
         self.knowledge_base = self._load_knowledge_base()
+        # Лексический shortlist: в промпт LLM попадают только top-k кандидатов
+        self.selector = KBCandidateSelector(self.knowledge_base)
         
         # Проверяем доступность Ollama
         self._check_ollama_model()
@@ -103,7 +110,7 @@ class SearchBasedLLMClient:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к Ollama: {e}")
     
-    def find_best_answer(self, question: str) -> Dict[str, Any]:
+    async def find_best_answer(self, question: str) -> Dict[str, Any]:
         """Находит лучший ответ из базы знаний"""
         start_time = datetime.now()
         
@@ -111,7 +118,7 @@ class SearchBasedLLMClient:
         if self.ollama_available:
             try:
                 logger.info("🔍 Используем LLM для поиска ответа...")
-                result = self._llm_search_answer(question)
+                result = await self._llm_search_answer(question)
                 if result:
                     processing_time = (datetime.now() - start_time).total_seconds()
                     logger.info(f"✅ LLM поиск завершен за {processing_time:.2f}с")
@@ -123,25 +130,19 @@ class SearchBasedLLMClient:
         logger.info("🔄 Fallback к простому поиску...")
         return self._simple_search(question)
     
-    def _llm_search_answer(self, question: str) -> Dict[str, Any]:
-        """Использует LLM для поиска ответа в базе знаний"""
+    async def _llm_search_answer(self, question: str) -> Dict[str, Any]:
+        """Использует LLM для выбора ответа среди кандидатов из лексического индекса"""
         try:
-            # Создаем промпт для поиска, а не генерации
-            search_prompt = f"""Ты — поисковая система для FAQ APARU. Твоя задача — найти подходящий ответ из базы знаний.
-
-ВОПРОС ПОЛЬЗОВАТЕЛЯ: {question}
-
-БАЗА ЗНАНИЙ:
-{self._format_knowledge_base()}
-
-ИНСТРУКЦИИ:
-1. Проанализируй вопрос пользователя
-2. Найди наиболее подходящий ответ из базы знаний
-3. Верни ТОЛЬКО номер категории (например: "1", "2", "3")
-4. НЕ генерируй новый текст
-5. НЕ объясняй свой выбор
-
-ОТВЕТ (только номер категории):"""
+            candidates = self.selector.shortlist(question)
+            if not candidates:
+                logger.info("🔍 Нет лексических кандидатов - LLM не вызываем")
+                return None
+            if len(candidates) == 1:
+                # Единственный кандидат - выбирать LLM нечего
+                return self._kb_result(candidates[0], 0.9, "lexical_shortlist")
+            
+            # Промпт для поиска, а не генерации: только кандидаты, инструкции - общий префикс
+            search_prompt = self.selector.build_prompt(question, candidates)
 
             payload = {
                 "model": self.model_name,
@@ -150,7 +151,7 @@ class SearchBasedLLMClient:
                 "options": {
                     "temperature": 0.01,  # Минимальная температура для точности
                     "num_predict": 5,     # Только номер категории
-                    "num_ctx": 512,       # Достаточно для базы знаний
+                    "num_ctx": 1024,      # Список кандидатов (~2k символов) без обрезки инструкций
                     "repeat_penalty": 1.0,
                     "top_k": 1,           # Только лучший вариант
                     "top_p": 0.1,         # Минимальная вероятность
@@ -158,71 +159,36 @@ class SearchBasedLLMClient:
                 }
             }
             
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload,
+            data = await self.ollama.generate(
+                payload["model"], payload["prompt"], options=payload["options"],
                 timeout=10  # Короткий таймаут для поиска
             )
+            answer = data.get('response', '').strip()
             
-            if response.status_code == 200:
-                data = response.json()
-                answer = data.get('response', '').strip()
-                
-                # Парсим номер категории
-                category_num = self._parse_category_number(answer)
-                if category_num:
-                    # Получаем ответ из базы знаний
-                    if 1 <= category_num <= len(self.knowledge_base):
-                        kb_item = self.knowledge_base[category_num - 1]
-                        return {
-                            "answer": kb_item.get("answer", "Ответ не найден"),
-                            "category": kb_item.get("question", f"Категория {category_num}"),
-                            "confidence": 0.95,
-                            "source": "llm_search"
-                        }
-                
-                logger.warning(f"⚠️ LLM вернул неожиданный ответ: {answer}")
-                return None
+            # Номер в списке кандидатов -> пункт базы знаний
+            kb_index = self.selector.resolve(answer, candidates)
+            if kb_index is not None:
+                return self._kb_result(kb_index, 0.95, "llm_search")
             
-            logger.warning(f"⚠️ LLM вернул ошибку: {response.status_code}")
+            logger.warning(f"⚠️ LLM вернул неожиданный ответ: {answer}")
             return None
             
-        except requests.exceptions.Timeout:
+        except OllamaTimeoutError:
             logger.error(f"❌ LLM поиск таймаут (>10с)")
             return None
         except Exception as e:
             logger.error(f"❌ Ошибка LLM поиска: {e}")
             return None
     
-    def _format_knowledge_base(self) -> str:
-        """Форматирует базу знаний для LLM"""
-        formatted = ""
-        for i, item in enumerate(self.knowledge_base, 1):
-            question = item.get("question", f"Вопрос {i}")
-            answer = item.get("answer", "Ответ не найден")
-            keywords = item.get("keywords", [])
-            variations = item.get("variations", [])
-            
-            formatted += f"{i}. ВОПРОС: {question}\n"
-            formatted += f"   ОТВЕТ: {answer}\n"
-            formatted += f"   КЛЮЧЕВЫЕ СЛОВА: {', '.join(keywords)}\n"
-            formatted += f"   ВАРИАЦИИ: {', '.join(variations[:5])}\n\n"
-        
-        return formatted
-    
-    def _parse_category_number(self, answer: str) -> Optional[int]:
-        """Парсит номер категории из ответа LLM"""
-        try:
-            # Ищем число в ответе
-            import re
-            numbers = re.findall(r'\d+', answer)
-            if numbers:
-                num = int(numbers[0])
-                if 1 <= num <= len(self.knowledge_base):
-                    return num
-            return None
-        except:
-            return None
+    def _kb_result(self, kb_index: int, confidence: float, source: str) -> Dict[str, Any]:
+        """Ответ из пункта базы знаний"""
+        kb_item = self.knowledge_base[kb_index]
+        return {
+            "answer": kb_item.get("answer", "Ответ не найден"),
+            "category": kb_item.get("question", f"Категория {kb_index + 1}"),
+            "confidence": confidence,
+            "source": source
+        }
     
     def _simple_search(self, question: str) -> Dict[str, Any]:
         """Простой поиск по ключевым словам (fallback)"""
@@ -279,7 +245,7 @@ if __name__ == "__main__":
     
     for question in test_questions:
         print(f"\n❓ Вопрос: {question}")
-        result = client.find_best_answer(question)
+        result = asyncio.run(client.find_best_answer(question))
         print(f"✅ Ответ: {result['answer']}")
         print(f"📊 Категория: {result['category']}")
         print(f"🎯 Уверенность: {result['confidence']}")
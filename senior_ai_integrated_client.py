@@ -4,60 +4,72 @@
 Максимальное качество поиска с профессиональной системой
 """
 
+import os
+import sys
 import json
+import atexit
 import logging
-import pickle
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 import hashlib
 
-# Импорты для продвинутой обработки текста
-try:
-    import nltk
-    from nltk.corpus import stopwords
-    from nltk.stem import SnowballStemmer
-    from nltk.tokenize import word_tokenize
-    NLTK_AVAILABLE = True
-except ImportError:
-    NLTK_AVAILABLE = False
+# Импорты для продвинутой обработки текста: NLTK импортируется при
+# инициализации стеммера, а не при импорте модуля
+import importlib.util
+NLTK_AVAILABLE = importlib.util.find_spec("nltk") is not None
 
-# Импорты для эмбеддингов
-try:
-    from sentence_transformers import SentenceTransformer
-    import faiss
-    EMBEDDINGS_AVAILABLE = True
-except ImportError:
-    EMBEDDINGS_AVAILABLE = False
+# Хранилище индекса эмбеддингов (memmap float32 + манифест) из backend/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+# Модель эмбеддингов: ONNX int8 (onnxruntime) или PyTorch (sentence-transformers)
+from embedding_backend import load_embedding_model, EMBEDDINGS_AVAILABLE
+from embedding_store import EmbeddingStore, IndexFormatError, kb_hash
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH
+from lazy_loader import BackgroundLoader
 
-# Импорты для fuzzy search
-try:
-    from fuzzywuzzy import fuzz, process
-    FUZZY_AVAILABLE = True
-except ImportError:
-    FUZZY_AVAILABLE = False
+EMBEDDINGS_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+# Fuzzy search: триграммный индекс (fuzzywuzzy или эквивалент на чистом Python)
+from fuzzy_index import FuzzyIndex, FUZZY_AVAILABLE
+from keyword_term_index import KeywordTermIndex
+from hybrid_executor import HybridSearchExecutor
+from text_normalizer import normalize_words
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SeniorAIIntegratedClient:
-    def __init__(self, knowledge_base_path: str = "senior_ai_knowledge_base.json", index_path: str = "senior_ai_search_index.pkl"):
+    def __init__(self, knowledge_base_path: str = "senior_ai_knowledge_base.json", index_path: str = "senior_ai_search_index",
+                 lazy_embeddings: bool = False):
         self.knowledge_base_path = knowledge_base_path
         self.index_path = index_path
         self.knowledge_base = []
         self.embeddings_model = None
+        # Эмбеддинги запросов считаются пакетами (микро-батчинг)
+        self.query_batcher = None
+        # Кэш эмбеддингов нормализованных запросов (общий для веток гибридного поиска)
+        self.embedding_cache = EmbeddingCache(model=EMBEDDINGS_MODEL_NAME, path=DEFAULT_CACHE_PATH)
+        if self.embedding_cache.path:
+            atexit.register(self.embedding_cache.save)
         self.embeddings_index = None
         self.question_embeddings = None
-        self.text_to_item = {}
+        self.fuzzy_index = None
+        self.keyword_index = None
+        # Ветки гибридного поиска выполняются параллельно с дедлайнами
+        self.hybrid_executor = HybridSearchExecutor()
         self.stop_words = set()
         self.stemmer = None
         
         # Инициализация компонентов
         self._load_knowledge_base()
         self._initialize_text_processing()
-        self._initialize_embeddings()
-        self._load_search_index()
+        self._build_lexical_indexes()
+        # Модель и индекс эмбеддингов грузятся сразу или в фоновом потоке
+        # (lazy_embeddings): до готовности работает лексический и fuzzy поиск
+        self.embeddings_loader = BackgroundLoader("embeddings", self._load_embedding_components)
+        self.embeddings_loader.start(background=lazy_embeddings)
         
         # Метрики качества
         self.quality_metrics = {
@@ -88,6 +100,7 @@ class SeniorAIIntegratedClient:
             
             # Стеммер для русского языка
             if NLTK_AVAILABLE:
+                from nltk.stem import SnowballStemmer
                 self.stemmer = SnowballStemmer('russian')
             
             logger.info("✅ Продвинутая обработка текста инициализирована")
@@ -96,11 +109,19 @@ class SeniorAIIntegratedClient:
             self.stop_words = set()
             self.stemmer = None
     
+    def _build_lexical_indexes(self):
+        """Строит индексы ключевых слов и fuzzy поиска (нормализация базы один раз при загрузке)"""
+        self.keyword_index = KeywordTermIndex(self.knowledge_base, self.normalize_text_advanced)
+        self.fuzzy_index = FuzzyIndex.from_knowledge_base(self.knowledge_base)
+    
     def _initialize_embeddings(self):
         """Инициализирует модель эмбеддингов"""
         if EMBEDDINGS_AVAILABLE:
             try:
-                self.embeddings_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+                model = load_embedding_model(EMBEDDINGS_MODEL_NAME)
+                self.query_batcher = EmbeddingBatcher(model.encode)
+                # Модель публикуется последней: по ней поиск решает, включать ли эмбеддинги
+                self.embeddings_model = model
                 logger.info("✅ Модель эмбеддингов загружена")
             except Exception as e:
                 logger.warning(f"⚠️ Ошибка загрузки модели эмбеддингов: {e}")
@@ -108,19 +129,36 @@ class SeniorAIIntegratedClient:
         else:
             logger.warning("⚠️ Эмбеддинги недоступны")
     
+    def _load_embedding_components(self) -> bool:
+        """Загружает модель эмбеддингов и поисковый индекс (выполняется BackgroundLoader)"""
+        self._initialize_embeddings()
+        self._load_search_index()
+        if self.embeddings_model is None or self.embeddings_index is None:
+            raise RuntimeError("модель или индекс эмбеддингов недоступны, работает лексический поиск")
+        return True
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        """Готовность компонентов: лексический поиск доступен сразу, эмбеддинги - после загрузки"""
+        return {
+            'lexical': bool(self.knowledge_base),
+            'embeddings': self.embeddings_loader.ready,
+            'embeddings_loader': self.embeddings_loader.status()
+        }
+    
     def _load_search_index(self):
-        """Загружает поисковый индекс"""
+        """Открывает поисковый индекс (memmap, без десериализации Python объектов)"""
         try:
-            with open(self.index_path, 'rb') as f:
-                index_data = pickle.load(f)
-            
-            self.embeddings_index = index_data['embeddings_index']
-            self.question_embeddings = index_data['question_embeddings']
-            self.text_to_item = index_data['text_to_item']
+            self.embeddings_index = EmbeddingStore.load(
+                self.index_path, model=EMBEDDINGS_MODEL_NAME, kb=kb_hash(self.knowledge_base)
+            )
+            self.question_embeddings = self.embeddings_index.embeddings
             
-            logger.info("✅ Поисковый индекс загружен")
+            logger.info(f"✅ Поисковый индекс загружен: {len(self.embeddings_index)} текстов")
         except FileNotFoundError:
-            logger.warning(f"⚠️ Поисковый индекс не найден: {self.index_path}")
+            logger.warning(f"⚠️ Поисковый индекс не найден: {self.index_path} (запустите senior_ai_parser.py)")
+            self.embeddings_index = None
+        except IndexFormatError as e:
+            logger.warning(f"⚠️ Поисковый индекс устарел: {e} (запустите senior_ai_parser.py)")
             self.embeddings_index = None
         except Exception as e:
             logger.warning(f"⚠️ Ошибка загрузки поискового индекса: {e}")
@@ -128,22 +166,8 @@ class SeniorAIIntegratedClient:
     
     def normalize_text_advanced(self, text: str) -> str:
         """Продвинутая нормализация текста"""
-        if not text:
-            return ""
-        
-        # Приводим к нижнему регистру
-        text = text.lower()
-        
-        # Убираем лишние символы и нормализуем
-        import re
-        text = re.sub(r'[^\w\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Разбиваем на слова
-        words = text.split()
-        
-        # Убираем стоп-слова
-        words = [word for word in words if word not in self.stop_words and len(word) > 2]
+        # Нижний регистр, пунктуация, стоп-слова и слова короче 3 букв
+        words = normalize_words(text, self.stop_words, min_length=3)
         
         # Стемминг
         if self.stemmer:
@@ -160,103 +184,31 @@ class SeniorAIIntegratedClient:
             # Нормализуем запрос
             normalized_query = self.normalize_text_advanced(query)
             
-            # Создаем эмбеддинг для запроса
-            query_embedding = self.embeddings_model.encode([normalized_query])
-            faiss.normalize_L2(query_embedding)
-            
-            # Поиск в FAISS
-            scores, indices = self.embeddings_index.search(query_embedding, top_k)
+            # Эмбеддинг запроса: из кэша или в общем пакете с параллельными запросами
+            query_embedding = self.embedding_cache.get_or_compute(normalized_query, self.query_batcher.encode)
             
-            results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < len(self.question_embeddings):
-                    # Находим соответствующий элемент базы знаний
-                    text = list(self.text_to_item.keys())[idx]
-                    item = self.text_to_item[text]
-                    item_id = item['id'] - 1  # Индекс в массиве
-                    results.append((item_id, float(score)))
-            
-            return results
+            # Строки матрицы -> пункты базы (row_to_item_id), лучшая вариация каждого пункта
+            return self.embeddings_index.search_items(query_embedding, top_k)
         except Exception as e:
             logger.warning(f"⚠️ Ошибка поиска по эмбеддингам: {e}")
             return []
     
     def search_by_keywords_advanced(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
         """Продвинутый поиск по ключевым словам"""
-        normalized_query = self.normalize_text_advanced(query)
-        query_words = set(normalized_query.split())
-        
-        results = []
-        
-        for idx, item in enumerate(self.knowledge_base):
-            score = 0
-            
-            # Проверяем ключевые слова
-            for keyword in item.get('keywords', []):
-                keyword_normalized = self.normalize_text_advanced(keyword)
-                if keyword_normalized in query_words:
-                    score += 2  # Высокий вес для ключевых слов
-            
-            # Проверяем основной вопрос
-            question_normalized = self.normalize_text_advanced(item['question'])
-            question_words = set(question_normalized.split())
-            common_words = query_words.intersection(question_words)
-            score += len(common_words) * 1.5
-            
-            # Проверяем вариации
-            for variation in item.get('variations', []):
-                variation_normalized = self.normalize_text_advanced(variation)
-                variation_words = set(variation_normalized.split())
-                common_words = query_words.intersection(variation_words)
-                score += len(common_words) * 1.0
-            
-            # Проверяем ответ
-            answer_normalized = self.normalize_text_advanced(item['answer'])
-            answer_words = set(answer_normalized.split())
-            common_words = query_words.intersection(answer_words)
-            score += len(common_words) * 0.5
-            
-            if score > 0:
-                results.append((idx, score))
+        if self.keyword_index is None:
+            return []
         
-        # Сортируем по убыванию score
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results[:top_k]
+        # Поля базы нормализованы при загрузке: на запрос только сумма весов общих терминов
+        return self.keyword_index.search(query, top_k)
     
     def search_by_fuzzy_advanced(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
         """Продвинутый поиск по fuzzy matching"""
-        if not FUZZY_AVAILABLE:
+        if self.fuzzy_index is None:
             return []
         
         try:
-            # Собираем все вопросы и вариации
-            all_questions = []
-            question_to_idx = {}
-            
-            for idx, item in enumerate(self.knowledge_base):
-                all_questions.append(item['question'])
-                question_to_idx[item['question']] = idx
-                
-                for variation in item.get('variations', []):
-                    all_questions.append(variation)
-                    question_to_idx[variation] = idx
-            
-            # Fuzzy search с разными алгоритмами
-            matches = process.extract(query, all_questions, limit=top_k*2, scorer=fuzz.ratio)
-            
-            results = []
-            seen_indices = set()
-            
-            for match_text, score in matches:
-                if match_text in question_to_idx:
-                    idx = question_to_idx[match_text]
-                    if idx not in seen_indices:
-                        # Нормализуем score к 0-1
-                        normalized_score = score / 100.0
-                        results.append((idx, normalized_score))
-                        seen_indices.add(idx)
-            
-            return results[:top_k]
+            # Точный fuzz.ratio только для строк с общими триграммами
+            return self.fuzzy_index.search(query, top_k)
         except Exception as e:
             logger.warning(f"⚠️ Ошибка fuzzy search: {e}")
             return []
@@ -265,10 +217,15 @@ class SeniorAIIntegratedClient:
         """Продвинутый гибридный поиск"""
         start_time = datetime.now()
         
-        # Получаем результаты от каждого метода
-        embedding_results = self.search_by_embeddings_advanced(query, top_k)
-        keyword_results = self.search_by_keywords_advanced(query, top_k)
-        fuzzy_results = self.search_by_fuzzy_advanced(query, top_k)
+        # Получаем результаты от каждого метода (параллельно; опоздавшая ветка дает пустой список)
+        branch_results = self.hybrid_executor.run({
+            'embeddings': lambda: self.search_by_embeddings_advanced(query, top_k),
+            'keywords': lambda: self.search_by_keywords_advanced(query, top_k),
+            'fuzzy': lambda: self.search_by_fuzzy_advanced(query, top_k)
+        })
+        embedding_results = branch_results['embeddings']
+        keyword_results = branch_results['keywords']
+        fuzzy_results = branch_results['fuzzy']
         
         # Объединяем результаты с адаптивными весами
         combined_scores = {}
@@ -369,7 +326,13 @@ class SeniorAIIntegratedClient:
             **self.quality_metrics,
             'total_knowledge_records': len(self.knowledge_base),
             'embeddings_available': self.embeddings_model is not None,
+            'embedding_batches': self.query_batcher.stats() if self.query_batcher else None,
+            'embedding_cache': self.embedding_cache.stats(),
+            'embeddings_loader': self.embeddings_loader.status(),
             'fuzzy_available': FUZZY_AVAILABLE,
+            'fuzzy_index': self.fuzzy_index.stats() if self.fuzzy_index else None,
+            'keyword_index': self.keyword_index.stats() if self.keyword_index else None,
+            'hybrid_branches': self.hybrid_executor.stats(),
             'nltk_available': NLTK_AVAILABLE
         }
         
@@ -385,8 +348,8 @@ class SeniorAIIntegratedClient:
             'high_confidence_rate': high_confidence_rate
         }
 
-# Глобальный экземпляр для интеграции
-senior_ai_integrated_client = SeniorAIIntegratedClient()
+# Глобальный экземпляр для интеграции (эмбеддинги грузятся в фоне, импорт не блокируется)
+senior_ai_integrated_client = SeniorAIIntegratedClient(lazy_embeddings=True)
 
 def get_enhanced_answer(question: str) -> str:
     """Основной API для интеграции с main.py"""
@@ -396,6 +359,10 @@ def get_senior_ai_statistics() -> Dict[str, Any]:
     """API для получения статистики Senior AI системы"""
     return senior_ai_integrated_client.get_statistics()
 
+def get_readiness() -> Dict[str, Any]:
+    """API для проверки готовности компонентов (readiness)"""
+    return senior_ai_integrated_client.get_readiness()
+
 if __name__ == "__main__":
     # Тестируем интегрированную систему
     client = SeniorAIIntegratedClient()
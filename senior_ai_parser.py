@@ -4,9 +4,10 @@
 Senior AI Engineer - максимальное качество обучения
 """
 
+import os
+import sys
 import json
 import logging
-import pickle
 import numpy as np
 from typing import Dict, List, Any, Tuple
 from pathlib import Path
@@ -25,13 +26,13 @@ try:
 except ImportError:
     NLTK_AVAILABLE = False
 
-# Импорты для эмбеддингов
-try:
-    from sentence_transformers import SentenceTransformer
-    import faiss
-    EMBEDDINGS_AVAILABLE = True
-except ImportError:
-    EMBEDDINGS_AVAILABLE = False
+# Хранилище индекса эмбеддингов (memmap float32 + манифест) из backend/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+# Модель эмбеддингов: ONNX int8 (onnxruntime) или PyTorch (sentence-transformers)
+from embedding_backend import load_embedding_model, EMBEDDINGS_AVAILABLE
+from embedding_store import EmbeddingStore, kb_hash, normalize_rows
+
+EMBEDDINGS_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
 
 # Импорты для fuzzy search
 try:
@@ -47,8 +48,9 @@ class SeniorAIParser:
     def __init__(self):
         self.knowledge_base = []
         self.embeddings_model = None
-        self.embeddings_index = None
-        self.question_embeddings = []
+        self.question_embeddings = None
+        # Номер пункта базы знаний для каждой строки матрицы эмбеддингов
+        self.row_to_item_id: List[int] = []
         self.stop_words = set()
         self.stemmer = None
         
@@ -79,7 +81,7 @@ class SeniorAIParser:
         if EMBEDDINGS_AVAILABLE:
             try:
                 # Используем лучшую модель для русского языка
-                self.embeddings_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+                self.embeddings_model = load_embedding_model(EMBEDDINGS_MODEL_NAME)
                 logger.info("✅ Модель эмбеддингов загружена")
             except Exception as e:
                 logger.warning(f"⚠️ Ошибка загрузки модели эмбеддингов: {e}")
@@ -295,37 +297,23 @@ class SeniorAIParser:
         if self.embeddings_model:
             try:
                 all_texts = []
-                text_to_item = {}
-                
-                for item in self.knowledge_base:
-                    # Основной вопрос
-                    all_texts.append(item['question'])
-                    text_to_item[item['question']] = item
-                    
-                    # Вариации
-                    for variation in item['variations']:
-                        all_texts.append(variation)
-                        text_to_item[variation] = item
+                row_to_item_id = []
                 
-                # Создаем эмбеддинги
-                self.question_embeddings = self.embeddings_model.encode(all_texts)
+                for item_id, item in enumerate(self.knowledge_base):
+                    # Основной вопрос и вариации - по строке матрицы на каждый текст
+                    for text in [item['question']] + item['variations']:
+                        all_texts.append(text)
+                        row_to_item_id.append(item_id)
                 
-                # Создаем FAISS индекс
-                dimension = self.question_embeddings.shape[1]
-                self.embeddings_index = faiss.IndexFlatIP(dimension)
-                
-                # Нормализуем эмбеддинги для cosine similarity
-                faiss.normalize_L2(self.question_embeddings)
-                self.embeddings_index.add(self.question_embeddings)
-                
-                # Сохраняем маппинг
-                self.text_to_item = text_to_item
+                # Создаем эмбеддинги, нормализованные для cosine similarity
+                self.question_embeddings = normalize_rows(self.embeddings_model.encode(all_texts))
+                self.row_to_item_id = row_to_item_id
                 
                 logger.info(f"✅ Продвинутый индекс создан: {len(all_texts)} текстов")
                 
             except Exception as e:
                 logger.warning(f"⚠️ Ошибка создания продвинутого индекса: {e}")
-                self.embeddings_index = None
+                self.question_embeddings = None
     
     def save_advanced_knowledge_base(self, output_path: str = "senior_ai_knowledge_base.json"):
         """Сохраняет продвинутую базу знаний"""
@@ -342,21 +330,17 @@ class SeniorAIParser:
             logger.error(f"❌ Ошибка сохранения базы знаний: {e}")
             return None
     
-    def save_search_index(self, output_path: str = "senior_ai_search_index.pkl"):
-        """Сохраняет поисковый индекс"""
-        if not self.embeddings_index:
+    def save_search_index(self, output_path: str = "senior_ai_search_index"):
+        """Сохраняет поисковый индекс (каталог: матрица float32, номера пунктов, манифест)"""
+        if self.question_embeddings is None:
             logger.warning("⚠️ Поисковый индекс не создан")
             return None
         
         try:
-            index_data = {
-                'embeddings_index': self.embeddings_index,
-                'question_embeddings': self.question_embeddings,
-                'text_to_item': self.text_to_item
-            }
-            
-            with open(output_path, 'wb') as f:
-                pickle.dump(index_data, f)
+            EmbeddingStore.save(
+                output_path, self.question_embeddings, self.row_to_item_id,
+                model=EMBEDDINGS_MODEL_NAME, kb=kb_hash(self.knowledge_base)
+            )
             
             logger.info(f"✅ Поисковый индекс сохранен: {output_path}")
             return output_path
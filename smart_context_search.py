@@ -4,20 +4,25 @@
 Понимает контекст и смысл вопросов, а не только точные совпадения
 """
 
+import os
+import sys
 import json
 import re
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
 from typing import List, Dict, Tuple
 
+# Модель эмбеддингов: ONNX int8 (onnxruntime) или PyTorch (sentence-transformers)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from embedding_backend import load_embedding_model
+
 class SmartContextSearch:
     def __init__(self):
         """Инициализация умной системы поиска"""
         
         # Загружаем модель для создания эмбеддингов
-        self.model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = load_embedding_model('paraphrase-multilingual-MiniLM-L12-v2')
         
         # База знаний
         self.knowledge_base = []
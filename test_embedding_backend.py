@@ -0,0 +1,95 @@
+"""
+Тест бэкендов модели эмбеддингов: пулинг, сверка точности, выбор бэкенда
+"""
+
+import sys
+sys.path.insert(0, 'backend')
+
+import numpy as np
+import embedding_backend
+from embedding_backend import mean_pooling, check_accuracy, kb_texts, load_embedding_model, onnx_model_dir
+
+class TableEncoder:
+    """Кодировщик по таблице векторов (эталон или бэкенд-кандидат)"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def encode(self, texts):
+        return self.vectors[:len(texts)]
+
+def test_mean_pooling():
+    """Паддинг не влияет на эмбеддинг предложения"""
+    print("🧪 Тестирование mean pooling")
+    print("=" * 60)
+
+    tokens = np.array([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]],
+                       [[5.0, 6.0], [0.0, 0.0], [0.0, 0.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0], [1, 0, 0]])
+    pooled = mean_pooling(tokens, mask)
+    assert pooled.dtype == np.float32
+    np.testing.assert_allclose(pooled, [[2.0, 3.0], [5.0, 6.0]])
+    print("✅ Среднее считается только по токенам")
+
+def test_check_accuracy():
+    """Сверка проходит для близких эмбеддингов и не проходит для искаженных"""
+    print("🧪 Тестирование сверки точности")
+    print("=" * 60)
+
+    texts = kb_texts("senior_ai_knowledge_base.json")
+    assert len(texts) > 50 and len(texts) == len(set(texts))
+
+    rng = np.random.default_rng(0)
+    reference = rng.normal(size=(len(texts), 384)).astype(np.float32)
+    # int8 квантизация дает малый шум
+    quantized = reference + rng.normal(scale=0.02, size=reference.shape).astype(np.float32)
+    report = check_accuracy(TableEncoder(reference), TableEncoder(quantized), texts)
+    print(f"📊 {report}")
+    assert report['passed'] and report['mean_cosine'] > 0.99
+
+    broken = rng.normal(size=reference.shape).astype(np.float32)
+    report = check_accuracy(TableEncoder(reference), TableEncoder(broken), texts)
+    assert not report['passed']
+    print("✅ Регрессия точности обнаруживается")
+
+def test_backend_selection():
+    """Без экспортированной модели и torch загрузчик не падает"""
+    print("🧪 Тестирование выбора бэкенда")
+    print("=" * 60)
+
+    name = "paraphrase-multilingual-MiniLM-L12-v2"
+    assert onnx_model_dir(name).endswith(name + "-onnx")
+    assert onnx_model_dir("sentence-transformers/" + name) == onnx_model_dir(name)
+    if not embedding_backend.TORCH_AVAILABLE and not embedding_backend.onnx_model_exported(name):
+        assert load_embedding_model(name, "onnx") is None
+        print("✅ Бэкенды недоступны - эмбеддинги отключаются")
+        return
+
+    model = load_embedding_model(name)
+    vectors = model.encode(["Что такое наценка?", "Как пополнить баланс?"])
+    assert vectors.shape == (2, 384)
+    print(f"✅ Загружен бэкенд: {type(model).__name__}")
+
+def test_onnx_matches_torch():
+    """ONNX int8 модель совпадает с PyTorch на вариациях базы (если обе доступны)"""
+    print("🧪 Сверка ONNX с PyTorch на базе знаний")
+    print("=" * 60)
+
+    name = "paraphrase-multilingual-MiniLM-L12-v2"
+    if not (embedding_backend.TORCH_AVAILABLE and embedding_backend.ONNX_AVAILABLE
+            and embedding_backend.onnx_model_exported(name)):
+        print("⚠️ Нужны sentence-transformers, onnxruntime и экспортированная модель - пропускаем")
+        return
+
+    texts = kb_texts("senior_ai_knowledge_base.json")
+    report = check_accuracy(load_embedding_model(name, "torch"), load_embedding_model(name, "onnx"), texts)
+    print(f"📊 {report}")
+    assert report['passed']
+    print("✅ Точность ONNX int8 сохранена")
+
+if __name__ == "__main__":
+    test_mean_pooling()
+    test_check_accuracy()
+    test_backend_selection()
+    test_onnx_matches_torch()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,98 @@
+"""
+Тест микро-батчинга эмбеддингов запросов
+"""
+
+import sys
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, 'backend')
+
+import numpy as np
+from embedding_batcher import EmbeddingBatcher
+
+class SlowEncoder:
+    """Кодировщик с фиксированной стоимостью вызова (как forward pass модели)"""
+
+    def __init__(self, cost: float = 0.02):
+        self.cost = cost
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def encode(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        time.sleep(self.cost)
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float64)
+
+def test_concurrent_requests_share_batch():
+    """Параллельные запросы кодируются одним вызовом, каждый получает свой вектор"""
+    print("🧪 Тестирование пакетов из параллельных запросов")
+    print("=" * 60)
+
+    encoder = SlowEncoder()
+    batcher = EmbeddingBatcher(encoder.encode, max_batch_size=16, max_wait_ms=20)
+    texts = [f"вопрос {'x' * i}" for i in range(16)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        vectors = list(pool.map(batcher.encode, texts))
+    elapsed = time.perf_counter() - start
+
+    for text, vector in zip(texts, vectors):
+        assert vector.dtype == np.float32 and vector[0] == len(text)
+    stats = batcher.stats()
+    print(f"📊 {stats}, {elapsed * 1000:.0f} мс на 16 запросов")
+    assert stats['requests'] == 16
+    assert len(encoder.calls) <= 3 and stats['max_batch_size'] >= 8
+    assert elapsed < 16 * encoder.cost
+    print("✅ Запросы объединяются в пакеты")
+
+def test_batch_size_limit_and_duplicates():
+    """Пакет не превышает max_batch_size, одинаковые тексты кодируются один раз"""
+    print("🧪 Тестирование размера пакета и дубликатов")
+    print("=" * 60)
+
+    encoder = SlowEncoder(cost=0.01)
+    batcher = EmbeddingBatcher(encoder.encode, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(text) for text in ["a", "b", "a", "c", "d", "e", "f"]]
+    results = [future.result(1) for future in futures]
+
+    assert all(len(call) <= 4 for call in encoder.calls)
+    assert results[0][0] == results[2][0] == 1
+    assert batcher.stats()['requests'] == 7 and batcher.stats()['encoded'] == 6
+    print(f"✅ Вызовы encode: {encoder.calls}")
+
+def test_errors_and_async():
+    """Ошибка encode получают все запросы пакета; encode_async работает из корутин"""
+    print("🧪 Тестирование ошибок и асинхронного API")
+    print("=" * 60)
+
+    def broken(texts):
+        raise RuntimeError("модель недоступна")
+
+    batcher = EmbeddingBatcher(broken, max_wait_ms=1)
+    try:
+        batcher.encode("наценка", timeout=1)
+        assert False, "ожидалась ошибка"
+    except RuntimeError:
+        pass
+    assert batcher.stats()['errors'] == 1
+
+    encoder = SlowEncoder(cost=0.01)
+    batcher = EmbeddingBatcher(encoder.encode, max_wait_ms=10)
+
+    async def run():
+        return await asyncio.gather(*[batcher.encode_async(text) for text in ["один", "два", "три"]])
+
+    vectors = asyncio.run(run())
+    assert [vector[0] for vector in vectors] == [4, 3, 3]
+    assert len(encoder.calls) == 1
+    print("✅ Ошибки и encode_async работают")
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_batch()
+    test_batch_size_limit_and_duplicates()
+    test_errors_and_async()
+    print("\n🎉 Все тесты пройдены!")
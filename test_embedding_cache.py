@@ -0,0 +1,84 @@
+"""
+Тест кэша эмбеддингов запросов
+"""
+
+import os
+import sys
+import tempfile
+sys.path.insert(0, 'backend')
+
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+def vector(value, dim=4):
+    return np.full(dim, value, dtype=np.float64)
+
+def test_lru_and_byte_budget():
+    """Вытеснение по LRU при превышении бюджета в байтах"""
+    print("🧪 Тестирование LRU и бюджета памяти")
+    print("=" * 60)
+
+    entry_size = 4 * 4 + len("запрос 0") * 4
+    cache = EmbeddingCache(budget_bytes=entry_size * 3)
+    for i in range(3):
+        cache.put(f"запрос {i}", vector(i))
+    assert cache.get("запрос 0") is not None  # запрос 0 становится свежим
+    cache.put("запрос 3", vector(3))
+
+    assert cache.get("запрос 1") is None
+    stored = cache.get("запрос 0")
+    assert stored.dtype == np.float32 and not stored.flags.writeable
+    stats = cache.stats()
+    print(f"📊 {stats}")
+    assert stats['size'] == 3 and stats['bytes'] <= stats['budget_bytes'] and stats['evictions'] == 1
+    assert stats['hits'] == 2 and stats['misses'] == 1
+    print("✅ Бюджет соблюдается, вытесняются старые записи")
+
+def test_get_or_compute():
+    """При повторном запросе encode не вызывается"""
+    print("🧪 Тестирование get_or_compute")
+    print("=" * 60)
+
+    calls = []
+
+    def encode(text):
+        calls.append(text)
+        return vector(len(text))
+
+    cache = EmbeddingCache()
+    for text in ["наценк", "баланс попoлн", "наценк", "наценк"]:
+        result = cache.get_or_compute(text, encode)
+        assert result[0] == len(text)
+    assert calls == ["наценк", "баланс попoлн"]
+    assert cache.stats()['hit_rate'] == 0.5
+    print("✅ Повторные запросы берутся из кэша")
+
+def test_persistence():
+    """Кэш переживает перезапуск, файл другой модели игнорируется"""
+    print("🧪 Тестирование сохранения на диск")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embedding_cache.npz")
+        cache = EmbeddingCache(model="m", path=path)
+        for i in range(5):
+            cache.put(f"запрос {i}", vector(i))
+        cache.get("запрос 0")
+        assert cache.save()
+        assert not [name for name in os.listdir(tmp) if "tmp" in name]
+
+        restored = EmbeddingCache(model="m", path=path)
+        assert restored.stats()['size'] == 5
+        assert restored.get("запрос 3")[0] == 3
+        # Порядок LRU сохранен: самая старая запись вытесняется первой
+        assert list(restored._entries)[-1] == "запрос 3" and list(restored._entries)[0] == "запрос 1"
+
+        other = EmbeddingCache(model="другая модель", path=path)
+        assert other.stats()['size'] == 0
+    print("✅ Кэш сохраняется между перезапусками")
+
+if __name__ == "__main__":
+    test_lru_and_byte_budget()
+    test_get_or_compute()
+    test_persistence()
+    print("\n🎉 Все тесты пройдены!")
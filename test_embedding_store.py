@@ -0,0 +1,196 @@
+"""
+Тест хранилища эмбеддингов: memmap float32, номера пунктов и манифест
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.insert(0, 'backend')
+
+import numpy as np
+from embedding_store import EmbeddingStore, IndexFormatError, kb_hash, normalize_rows
+from embedding_batcher import EmbeddingBatcher
+
+def make_index(path, rows=20, dim=8, model="test-model", kb="abc"):
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(rows, dim)).astype(np.float32)
+    ids = [row // 2 for row in range(rows)]
+    EmbeddingStore.save(path, embeddings, ids, model=model, kb=kb)
+    return embeddings, ids
+
+def test_roundtrip_memmap():
+    """Индекс сохраняется и открывается через memmap без pickle"""
+    print("🧪 Тестирование сохранения и загрузки индекса")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings, ids = make_index(tmp)
+        store = EmbeddingStore.load(tmp, model="test-model", kb="abc")
+
+        assert isinstance(store.embeddings, np.memmap)
+        assert store.embeddings.dtype == np.float32 and store.dim == 8
+        assert len(store) == 20 and store.ids.tolist() == ids
+        np.testing.assert_allclose(store.embeddings, normalize_rows(embeddings), rtol=1e-6)
+
+        with open(os.path.join(tmp, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        assert manifest["model"] == "test-model" and manifest["dim"] == 8 and manifest["kb_hash"] == "abc"
+        assert not [name for name in os.listdir(tmp) if name.endswith(".tmp")]
+    print("✅ Индекс открывается через memmap")
+
+def test_search_matches_brute_force():
+    """Поиск совпадает с полным перебором косинусной близости"""
+    print("🧪 Тестирование поиска по индексу")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings, _ = make_index(tmp)
+        store = EmbeddingStore.load(tmp)
+        query = embeddings[3:4] * 5 + 0.1
+
+        scores, indices = store.search(query, 5)
+        expected = normalize_rows(embeddings) @ normalize_rows(query)[0]
+        assert indices[0].tolist() == np.argsort(-expected)[:5].tolist()
+        np.testing.assert_allclose(scores[0], np.sort(expected)[::-1][:5], rtol=1e-5)
+        assert indices[0][0] == 3
+
+        scores, indices = store.search(query, 100)
+        assert indices.shape == (1, 20)
+    print("✅ Поиск совпадает с перебором")
+
+def test_search_items_max_pooling():
+    """Результаты по строкам объединяются в пункты базы: максимум по вариациям"""
+    print("🧪 Тестирование max-pooling по пунктам базы")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        embeddings, ids = make_index(tmp)
+        store = EmbeddingStore.load(tmp)
+        assert store.row_to_item_id.tolist() == ids and store.item_count == 10
+        query = embeddings[7:8]
+
+        results = store.search_items(query, 4)
+        row_scores = normalize_rows(embeddings) @ normalize_rows(query)[0]
+        expected = {}
+        for row, item_id in enumerate(ids):
+            expected[item_id] = max(expected.get(item_id, -1.0), float(row_scores[row]))
+        ranked = sorted(expected.items(), key=lambda pair: -pair[1])[:4]
+
+        assert [item_id for item_id, _ in results] == [item_id for item_id, _ in ranked]
+        assert results[0][0] == 3 and abs(results[0][1] - 1.0) < 1e-5
+        assert len({item_id for item_id, _ in results}) == len(results)
+        assert len(store.search_items(query, 100)) == 10
+    print("✅ Каждый пункт базы возвращается один раз с лучшей вариацией")
+
+def test_resave_keeps_manifest_consistent():
+    """Пересохранение: манифест ссылается на свои файлы, предыдущие файлы остаются до следующего"""
+    print("🧪 Тестирование пересохранения индекса")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_index(tmp, rows=20)
+        with open(os.path.join(tmp, "manifest.json"), encoding="utf-8") as f:
+            first = json.load(f)
+        first_store = EmbeddingStore.load(tmp)
+
+        # Читатель старого манифеста открывает старые файлы даже после пересохранения
+        make_index(tmp, rows=30)
+        old = EmbeddingStore(*[np.load(os.path.join(tmp, first["files"][name]), allow_pickle=False)
+                               for name in ("embeddings", "ids")], first)
+        assert len(old) == 20 and len(first_store) == 20
+        assert len(EmbeddingStore.load(tmp)) == 30
+
+        make_index(tmp, rows=40)
+        names = set(os.listdir(tmp))
+        assert first["files"]["embeddings"] not in names and len(names) == 5
+        assert len(EmbeddingStore.load(tmp)) == 40
+
+        # Индекс прежнего формата: файлы без версии в имени
+        with open(os.path.join(tmp, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        for name, legacy in (("embeddings", "embeddings.npy"), ("ids", "ids.npy")):
+            os.replace(os.path.join(tmp, manifest["files"][name]), os.path.join(tmp, legacy))
+        del manifest["files"]
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        assert len(EmbeddingStore.load(tmp)) == 40
+    print("✅ Манифест всегда описывает свою матрицу")
+
+def test_manifest_validation():
+    """Другая модель, измененная база или поврежденные файлы - IndexFormatError"""
+    print("🧪 Тестирование проверки манифеста")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_index(tmp)
+        for kwargs in ({"model": "other-model"}, {"kb": "changed"}):
+            try:
+                EmbeddingStore.load(tmp, **kwargs)
+                assert False, f"ожидалась ошибка для {kwargs}"
+            except IndexFormatError:
+                pass
+
+        # Матрица от другого индекса при старом манифесте
+        with open(os.path.join(tmp, "manifest.json"), encoding="utf-8") as f:
+            embeddings_file = json.load(f)["files"]["embeddings"]
+        np.save(os.path.join(tmp, embeddings_file), np.zeros((3, 8), dtype=np.float32))
+        try:
+            EmbeddingStore.load(tmp)
+            assert False, "ожидалась ошибка размеров"
+        except IndexFormatError:
+            pass
+
+    try:
+        EmbeddingStore.load(os.path.join(tempfile.gettempdir(), "missing_index"))
+        assert False, "ожидался FileNotFoundError"
+    except FileNotFoundError:
+        pass
+
+    kb = [{"id": 1, "question": "Что такое наценка?"}]
+    assert kb_hash(kb) == kb_hash(json.loads(json.dumps(kb, indent=2)))
+    assert kb_hash(kb) != kb_hash([{"id": 1, "question": "Что такое баланс?"}])
+    print("✅ Устаревший индекс не используется")
+
+def test_senior_ai_search_with_store():
+    """SeniorAISearchSystem ищет по индексу из хранилища"""
+    print("🧪 Тестирование SeniorAISearchSystem с новым индексом")
+    print("=" * 60)
+
+    import senior_ai_search_system as module
+
+    with open("senior_ai_knowledge_base.json", encoding="utf-8") as f:
+        kb = json.load(f)
+    rows = len(kb)
+    embeddings = np.eye(rows, dtype=np.float32)
+
+    class RowEncoder:
+        """Кодирует текст в вектор строки с тем же номером"""
+        def encode(self, texts):
+            return embeddings[[int(text) for text in texts]]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        EmbeddingStore.save(tmp, embeddings, list(range(rows)), model=module.EMBEDDINGS_MODEL_NAME, kb=kb_hash(kb))
+        system = module.SeniorAISearchSystem(index_path=tmp)
+        assert system.embeddings_index is not None and len(system.embeddings_index) == rows
+
+        system.embeddings_model = RowEncoder()
+        system.query_batcher = EmbeddingBatcher(system.embeddings_model.encode, max_wait_ms=1)
+        system.normalize_text_advanced = lambda text: text
+        results = system.search_by_embeddings_advanced("7", top_k=3)
+        assert results[0] == (7, 1.0)
+
+        # Индекс от другой базы знаний не загружается
+        EmbeddingStore.save(tmp, embeddings, list(range(rows)), model=module.EMBEDDINGS_MODEL_NAME, kb="old")
+        system = module.SeniorAISearchSystem(index_path=tmp)
+        assert system.embeddings_index is None
+    print("✅ SeniorAISearchSystem использует memmap индекс")
+
+if __name__ == "__main__":
+    test_roundtrip_memmap()
+    test_search_matches_brute_force()
+    test_search_items_max_pooling()
+    test_resave_keeps_manifest_consistent()
+    test_manifest_validation()
+    test_senior_ai_search_with_store()
+    print("\n🎉 Все тесты пройдены!")
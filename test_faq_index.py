@@ -0,0 +1,93 @@
+"""
+Тест инвертированного индекса FAQ для трехуровневого поиска
+"""
+
+import sys
+import os
+sys.path.insert(0, 'backend')
+
+from faq_index import FAQIndex, tokenize
+import json
+
+def load_kb_data():
+    """Загружает данные базы знаний"""
+    try:
+        with open('backend/kb.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"❌ Ошибка загрузки kb.json: {e}")
+        return None
+
+def test_index_structure():
+    """Проверяет posting-листы и предразбитые поля"""
+    print("🧪 Тестирование структуры FAQ индекса")
+    print("=" * 60)
+
+    kb_data = load_kb_data()
+    faq_items = kb_data["faq"]
+    index = FAQIndex(faq_items, lambda word: word[:5])
+
+    assert len(index) == len(faq_items)
+    assert len(index.answer_words) == len(faq_items)
+
+    for idx, item in enumerate(faq_items):
+        assert index.answer_words[idx] == tokenize(item["answer"])
+        assert index.answer_word_sets[idx] == frozenset(index.answer_words[idx])
+        for keyword in item.get("keywords", []):
+            for word in tokenize(keyword):
+                assert idx in index.postings[word], f"'{word}' не найдено в posting-листе FAQ {idx}"
+
+    print(f"✅ Терминов в индексе: {len(index.postings)}")
+
+def test_candidates():
+    """Проверяет отбор кандидатов по токенам, корням и префиксам корней"""
+    print("🧪 Тестирование отбора кандидатов")
+    print("=" * 60)
+
+    faq_items = [
+        {"answer": "Пополнить баланс можно через Kaspi", "keywords": ["баланс"], "question_variations": []},
+        {"answer": "Доставка выполняется курьером", "keywords": ["доставка"], "question_variations": ["Как заказать доставку?"]},
+    ]
+    index = FAQIndex(faq_items, lambda word: word[:5])
+
+    assert index.candidates(["баланс"]) == [0]
+    assert index.candidates(["доставку"]) == [1]
+    assert index.candidates(["доставщик"]) == [1]  # общий корень "доста"
+    assert index.candidates(["kaspi", "курьер"]) == [0, 1]
+    assert index.candidates(["ыыыы"]) == []
+    assert index.root_of("доставку") == "доста"
+
+    print("✅ Кандидаты отбираются корректно")
+
+def test_search_with_index():
+    """Сравнивает поиск по индексу с полным проходом по всем FAQ"""
+    print("🧪 Сравнение поиска по индексу с полным проходом")
+    print("=" * 60)
+
+    from main import search_with_three_filters, search_question_variations, search_keywords, \
+        search_answer_content, extract_word_root
+
+    faq_items = load_kb_data()["faq"]
+    index = FAQIndex(faq_items, extract_word_root)
+
+    queries = ["что такое доставка", "как пополнить баланс", "тариф комфорт", "моточасы", "приложение вылетает"]
+    for query in queries:
+        query_words = tokenize(query)
+        expected = []
+        for item in faq_items:
+            total = (search_question_variations(query, [v.lower() for v in item.get("question_variations", [])]) * 0.5 +
+                     search_keywords(query_words, item.get("keywords", [])) * 0.3 +
+                     search_answer_content(query_words, item.get("answer", "")) * 0.2)
+            if total >= 0.3:
+                expected.append((faq_items.index(item), round(total, 9)))
+
+        results = search_with_three_filters(query, faq_items, index)
+        actual = [(faq_items.index(item), round(score, 9)) for item, score, _ in results]
+
+        print(f"  '{query}' -> {actual[:3]}")
+        assert sorted(actual) == sorted(expected)
+
+if __name__ == "__main__":
+    test_index_structure()
+    test_candidates()
+    test_search_with_index()
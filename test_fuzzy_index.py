@@ -0,0 +1,107 @@
+"""
+Тест триграммного fuzzy индекса
+"""
+
+import sys
+import json
+import time
+import random
+sys.path.insert(0, 'backend')
+
+from fuzzy_index import FuzzyIndex, full_process, ratio, trigrams
+
+def full_scan(index, query, top_k):
+    """Эталон: ratio со всеми строками, как process.extract"""
+    processed = full_process(query)
+    best = {}
+    for row, text in enumerate(index.texts):
+        score = ratio(processed, text)
+        item_id = index.item_ids[row]
+        if score > best.get(item_id, -1):
+            best[item_id] = score
+    ranked = sorted(best.items(), key=lambda pair: -pair[1])[:top_k]
+    return [(item_id, score / 100.0) for item_id, score in ranked]
+
+def test_processing_and_ratio():
+    """Предобработка и ratio как в fuzzywuzzy"""
+    print("🧪 Тестирование full_process и ratio")
+    print("=" * 60)
+
+    assert full_process("  Как ОТМЕНИТЬ заказ?! ") == "как отменить заказ"
+    assert ratio("тариф комфорт", "тариф комфорт") == 100
+    assert ratio("", "тариф") == 0
+    assert 0 < ratio("тариф комфорт", "тарифы комфорта") < 100
+    assert " ка" in trigrams("как") and trigrams("") == set()
+    print("✅ Оценка совпадает с fuzz.ratio")
+
+def test_shortlist_matches_full_scan():
+    """На реальной базе шортлист дает тот же лучший пункт, что и полный перебор"""
+    print("🧪 Тестирование шортлиста на базе знаний")
+    print("=" * 60)
+
+    with open('senior_ai_knowledge_base.json', 'r', encoding='utf-8') as f:
+        knowledge_base = json.load(f)
+    # Шортлист включен принудительно: базе такого размера положен полный перебор
+    index = FuzzyIndex.from_knowledge_base(knowledge_base, exhaustive_limit=0)
+
+    queries = [item['question'] for item in knowledge_base[:30]]
+    # Опечатки: пропущенная и переставленная буквы
+    queries += [q[:3] + q[4:] for q in queries[:15]]
+    queries += [q[:2] + q[3] + q[2] + q[4:] for q in queries[:15] if len(q) > 4]
+
+    start = time.perf_counter()
+    fast = [index.search(q, 5) for q in queries]
+    fast_time = time.perf_counter() - start
+    start = time.perf_counter()
+    slow = [full_scan(index, q, 5) for q in queries]
+    slow_time = time.perf_counter() - start
+
+    agree = sum(1 for a, b in zip(fast, slow) if a and b and a[0] == b[0])
+    print(f"📊 Строк: {len(index)}, совпадение top-1: {agree}/{len(queries)}")
+    print(f"⏱️ Индекс: {fast_time * 1000:.1f}мс, полный перебор: {slow_time * 1000:.1f}мс")
+    assert agree == len(queries)
+    print("✅ Индекс находит те же пункты быстрее")
+
+def noisy_queries(texts, count, seed=0):
+    """Запросы с перестановкой и пропуском слов и удаленными буквами"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(texts).split()
+        rng.shuffle(words)
+        query = ' '.join(words[:max(1, len(words) - rng.randint(0, 2))])
+        for _ in range(rng.randint(0, 3)):
+            position = rng.randrange(len(query))
+            query = query[:position] + query[position + 1:]
+        queries.append(query or words[0])
+    return queries
+
+def test_recall_against_full_scan():
+    """Небольшая база оценивается целиком; приближенный шортлист не теряет лучший пункт"""
+    print("🧪 Тестирование полноты относительно полного перебора")
+    print("=" * 60)
+
+    with open('senior_ai_knowledge_base.json', 'r', encoding='utf-8') as f:
+        knowledge_base = json.load(f)
+    exact = FuzzyIndex.from_knowledge_base(knowledge_base)
+    approximate = FuzzyIndex.from_knowledge_base(knowledge_base, exhaustive_limit=0)
+    assert exact.exhaustive and not approximate.exhaustive
+
+    queries = noisy_queries(exact.texts, 200)
+    for query in queries:
+        assert exact.search(query, 5) == full_scan(exact, query, 5), query
+
+    found = 0
+    for query in queries:
+        best = full_scan(approximate, query, 1)
+        found += not best or best[0][0] in [item_id for item_id, _ in approximate.search(query, 5)]
+    recall = found / len(queries)
+    print(f"📊 Полный перебор: {len(queries)}/{len(queries)}, шортлист: лучший пункт в top-5 у {recall:.1%}")
+    assert recall >= 0.95
+    print("✅ Результат совпадает с полным перебором")
+
+if __name__ == "__main__":
+    test_processing_and_ratio()
+    test_shortlist_matches_full_scan()
+    test_recall_against_full_scan()
+    print("\n🎉 Все тесты пройдены!")
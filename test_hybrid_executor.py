@@ -0,0 +1,92 @@
+"""
+Тест параллельного выполнения веток гибридного поиска
+"""
+
+import sys
+import time
+sys.path.insert(0, 'backend')
+
+from hybrid_executor import HybridSearchExecutor
+
+def slow(result, delay):
+    def branch():
+        time.sleep(delay)
+        return result
+    return branch
+
+def test_branches_run_concurrently():
+    """Задержка - максимум веток, а не сумма"""
+    print("🧪 Тестирование параллельных веток")
+    print("=" * 60)
+
+    executor = HybridSearchExecutor(deadlines={'embeddings': 2, 'keywords': 2, 'fuzzy': 2})
+    start = time.perf_counter()
+    results = executor.run({
+        'embeddings': slow([(0, 0.9)], 0.2),
+        'keywords': slow([(1, 4.0)], 0.2),
+        'fuzzy': slow([(2, 0.8)], 0.2)
+    })
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ Три ветки по 200мс: {elapsed * 1000:.0f}мс")
+    assert results == {'embeddings': [(0, 0.9)], 'keywords': [(1, 4.0)], 'fuzzy': [(2, 0.8)]}
+    assert elapsed < 0.5
+    executor.shutdown()
+    print("✅ Ветки выполняются параллельно")
+
+def test_deadline_merges_arrived_results():
+    """Опоздавшая ветка дает пустой результат, остальные объединяются"""
+    print("🧪 Тестирование дедлайнов веток")
+    print("=" * 60)
+
+    executor = HybridSearchExecutor(deadlines={'embeddings': 0.1, 'keywords': 1, 'fuzzy': 1})
+
+    def broken():
+        raise RuntimeError("ошибка ветки")
+
+    start = time.perf_counter()
+    results = executor.run({
+        'embeddings': slow([(0, 0.9)], 0.5),
+        'keywords': slow([(1, 4.0)], 0.01),
+        'fuzzy': broken
+    })
+    elapsed = time.perf_counter() - start
+    assert results == {'embeddings': [], 'keywords': [(1, 4.0)], 'fuzzy': []}
+    assert elapsed < 0.4
+    assert executor.stats()['embeddings']['late_running'] == 1
+
+    time.sleep(0.5)  # опоздавшая ветка дописывает свой замер
+    stats = executor.stats()
+    print(f"📊 {stats}")
+    assert stats['embeddings']['timeouts'] == 1 and stats['embeddings']['calls'] == 1
+    assert stats['embeddings']['late_running'] == 0
+    assert stats['embeddings']['max_ms'] >= 400
+    assert stats['fuzzy']['errors'] == 1
+    assert stats['keywords']['p99_ms'] < 100
+    executor.shutdown()
+    print("✅ Поиск не ждет опоздавшую ветку, время веток записано")
+
+def test_late_branches_do_not_starve_next_search():
+    """Опоздавшие ветки дорабатывают, но не занимают потоки следующего поиска"""
+    print("🧪 Тестирование пула при опоздавших ветках")
+    print("=" * 60)
+
+    executor = HybridSearchExecutor(concurrency=2, deadlines={'embeddings': 0.05, 'keywords': 0.05, 'fuzzy': 0.05})
+    assert executor.max_workers == 6
+
+    late = {'embeddings': slow([], 0.5), 'keywords': slow([], 0.5), 'fuzzy': slow([], 0.5)}
+    assert executor.run(late) == {'embeddings': [], 'keywords': [], 'fuzzy': []}
+
+    results = executor.run({
+        'embeddings': slow([(0, 0.9)], 0.01),
+        'keywords': slow([(1, 4.0)], 0.01),
+        'fuzzy': slow([(2, 0.8)], 0.01)
+    })
+    assert results == {'embeddings': [(0, 0.9)], 'keywords': [(1, 4.0)], 'fuzzy': [(2, 0.8)]}
+    executor.shutdown()
+    print(f"✅ Потоков в пуле: {executor.max_workers}, второй поиск не ждал опоздавших")
+
+if __name__ == "__main__":
+    test_branches_run_concurrently()
+    test_deadline_merges_arrived_results()
+    test_late_branches_do_not_starve_next_search()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,136 @@
+"""
+Тест инкрементального индекса эмбеддингов
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+sys.path.insert(0, 'backend')
+
+import numpy as np
+from incremental_index import IncrementalEmbeddingIndex
+from embedding_batcher import EmbeddingBatcher
+
+def unit(*values):
+    return np.array(values, dtype=np.float32)
+
+def test_add_delete_update():
+    """Добавление, tombstone удаление и замена строк пункта"""
+    print("🧪 Тестирование add/delete/update")
+    print("=" * 60)
+
+    index = IncrementalEmbeddingIndex.from_vectors(
+        np.stack([unit(1, 0, 0), unit(0.9, 0.1, 0), unit(0, 1, 0)]), [0, 0, 1],
+        compaction_ratio=1.0
+    )
+    assert index.search_items(unit(1, 0, 0), 2)[0][0] == 0
+
+    # Новая вариация пункта 2 дописывается без перестройки
+    index.add(2, unit(0, 0, 1))
+    assert index.search_items(unit(0, 0, 1), 1)[0][0] == 2
+    assert len(index) == 4
+
+    # Удаленный пункт сразу исключается из поиска
+    assert index.delete_item(0) == 2
+    assert 0 not in [item for item, _ in index.search_items(unit(1, 0, 0), 3)]
+    assert index.stats()['tombstones'] == 2
+
+    # Замена строк пункта: старые строки не находятся
+    index.update_item(1, unit(1, 0, 0))
+    assert index.search_items(unit(1, 0, 0), 1)[0][0] == 1
+    assert index.item_rows(1) == 1
+
+    # Рост емкости
+    for i in range(100):
+        index.add(3, unit(0, 1, 1))
+    assert index.stats()['capacity'] >= index.stats()['rows']
+    print(f"📊 {index.stats()}")
+    print("✅ Изменения видны в поиске сразу")
+
+def test_background_compaction():
+    """Доля удаленных строк выше порога - сжатие в фоне, результаты не меняются"""
+    print("🧪 Тестирование фонового сжатия")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(40, 8)).astype(np.float32)
+    index = IncrementalEmbeddingIndex.from_vectors(vectors, list(range(40)), compaction_ratio=0.25)
+    query = rng.normal(size=8)
+
+    for item_id in range(10):
+        index.delete_item(item_id)
+    before = index.search_items(query, 5)
+    index.wait_compaction(5)
+
+    stats = index.stats()
+    print(f"📊 {stats}")
+    assert stats['compactions'] == 1 and stats['tombstones'] == 0 and stats['rows'] == 30
+    assert index.search_items(query, 5) == before
+    print("✅ Удаленные строки вычищены, поиск не изменился")
+
+def test_expand_knowledge_embeds_only_new_text():
+    """expand_knowledge_base кодирует только новый текст, delete скрывает запись"""
+    print("🧪 Тестирование expand/update/delete ассистента")
+    print("=" * 60)
+
+    from professional_faq_assistant import ProfessionalFAQAssistant
+
+    class CountingEncoder:
+        """Детерминированные векторы по тексту, учет закодированных текстов"""
+        def __init__(self):
+            self.encoded = []
+
+        def encode(self, texts):
+            self.encoded.extend(texts)
+            return np.stack([np.random.default_rng(sum(map(ord, t))).normal(size=16) for t in texts])
+
+    knowledge_base = [
+        {'id': 1, 'question': 'Как пополнить баланс?', 'answer': 'Через карту', 'variations': ['пополнение счета'], 'keywords': ['баланс']},
+        {'id': 2, 'question': 'Что такое тариф Комфорт?', 'answer': 'Тариф с комфортными машинами', 'variations': [], 'keywords': ['тариф']}
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'kb.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(knowledge_base, f, ensure_ascii=False)
+        assistant = ProfessionalFAQAssistant(knowledge_base_path=path)
+
+    encoder = CountingEncoder()
+    assistant.embeddings_model = encoder
+    assistant.query_batcher = EmbeddingBatcher(CountingEncoder().encode)
+    assistant._build_search_indexes()
+    assert assistant.embeddings_index.stats()['rows'] == 3
+    encoder.encoded.clear()
+
+    assistant.expand_knowledge_base('Как оформить доставку?', 'Через приложение', 'delivery')
+    assert encoder.encoded == ['Как оформить доставку?']
+    assert assistant.embeddings_index.item_rows(2) == 1
+
+    assert assistant.update_knowledge_item(1, variations=['комфорт класс'])
+    assert encoder.encoded[-2:] == ['Что такое тариф Комфорт?', 'комфорт класс']
+
+    # Изменение, сделанное пока update ждет блокировку, не теряется
+    with assistant._index_lock:
+        updater = threading.Thread(target=assistant.update_knowledge_item, args=(2,), kwargs={'answer': 'Через сайт'})
+        updater.start()
+        time.sleep(0.05)
+        assistant.knowledge_base[2] = {**assistant.knowledge_base[2], 'category': 'orders'}
+    updater.join()
+    assert assistant.knowledge_base[2]['answer'] == 'Через сайт'
+    assert assistant.knowledge_base[2]['category'] == 'orders'
+
+    assert assistant.delete_knowledge_item(0)
+    assert not assistant.delete_knowledge_item(0)
+    results = assistant.hybrid_search('Как пополнить баланс?')
+    assert all(result['index'] != 0 for result in results)
+    assert assistant.get_statistics()['deleted_records'] == 1
+    print(f"📊 {assistant.embeddings_index.stats()}")
+    print("✅ Перекодируются только измененные тексты")
+
+if __name__ == "__main__":
+    test_add_delete_update()
+    test_background_compaction()
+    test_expand_knowledge_embeds_only_new_text()
+    print("\n🎉 Все тесты пройдены!")
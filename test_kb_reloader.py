@@ -0,0 +1,105 @@
+"""
+Тест горячей перезагрузки базы знаний
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+sys.path.insert(0, 'backend')
+
+from kb_reloader import KBReloader
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    # Сдвигаем mtime, чтобы изменение было видно даже при грубом разрешении ФС
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+def test_reload_on_change():
+    """Изменение файла - новый снимок; начатый запрос остается на старом"""
+    print("🧪 Тестирование перезагрузки при изменении файла")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'kb.json')
+        write_json(path, [{'question': 'Как пополнить баланс?'}])
+
+        def build():
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            return {'items': data, 'questions': [item['question'].lower() for item in data]}
+
+        reloader = KBReloader([path], build, interval=0)
+        in_flight = reloader.snapshot
+        assert in_flight.version == 1 and reloader.current() == 1
+        assert not reloader.check()
+
+        write_json(path, [{'question': 'Как пополнить баланс?'}, {'question': 'Что такое тариф?'}])
+        assert reloader.check()
+        assert reloader.current() == 2
+        assert reloader.snapshot.value['questions'][1] == 'что такое тариф?'
+        assert reloader.fingerprint != in_flight.fingerprint
+
+        # Запрос, взявший снимок до перезагрузки, видит согласованные старые данные
+        assert len(in_flight.value['items']) == 1 and len(in_flight.value['questions']) == 1
+        print(f"📊 {reloader.stats()}")
+        print("✅ Новый снимок опубликован, старый не изменился")
+
+def test_broken_file_keeps_snapshot():
+    """Недописанный файл не ломает базу; перезагрузка повторяется"""
+    print("🧪 Тестирование ошибки чтения")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'kb.json')
+        write_json(path, [1, 2])
+
+        def build():
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+
+        reloader = KBReloader([path], build, interval=0)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[1, 2, ')
+        assert not reloader.check()
+        assert reloader.snapshot.value == [1, 2] and reloader.current() == 1
+        assert reloader.stats()['failures'] == 1 and reloader.last_error
+
+        # Файл дописан без изменения mtime - следующий опрос все равно перечитывает
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[1, 2, 3]')
+        assert reloader.check()
+        assert reloader.snapshot.value == [1, 2, 3] and reloader.current() == 2
+        assert reloader.last_error is None
+        print("✅ Старый снимок сохранен до успешной перезагрузки")
+
+def test_background_polling():
+    """Фоновый поток подхватывает изменение без вызова reload"""
+    print("🧪 Тестирование фонового опроса")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'kb.json')
+        write_json(path, {'v': 1})
+
+        def build():
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+
+        reloader = KBReloader([path], build, interval=0.05).start()
+        write_json(path, {'v': 2})
+        deadline = time.time() + 5
+        while reloader.current() == 1 and time.time() < deadline:
+            time.sleep(0.05)
+        reloader.stop()
+        assert reloader.snapshot.value == {'v': 2}
+        print("✅ Изменение подхвачено фоновым опросом")
+
+if __name__ == "__main__":
+    test_reload_on_change()
+    test_broken_file_keeps_snapshot()
+    test_background_polling()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,73 @@
+"""
+Тест автомата Ахо-Корасик для ключевых слов интентов
+"""
+
+import sys
+import random
+sys.path.insert(0, 'backend')
+
+from keyword_automaton import KeywordAutomaton
+
+def test_counts_match_substring_checks():
+    """Счет по группам совпадает с sum(keyword in text) на случайных текстах"""
+    print("🧪 Тестирование совпадения со сканированием подстрок")
+    print("=" * 60)
+
+    rng = random.Random(0)
+    for _ in range(2000):
+        groups = {
+            name: [''.join(rng.choice('абв') for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 6))]
+            for name in ('faq', 'cards', 'receipt')
+        }
+        automaton = KeywordAutomaton(groups)
+        text = ''.join(rng.choice('абвг ') for _ in range(rng.randint(0, 25)))
+        expected = {name: sum(1 for keyword in keywords if keyword in text) for name, keywords in groups.items()}
+        assert automaton.counts(text) == expected, (groups, text)
+    print(f"📊 {automaton.stats()}")
+    print("✅ Счет совпадает с отдельными проверками")
+
+def test_overlaps_duplicates_and_order():
+    """Вложенные слова, повторы в списке и порядок групп"""
+    print("🧪 Тестирование вложенных и повторных слов")
+    print("=" * 60)
+
+    automaton = KeywordAutomaton({
+        'faq': ['время', 'заказ', 'заказы', 'лента заказов', 'время'],
+        'driver': ['водитель', 'заказ'],
+        'empty': []
+    })
+    text = 'лента заказов не обновляется, сколько время ждать'
+    assert automaton.find(text) == {'заказ', 'лента заказов', 'время'}
+    # 'время' дважды в списке - дважды в счете, как в classify_intent
+    assert automaton.counts(text) == {'faq': 4, 'driver': 1, 'empty': 0}
+    assert automaton.matched_groups(text) == ['faq', 'driver']
+    assert automaton.matched_groups('привет') == []
+    print("✅ Семантика `keyword in text` сохранена")
+
+def test_classify_intent_scoring():
+    """classify_intent на автомате дает прежние интенты"""
+    print("🧪 Тестирование classify_intent")
+    print("=" * 60)
+
+    from main import classify_intent
+
+    cases = {
+        'Хочу сделать предварительный заказ': ('faq', 0.9),
+        'где водитель': ('faq', 1 / 3),
+        'привязать карту': ('cards', 1 / 3),
+        'как пополнить баланс картой': ('faq', 1.0),
+        'отправить чек на почту': ('receipt', 2 / 3),
+        'списали дважды за поездку': ('complaint', 1 / 3),
+        'привет': ('faq', 0.5)
+    }
+    for text, expected in cases.items():
+        intent, confidence = classify_intent(text)
+        print(f"   {text} -> {intent} ({confidence:.2f})")
+        assert (intent, round(confidence, 3)) == (expected[0], round(expected[1], 3))
+    print("✅ Интенты не изменились")
+
+if __name__ == "__main__":
+    test_counts_match_substring_checks()
+    test_overlaps_duplicates_and_order()
+    test_classify_intent_scoring()
+    print("\n🎉 Все тесты пройдены!")
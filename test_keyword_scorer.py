@@ -0,0 +1,83 @@
+"""
+Тест векторизованного скоринга ключевых слов (KeywordMatrixScorer)
+"""
+
+import sys
+import os
+sys.path.insert(0, 'backend')
+
+import json
+import time
+from faq_index import FAQIndex, tokenize
+from keyword_scorer import KeywordMatrixScorer
+
+def load_kb_data():
+    """Загружает данные базы знаний"""
+    try:
+        with open('backend/kb.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"❌ Ошибка загрузки kb.json: {e}")
+        return None
+
+QUERIES = [
+    "что такое доставка", "как пополнить баланс через каспи", "тариф комфорт дороже",
+    "моточасы", "приложение вылетает", "доставкаа курьером", "как стать водителем",
+    "расценка поездки", "заказ заказ заказ", "google play", "ыыыыы",
+]
+
+def build_scorer(faq_items):
+    from main import PRIORITY_KEYWORDS, calculate_word_similarity, extract_word_root
+    index = FAQIndex(faq_items, extract_word_root)
+    scorer = KeywordMatrixScorer(index.keywords, index.keyword_roots, PRIORITY_KEYWORDS,
+                                 calculate_word_similarity, extract_word_root)
+    return index, scorer
+
+def test_matches_search_keywords():
+    """Баллы совпадают с поэлементным search_keywords"""
+    print("🧪 Сравнение матричного скоринга с search_keywords")
+    print("=" * 60)
+
+    from main import search_keywords
+
+    faq_items = load_kb_data()["faq"]
+    index, scorer = build_scorer(faq_items)
+
+    for query in QUERIES:
+        query_words = tokenize(query)
+        scores = scorer.score_all(query_words)
+        for idx, item in enumerate(faq_items):
+            expected = search_keywords(query_words, item.get("keywords", []))
+            assert abs(scores[idx] - expected) < 1e-12, (query, idx, scores[idx], expected)
+
+    print(f"✅ Совпадает, кэш строк: {scorer.cache_info()}")
+
+def test_scaled_kb_speed():
+    """Скорость на базе знаний, увеличенной в 10 раз"""
+    print("🧪 Скорость на базе знаний x10")
+    print("=" * 60)
+
+    from main import search_keywords
+
+    faq_items = load_kb_data()["faq"] * 10
+    index, scorer = build_scorer(faq_items)
+    queries = [tokenize(query) for query in QUERIES]
+
+    start = time.perf_counter()
+    for query_words in queries:
+        for item in faq_items:
+            search_keywords(query_words, item.get("keywords", []))
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for query_words in queries:
+        scorer.score_all(query_words)
+    matrix_time = time.perf_counter() - start
+
+    print(f"  Поэлементно: {loop_time * 1000:.1f} мс, матрица: {matrix_time * 1000:.1f} мс "
+          f"(x{loop_time / max(matrix_time, 1e-9):.1f})")
+    assert matrix_time < loop_time
+
+if __name__ == "__main__":
+    test_matches_search_keywords()
+    test_scaled_kb_speed()
@@ -0,0 +1,60 @@
+"""
+Тест индекса нормализованных полей для поиска по ключевым словам
+"""
+
+import sys
+import json
+import time
+sys.path.insert(0, 'backend')
+
+from keyword_term_index import KeywordTermIndex
+
+def reference_search(knowledge_base, normalize, query, top_k):
+    """Прежний подсчет: нормализация всех полей базы на каждый запрос"""
+    query_words = set(normalize(query).split())
+    results = []
+    for idx, item in enumerate(knowledge_base):
+        score = 0
+        for keyword in item.get('keywords', []):
+            if normalize(keyword) in query_words:
+                score += 2
+        score += len(query_words & set(normalize(item['question']).split())) * 1.5
+        for variation in item.get('variations', []):
+            score += len(query_words & set(normalize(variation).split())) * 1.0
+        score += len(query_words & set(normalize(item['answer']).split())) * 0.5
+        if score > 0:
+            results.append((idx, score))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results[:top_k]
+
+def test_matches_reference_scoring():
+    """Оценки и порядок совпадают с прежним подсчетом"""
+    print("🧪 Тестирование индекса ключевых слов")
+    print("=" * 60)
+
+    from senior_ai_search_system import SeniorAISearchSystem
+    system = SeniorAISearchSystem(lazy_embeddings=True)
+    knowledge_base = system.knowledge_base
+    normalize = system.normalize_text_advanced
+
+    index = KeywordTermIndex(knowledge_base, normalize)
+    queries = [item['question'] for item in knowledge_base[:40]]
+    queries += ["почему так дорого", "как пополнить баланс картой", "водитель не приехал", "тариф комфорт"]
+
+    start = time.perf_counter()
+    fast = [index.search(q, 5) for q in queries]
+    fast_time = time.perf_counter() - start
+    start = time.perf_counter()
+    slow = [reference_search(knowledge_base, normalize, q, 5) for q in queries]
+    slow_time = time.perf_counter() - start
+
+    for query, a, b in zip(queries, fast, slow):
+        assert a == b, f"{query}: {a} != {b}"
+    assert system.search_by_keywords_advanced(queries[0]) == slow[0]
+    print(f"📊 {index.stats()}")
+    print(f"⏱️ Индекс: {fast_time * 1000:.1f}мс, прежний подсчет: {slow_time * 1000:.1f}мс")
+    print("✅ Результаты совпадают")
+
+if __name__ == "__main__":
+    test_matches_reference_scoring()
+    print("\n🎉 Все тесты пройдены!")
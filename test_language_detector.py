@@ -0,0 +1,92 @@
+"""
+Тест определения языка по алфавиту и n-граммам
+"""
+
+import sys
+import time
+sys.path.insert(0, 'backend')
+
+from language_detector import (LanguageDetector, LangdetectDetector, NGramLanguageModel,
+                               create_language_detector, LANGDETECT_AVAILABLE)
+
+def test_script_pass_and_fallback():
+    """Кириллица и казахские буквы - без n-грамм; латиница и смесь - через n-граммы"""
+    print("🧪 Тестирование определения языка")
+    print("=" * 60)
+
+    calls = []
+
+    def fallback(text):
+        calls.append(text)
+        return NGramLanguageModel()(text)
+
+    detector = LanguageDetector(fallback=fallback)
+    cases = {
+        'Как пополнить баланс?': 'ru',
+        'Что такое тариф Комфорт?': 'ru',
+        'Сәлеметсіз бе, баланс қалай толтырамын?': 'kk',
+        'How do I top up my balance?': 'en',
+        'where is my driver': 'en',
+        'оплата через kaspi qr': 'ru',
+        '123 ???': 'unknown',
+        '': 'unknown'
+    }
+    for text, expected in cases.items():
+        language = detector.detect(text)
+        print(f"   {text!r} -> {language}")
+        assert language == expected, (text, language)
+
+    # Кириллица и казахские буквы решаются проходом по символам
+    assert not any(text in calls for text in ('Как пополнить баланс?', 'Сәлеметсіз бе, баланс қалай толтырамын?'))
+    assert 'оплата через kaspi qr' in calls and 'where is my driver' in calls
+
+    # Транслит не выдается за английский
+    assert detector.detect('kak popolnit balans') != 'en'
+    print("✅ Языки определены, n-граммы только для неоднозначных текстов")
+
+def test_memoized_and_deterministic():
+    """Повторный текст берется из кэша, результат не меняется"""
+    print("🧪 Тестирование мемоизации")
+    print("=" * 60)
+
+    detector = LanguageDetector()
+    results = {detector.detect('Привет! how are you') for _ in range(100)}
+    assert len(results) == 1
+    stats = detector.stats()
+    print(f"📊 {stats}")
+    assert stats['misses'] == 1 and stats['hits'] == 99
+    print("✅ Один расчет на текст")
+
+def test_compare_with_langdetect():
+    """Флаг LANGUAGE_DETECTOR=langdetect дает прежний детектор; сравнение скорости"""
+    print("🧪 Сравнение с langdetect")
+    print("=" * 60)
+
+    assert isinstance(create_language_detector('script'), LanguageDetector)
+    if not LANGDETECT_AVAILABLE:
+        print("⚠️ langdetect не установлен, сравнение пропущено")
+        return
+    legacy = create_language_detector('langdetect')
+    assert isinstance(legacy, LangdetectDetector)
+
+    queries = ['Как пополнить баланс через каспи?', 'Где мой водитель', 'Что такое наценка и почему так дорого',
+               'How do I top up my balance?', 'where is my driver', 'Сәлеметсіз бе, баланс қалай толтырамын?']
+    detector = LanguageDetector()
+    for name, fn in (('langdetect', legacy.detect), ('script', detector.detect)):
+        start = time.perf_counter()
+        for _ in range(20):
+            languages = [fn(query) for query in queries]
+        elapsed = (time.perf_counter() - start) / (20 * len(queries)) * 1e6
+        print(f"   {name:10s} {elapsed:8.1f} мкс/запрос {languages}")
+
+    # Ответ сервиса (ru/kk -> ru, en -> en) совпадает на типичных запросах
+    def locale(language):
+        return 'en' if language == 'en' else 'ru'
+    assert [locale(detector.detect(q)) for q in queries] == ['ru', 'ru', 'ru', 'en', 'en', 'ru']
+    print("✅ Прежний детектор доступен по флагу")
+
+if __name__ == "__main__":
+    test_script_pass_and_fallback()
+    test_memoized_and_deterministic()
+    test_compare_with_langdetect()
+    print("\n🎉 Все тесты пройдены!")
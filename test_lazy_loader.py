@@ -0,0 +1,74 @@
+"""
+Тест фоновой загрузки тяжелых компонентов
+"""
+
+import sys
+import threading
+sys.path.insert(0, 'backend')
+
+from lazy_loader import BackgroundLoader, READY, FAILED, LOADING
+
+def test_background_loader_states():
+    """Состояния загрузчика: pending -> loading -> ready/failed"""
+    print("🧪 Тестирование состояний BackgroundLoader")
+    print("=" * 60)
+
+    release = threading.Event()
+    activated = []
+
+    def factory():
+        release.wait(5)
+        return "модель"
+
+    loader = BackgroundLoader("test", factory, on_ready=activated.append)
+    assert loader.status()['state'] == 'pending'
+    loader.start()
+    loader.start()  # повторный запуск ничего не делает
+    assert loader.state == LOADING and not loader.wait(0.05)
+
+    release.set()
+    assert loader.wait(5)
+    assert loader.state == READY and loader.value == "модель" and activated == ["модель"]
+    print(f"📊 {loader.status()}")
+
+    def broken():
+        raise RuntimeError("нет модели")
+
+    failed = BackgroundLoader("broken", broken).start(background=False)
+    assert failed.state == FAILED and failed.status()['error'] == "нет модели"
+    print("✅ Состояния и ошибки загрузки отслеживаются")
+
+def test_lexical_search_while_embeddings_load():
+    """Пока эмбеддинги грузятся, поиск работает по ключевым словам"""
+    print("🧪 Тестирование поиска до загрузки эмбеддингов")
+    print("=" * 60)
+
+    from senior_ai_search_system import SeniorAISearchSystem
+
+    release = threading.Event()
+
+    class SlowEmbeddings(SeniorAISearchSystem):
+        def _load_embedding_components(self):
+            release.wait(5)
+            return super()._load_embedding_components()
+
+    system = SlowEmbeddings(lazy_embeddings=True)
+    readiness = system.get_readiness()
+    print(f"📊 {readiness}")
+    assert readiness['lexical'] and not readiness['embeddings']
+    assert readiness['embeddings_loader']['state'] == LOADING
+
+    item = system.knowledge_base[0]
+    results = system.hybrid_search_advanced(item['question'])
+    assert results, "лексический поиск должен отвечать до загрузки эмбеддингов"
+    print(f"🔍 Найдено до загрузки эмбеддингов: {len(results)}")
+
+    release.set()
+    system.embeddings_loader.wait(30)
+    assert system.embeddings_loader.state in (READY, FAILED)
+    print("✅ Лексический поиск не ждет загрузки модели")
+
+if __name__ == "__main__":
+    test_background_loader_states()
+    test_lexical_search_while_embeddings_load()
+    print("\n🎉 Все тесты пройдены!")
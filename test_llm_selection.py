@@ -0,0 +1,100 @@
+"""
+Тест выбора ответа LLM из короткого списка кандидатов
+"""
+
+import json
+import asyncio
+
+import httpx
+from llm_selection import KBCandidateSelector
+from ollama_async_client import AsyncOllamaClient
+
+def load_kb():
+    with open("BZ.txt", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_shortlist_recall():
+    """Нужный пункт базы попадает в shortlist для вариаций вопросов"""
+    print("🧪 Тестирование shortlist")
+    print("=" * 60)
+
+    kb = load_kb()
+    selector = KBCandidateSelector(kb, top_k=5)
+    total = found = first = 0
+    for idx, item in enumerate(kb):
+        for variation in item["question_variations"]:
+            candidates = selector.shortlist(variation)
+            assert len(candidates) <= 5
+            total += 1
+            found += idx in candidates
+            first += bool(candidates) and candidates[0] == idx
+
+    print(f"📊 В shortlist: {found}/{total}, на первом месте: {first}/{total}")
+    assert found == total
+    assert first / total >= 0.9
+    assert selector.shortlist("привет") == []
+    print("✅ Shortlist находит нужные пункты")
+
+def test_prompt_prefix_and_resolve():
+    """Префикс промпта не зависит от вопроса, номер кандидата -> пункт базы"""
+    print("🧪 Тестирование промпта")
+    print("=" * 60)
+
+    kb = load_kb()
+    selector = KBCandidateSelector(kb, top_k=3)
+    first = selector.build_prompt("Что такое наценка?", selector.shortlist("Что такое наценка?"))
+    second = selector.build_prompt("Как пополнить баланс?", selector.shortlist("Как пополнить баланс?"))
+    assert first.startswith(selector.prefix) and second.startswith(selector.prefix)
+
+    # В промпт попадают только кандидаты
+    candidates = selector.shortlist("Как пополнить баланс?")
+    assert second.count("ВОПРОСЫ:") == len(candidates) == 3
+
+    full_kb_size = sum(len(entry) for entry in selector.entries)
+    print(f"📏 Промпт: {len(second)} символов (описания всей базы: {full_kb_size})")
+    assert len(second) < full_kb_size
+
+    assert selector.resolve("2", candidates) == candidates[1]
+    assert selector.resolve("Ответ: 1.", candidates) == candidates[0]
+    assert selector.resolve("7", candidates) is None
+    assert selector.resolve("не знаю", candidates) is None
+
+    # Кандидаты с конца отбрасываются, если промпт не укладывается в контекст
+    budget = len(selector.build_prompt("Как пополнить баланс?", candidates[:2]))
+    tight = KBCandidateSelector(kb, top_k=3, max_prompt_chars=budget)
+    assert tight.shortlist("Как пополнить баланс?") == candidates[:2]
+    print("✅ Промпт и разбор ответа работают")
+
+def test_answer_selection_with_shortlist():
+    """AnswerSelectionLLMClient отправляет в LLM только кандидатов"""
+    print("🧪 Тестирование answer_selection_main")
+    print("=" * 60)
+
+    import answer_selection_main
+
+    prompts = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        prompts.append(json.loads(request.content)["prompt"])
+        return httpx.Response(200, json={"response": "1"})
+
+    client = answer_selection_main.answer_selection_client
+    original = (client.ollama, client.ollama_available)
+    try:
+        client.ollama = AsyncOllamaClient(transport=httpx.MockTransport(handler))
+        client.ollama_available = True
+        result = asyncio.run(client.find_best_answer("Почему у меня появилась доплата в заказе?"))
+    finally:
+        client.ollama, client.ollama_available = original
+
+    assert len(prompts) == 1
+    assert prompts[0].count("ВОПРОСЫ:") <= client.selector.top_k
+    assert result["source"] == "llm_answer_selection"
+    assert result["answer"] == client.knowledge_base[0]["answer"]
+    print("✅ LLM выбирает среди кандидатов")
+
+if __name__ == "__main__":
+    test_shortlist_recall()
+    test_prompt_prefix_and_resolve()
+    test_answer_selection_with_shortlist()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,279 @@
+"""
+Тест общего асинхронного клиента Ollama: пул, таймауты, лимит параллелизма
+"""
+
+import json
+import asyncio
+
+import httpx
+from ollama_async_client import AsyncOllamaClient, OllamaError, OllamaTimeoutError, normalize_question, stream_generate_sse
+
+def make_transport(delay: float = 0.0, status: int = 200):
+    """Фальшивый Ollama на httpx.MockTransport"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "aparu-senior-ai:latest"}]})
+        payload = json.loads(request.content)
+        if request.url.path == "/api/generate" and payload.get("stream"):
+            words = payload["prompt"].split()
+            lines = [json.dumps({"response": word + " ", "done": False}, ensure_ascii=False) for word in words]
+            lines.append(json.dumps({"response": "", "done": True, "eval_count": len(words)}))
+            return httpx.Response(status, content="\n".join(lines).encode("utf-8"))
+        if request.url.path == "/api/generate":
+            return httpx.Response(status, json={"response": f"ответ: {payload['prompt']}",
+                                                "options": payload.get("options")})
+        if request.url.path == "/api/chat":
+            return httpx.Response(status, json={"message": {"role": "assistant",
+                                                            "content": payload["messages"][-1]["content"]}})
+        return httpx.Response(404)
+    return httpx.MockTransport(handler)
+
+def test_generate_and_chat():
+    """generate/chat/tags возвращают JSON Ollama"""
+    print("🧪 Тестирование generate/chat")
+    print("=" * 60)
+
+    async def run():
+        client = AsyncOllamaClient(transport=make_transport())
+        data = await client.generate("aparu-senior-ai", "наценка", options={"num_predict": 5})
+        assert data["response"] == "ответ: наценка"
+        assert data["options"] == {"num_predict": 5}
+
+        data = await client.chat("aparu-senior-ai", [{"role": "user", "content": "баланс"}])
+        assert data["message"]["content"] == "баланс"
+
+        assert await client.is_available("aparu-senior-ai")
+        assert not await client.is_available("other-model")
+        await client.aclose()
+        return client.stats()
+
+    stats = asyncio.run(run())
+    assert stats["requests"] == 4 and stats["errors"] == 0
+    print(f"✅ Статистика: {stats}")
+
+def test_concurrency_limit():
+    """Одновременно выполняется не больше max_concurrency запросов"""
+    print("🧪 Тестирование лимита параллелизма")
+    print("=" * 60)
+
+    async def run():
+        client = AsyncOllamaClient(max_concurrency=2, transport=make_transport(delay=0.05))
+        results = await asyncio.gather(*[client.generate("m", str(i)) for i in range(6)])
+        await client.aclose()
+        return client, results
+
+    client, results = asyncio.run(run())
+    assert [r["response"] for r in results] == [f"ответ: {i}" for i in range(6)]
+    assert client.max_in_flight == 2
+    assert client.in_flight == 0
+    print(f"✅ Максимум одновременных запросов: {client.max_in_flight}")
+
+def test_timeout_and_errors():
+    """Таймаут на вызов и HTTP ошибки превращаются в OllamaError"""
+    print("🧪 Тестирование таймаутов и ошибок")
+    print("=" * 60)
+
+    async def run():
+        slow = AsyncOllamaClient(transport=make_transport(delay=0.5))
+        try:
+            await slow.generate("m", "медленно", timeout=0.05)
+            assert False, "ожидался таймаут"
+        except OllamaTimeoutError:
+            pass
+
+        broken = AsyncOllamaClient(transport=make_transport(status=500))
+        try:
+            await broken.generate("m", "ошибка")
+            assert False, "ожидалась ошибка"
+        except OllamaError as e:
+            assert e.status_code == 500
+        return slow.stats(), broken.stats()
+
+    slow_stats, broken_stats = asyncio.run(run())
+    assert slow_stats["timeouts"] == 1
+    assert broken_stats["errors"] == 1
+    print("✅ Таймауты и ошибки обрабатываются")
+
+def test_event_loop_change():
+    """Клиент пересоздает пул при запуске в новом цикле событий"""
+    print("🧪 Тестирование смены цикла событий")
+    print("=" * 60)
+
+    client = AsyncOllamaClient(transport=make_transport())
+    pools = []
+    for _ in range(2):
+        data = asyncio.run(client.generate("m", "повтор"))
+        assert data["response"] == "ответ: повтор"
+        pools.append(client._client)
+    # Пул прежнего цикла закрыт, а не брошен открытым
+    assert pools[0] is not pools[1] and pools[0].is_closed and not pools[1].is_closed
+    print("✅ Клиент работает в разных циклах событий")
+
+def test_shared_clients_by_settings():
+    """Общий клиент на адрес и настройки; другие настройки - отдельный клиент"""
+    from ollama_async_client import get_ollama_client
+
+    url = "http://ollama-settings-test:11434"
+    default = get_ollama_client(url)
+    assert get_ollama_client(url + "/") is default
+    assert get_ollama_client(url, timeout=default.timeout) is default
+
+    slow = get_ollama_client(url, timeout=120)
+    assert slow is not default and slow.timeout == 120
+    authorized = get_ollama_client(url, headers={"Authorization": "Bearer x"})
+    assert authorized.headers == {"Authorization": "Bearer x"} and authorized is not default
+    assert get_ollama_client(url, headers={"Authorization": "Bearer x"}) is authorized
+    print("✅ Настройки вызывающего кода не теряются")
+
+def test_single_flight():
+    """Одинаковые одновременные промпты порождают одну генерацию"""
+    print("🧪 Тестирование single-flight")
+    print("=" * 60)
+
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(json.loads(request.content)["prompt"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"response": "ответ"})
+
+    async def run():
+        client = AsyncOllamaClient(transport=httpx.MockTransport(handler))
+        # Промпты сравниваются точно: отличающиеся регистром или пробелами не объединяются
+        prompts = ["Что такое наценка?", "что  такое НАЦЕНКА?", "Что такое наценка?", "Как пополнить баланс?"]
+        results = await asyncio.gather(*[client.generate("m", prompt) for prompt in prompts])
+        # Без coalesce запрос всегда уходит в модель
+        await asyncio.gather(client.generate("m", "баланс", coalesce=False),
+                             client.generate("m", "баланс", coalesce=False))
+        # После завершения генерации повторный запрос снова идет в модель
+        await client.generate("m", "Что такое наценка?")
+        await client.aclose()
+        return client, results
+
+    client, results = asyncio.run(run())
+    assert all(result["response"] == "ответ" for result in results)
+    assert len(calls) == 6
+    stats = client.stats()["single_flight"]
+    assert stats["coalesced"] == 1 and stats["executed"] == 4 and stats["in_flight_keys"] == 0
+    print(f"✅ Объединено запросов: {stats['coalesced']}")
+
+def test_normalized_questions_coalesce():
+    """Вопросы, нормализованные до сборки промпта, объединяются в одну генерацию"""
+    assert normalize_question("  Приложение   НЕ работает?! ") == "приложение не работает"
+    assert normalize_question("Что такое 5.5?") == "что такое 5.5"
+
+    async def run():
+        client = AsyncOllamaClient(transport=make_transport(delay=0.05))
+        questions = ["Приложение не работает?", "приложение не работает", "Приложение  не работает!"]
+        results = await asyncio.gather(*[client.generate("m", f"Вопрос: {normalize_question(q)}")
+                                         for q in questions])
+        await client.aclose()
+        return client.stats()["single_flight"], results
+
+    stats, results = asyncio.run(run())
+    assert all(result["response"] == "ответ: Вопрос: приложение не работает" for result in results)
+    assert stats["executed"] == 1 and stats["coalesced"] == 2
+    print(f"✅ Объединено нормализованных вопросов: {stats['coalesced']}")
+
+def test_single_flight_errors_and_cancel():
+    """Ошибка получают все ожидающие, отмена одного не мешает остальным"""
+    print("🧪 Тестирование single-flight: ошибки и отмена")
+    print("=" * 60)
+
+    async def run():
+        broken = AsyncOllamaClient(transport=make_transport(status=500))
+        results = await asyncio.gather(broken.generate("m", "x"), broken.generate("m", "x"),
+                                       return_exceptions=True)
+        assert all(isinstance(result, OllamaError) for result in results)
+
+        slow = AsyncOllamaClient(transport=make_transport(delay=0.05))
+        leader = asyncio.ensure_future(slow.generate("m", "вопрос"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(slow.generate("m", "вопрос"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        data = await follower
+        assert data["response"] == "ответ: вопрос"
+
+        # Присоединившийся ждет не дольше своего таймаута, генерация продолжается
+        slow = AsyncOllamaClient(transport=make_transport(delay=0.2))
+        leader = asyncio.ensure_future(slow.generate("m", "долго"))
+        await asyncio.sleep(0)
+        try:
+            await slow.generate("m", "долго", timeout=0.05)
+            assert False, "ожидался таймаут"
+        except OllamaTimeoutError:
+            pass
+        assert (await leader)["response"] == "ответ: долго"
+        assert slow.stats()["timeouts"] == 1
+
+    asyncio.run(run())
+    print("✅ Ошибки и отмена обрабатываются")
+
+def parse_sse(events):
+    """Разбирает SSE события в список (event, data)"""
+    parsed = []
+    for block in "".join(events).strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        parsed.append((lines.get("event"), json.loads(lines["data"])))
+    return parsed
+
+def test_streaming_sse():
+    """Стриминг NDJSON из Ollama транслируется в SSE события"""
+    print("🧪 Тестирование стриминга")
+    print("=" * 60)
+
+    async def collect(client, **kwargs):
+        return [event async for event in stream_generate_sse(client, "m", "как заказать доставку", **kwargs)]
+
+    client = AsyncOllamaClient(transport=make_transport())
+    events = parse_sse(asyncio.run(collect(client, source="llm")))
+    assert [name for name, _ in events] == ["token", "token", "token", "done"]
+    assert "".join(data["text"] for name, data in events if name == "token") == "как заказать доставку "
+    assert events[-1][1]["response"] == "как заказать доставку"
+    assert events[-1][1]["eval_count"] == 3
+
+    # Ошибка до первого токена - ответ из fallback
+    broken = AsyncOllamaClient(transport=make_transport(status=500))
+    fallback = lambda: {"answer": "ответ из базы", "source": "simple_search"}
+    events = parse_sse(asyncio.run(collect(broken, fallback=fallback)))
+    assert events == [("token", {"text": "ответ из базы"}),
+                      ("done", {"response": "ответ из базы", "source": "simple_search"})]
+    print("✅ SSE поток и fallback работают")
+
+def test_chat_stream_endpoint():
+    """POST /chat/stream локального LLM сервера"""
+    print("🧪 Тестирование /chat/stream")
+    print("=" * 60)
+
+    from fastapi.testclient import TestClient
+    import local_llm_server
+
+    llm = local_llm_server.local_llm_client
+    original = (llm.ollama, llm.llm_available)
+    try:
+        llm.ollama = AsyncOllamaClient(transport=make_transport())
+        llm.llm_available = True
+        with TestClient(local_llm_server.app) as test_client:
+            response = test_client.post("/chat/stream", json={"text": "наценка", "user_id": "1"})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse([response.text])
+        assert events[0][0] == "token"
+        assert events[-1][0] == "done" and events[-1][1]["source"] == "ultra_fast_llm"
+    finally:
+        llm.ollama, llm.llm_available = original
+    print("✅ /chat/stream отдает SSE")
+
+if __name__ == "__main__":
+    test_generate_and_chat()
+    test_concurrency_limit()
+    test_timeout_and_errors()
+    test_event_loop_change()
+    test_shared_clients_by_settings()
+    test_single_flight()
+    test_normalized_questions_coalesce()
+    test_single_flight_errors_and_cancel()
+    test_streaming_sse()
+    test_chat_stream_endpoint()
+    print("\n🎉 Все тесты пройдены!")
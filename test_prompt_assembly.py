@@ -0,0 +1,136 @@
+"""
+Тест сборки промптов: стабильный префикс, keep_alive, прогрев и доля переиспользования
+"""
+
+import json
+import asyncio
+
+import httpx
+from ollama_async_client import AsyncOllamaClient
+from prompt_assembly import PromptAssembler, canonicalize, PREFIX_SEPARATOR
+
+def make_cached_ollama(requests):
+    """Фальшивый Ollama с кэшем префикса: вычисляются только символы после общего начала"""
+    state = {"last": ""}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append(payload)
+        prompt = payload["prompt"]
+        common = 0
+        for a, b in zip(prompt, state["last"]):
+            if a != b:
+                break
+            common += 1
+        state["last"] = prompt
+        # Один токен на 4 символа
+        evaluated = max((len(prompt) - common) // 4, 1)
+        return httpx.Response(200, json={"response": "ок", "prompt_eval_count": evaluated,
+                                         "eval_count": 1, "eval_duration": 2_000_000})
+    return httpx.MockTransport(handler)
+
+def test_canonical_prefix():
+    """Префикс приводится к каноническому виду и не зависит от переводов строк"""
+    print("🧪 Тестирование канонического префикса")
+    print("=" * 60)
+
+    assert canonicalize("  Правила: \r\n1. Кратко  \n\n") == "Правила:\n1. Кратко"
+
+    assembler = PromptAssembler(AsyncOllamaClient(transport=make_cached_ollama([])), warmup_interval=0)
+    first = assembler.register("m", "faq", "Правила:  \r\n1. Кратко\n", {"num_ctx": 512})
+    second = assembler.register("m", "faq", "Правила:\n1. Кратко")
+    assert first is second and len(assembler.prefixes) == 1
+    assert assembler.build(first, "вопрос") == "Правила:\n1. Кратко" + PREFIX_SEPARATOR + "вопрос"
+    print("✅ Префикс канонический и регистрируется один раз")
+
+def test_keep_alive_and_reuse_rate():
+    """Запросы передают keep_alive и опции префикса, доля переиспользования считается"""
+    print("🧪 Тестирование keep_alive и переиспользования префикса")
+    print("=" * 60)
+
+    requests = []
+    text = "Ты — ассистент APARU. Отвечай кратко и по делу.\n" * 10
+
+    async def run():
+        client = AsyncOllamaClient(transport=make_cached_ollama(requests))
+        assembler = PromptAssembler(client, keep_alive="1h", warmup_interval=0)
+        prefix = assembler.register("m", "faq", text, {"num_ctx": 512, "num_predict": 50})
+
+        await assembler.warm_up()
+        for question in ["Что такое наценка?", "Как пополнить баланс?", "Где мой курьер?"]:
+            await assembler.generate(prefix, question)
+        await client.aclose()
+        return assembler, prefix
+
+    assembler, prefix = asyncio.run(run())
+
+    warmup = requests[0]
+    assert warmup["keep_alive"] == "1h"
+    assert warmup["options"] == {"num_ctx": 512, "num_predict": 1}
+    assert all(r["keep_alive"] == "1h" and r["options"]["num_ctx"] == 512 for r in requests)
+    assert all(r["prompt"].startswith(prefix.text) for r in requests)
+
+    stats = assembler.stats()
+    prefix_stats = stats["prefixes"]["m:faq"]
+    print(f"📊 {prefix_stats}")
+    assert prefix_stats["tokens"] == len(prefix.text) // 4
+    assert prefix_stats["requests"] == 3 and prefix_stats["warmups"] == 1
+    assert prefix_stats["reuse_rate"] == 1.0
+    assert prefix_stats["avg_eval_duration_ms"] == 2.0
+    assert stats["models"]["m"]["calls"] == 4
+    print("✅ keep_alive передается, префикс переиспользуется")
+
+def test_changed_prefix_not_reused():
+    """Если префикс изменился, запросы не считаются попавшими в кэш"""
+    print("🧪 Тестирование смены префикса")
+    print("=" * 60)
+
+    requests = []
+
+    async def run():
+        client = AsyncOllamaClient(transport=make_cached_ollama(requests))
+        assembler = PromptAssembler(client, warmup_interval=0)
+        first = assembler.register("m", "a", "Первый системный промпт. " * 10)
+        second = assembler.register("m", "b", "Второй системный промпт. " * 10)
+        await assembler.warm_up()
+        # Чередование префиксов вытесняет кэш (одна ячейка у фальшивого Ollama)
+        await assembler.generate(first, "вопрос")
+        await assembler.generate(second, "вопрос")
+        await assembler.generate(second, "другой вопрос")
+        await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.stats()["reuse_rate"] == 0.0
+    assert second.stats()["reuse_rate"] == 0.5
+    print("✅ Доля переиспользования отражает смену префикса")
+
+def test_warmup_loop():
+    """Фоновый прогрев запускается и останавливается"""
+    print("🧪 Тестирование фонового прогрева")
+    print("=" * 60)
+
+    requests = []
+
+    async def run():
+        client = AsyncOllamaClient(transport=make_cached_ollama(requests))
+        assembler = PromptAssembler(client, warmup_interval=0.01)
+        prefix = assembler.register("m", "faq", "Системный промпт для прогрева. " * 5)
+        assembler.start_warmup()
+        await asyncio.sleep(0.05)
+        await assembler.stop_warmup()
+        await client.aclose()
+        return prefix
+
+    prefix = asyncio.run(run())
+    assert prefix.warmups >= 2 and len(requests) == prefix.warmups
+    # Повторный прогрев попадает в кэш, но размер префикса не теряется
+    assert prefix.token_count == len(prefix.text) // 4
+    print(f"✅ Прогревов: {prefix.warmups}")
+
+if __name__ == "__main__":
+    test_canonical_prefix()
+    test_keep_alive_and_reuse_rate()
+    test_changed_prefix_not_reused()
+    test_warmup_loop()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,74 @@
+"""
+Тест кэша результатов запросов (LRU/TTL, инвалидация по версии базы знаний)
+"""
+
+import sys
+import os
+sys.path.insert(0, 'backend')
+
+import time
+import tempfile
+from query_cache import QueryCache, KBFileVersion, normalize_query_key
+
+def test_normalized_keys():
+    """Регистр и лишние пробелы не влияют на ключ"""
+    print("🧪 Тестирование нормализации ключей")
+    print("=" * 60)
+
+    assert normalize_query_key("  Что такое   НАЦЕНКА ") == "что такое наценка"
+
+    cache = QueryCache()
+    cache.set("Как пополнить баланс", {"intent": "faq", "faq_id": 3, "confidence": 0.7})
+    assert cache.get("как  пополнить\tБАЛАНС") == {"intent": "faq", "faq_id": 3, "confidence": 0.7}
+    assert cache.get("как пополнить") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    print(f"✅ Статистика: {stats}")
+
+def test_lru_and_ttl():
+    """Вытеснение по размеру и истечение TTL"""
+    print("🧪 Тестирование LRU и TTL")
+    print("=" * 60)
+
+    cache = QueryCache(max_size=2)
+    cache.set("a", {"faq_id": 1})
+    cache.set("b", {"faq_id": 2})
+    cache.get("a")
+    cache.set("c", {"faq_id": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"faq_id": 1}
+    assert cache.stats()["evictions"] == 1
+
+    cache = QueryCache(ttl_seconds=0.05)
+    cache.set("a", {"faq_id": 1})
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    print("✅ LRU и TTL работают")
+
+def test_kb_change_invalidates():
+    """Изменение файла базы знаний сбрасывает кэш"""
+    print("🧪 Тестирование инвалидации при изменении базы знаний")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = os.path.join(tmp, "kb.json")
+        with open(kb_path, "w", encoding="utf-8") as f:
+            f.write('{"faq": []}')
+
+        cache = QueryCache(kb_version=KBFileVersion([kb_path], check_interval=0))
+        cache.set("наценка", {"faq_id": 0})
+        assert cache.get("наценка") == {"faq_id": 0}
+
+        with open(kb_path, "w", encoding="utf-8") as f:
+            f.write('{"faq": [{"question": "Что такое наценка?"}]}')
+
+        assert cache.get("наценка") is None
+        stats = cache.stats()
+        assert stats["invalidations"] == 1 and stats["kb_version"] == 1
+        print(f"✅ Кэш сброшен, версия базы знаний: {stats['kb_version']}")
+
+if __name__ == "__main__":
+    test_normalized_keys()
+    test_lru_and_ttl()
+    test_kb_change_invalidates()
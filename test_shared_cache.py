@@ -0,0 +1,124 @@
+"""
+Тест общего кэша воркеров: in-memory, Redis-совместимый клиент и локальный сервер
+"""
+
+import sys
+import os
+sys.path.insert(0, 'backend')
+
+import time
+import asyncio
+from shared_cache import InMemoryCacheBackend, RedisCacheBackend, LocalCacheServer, create_shared_cache
+from query_cache import QueryCache
+
+def check_backend(backend):
+    """Общие проверки интерфейса CacheBackend"""
+    assert backend.get("a") is None
+    backend.set("a", "значение")
+    assert backend.get("a") == "значение"
+
+    backend.set_many({"b": "1", "c": "2"}, ttl=60)
+    assert backend.get_many(["a", "b", "c", "d"]) == ["значение", "1", "2", None]
+
+    backend.set("short", "x", ttl=0.05)
+    time.sleep(0.1)
+    assert backend.get("short") is None
+
+    assert backend.delete("a") == 1
+    assert backend.get("a") is None
+
+def test_in_memory_backend():
+    """In-memory реализация"""
+    print("🧪 Тестирование InMemoryCacheBackend")
+    print("=" * 60)
+    check_backend(InMemoryCacheBackend())
+    print("✅ InMemoryCacheBackend работает")
+
+def test_redis_client_with_local_server():
+    """RESP клиент с конвейером поверх локального сервера"""
+    print("🧪 Тестирование RedisCacheBackend + LocalCacheServer")
+    print("=" * 60)
+
+    server = LocalCacheServer(port=0)
+    server.start_in_background()
+    try:
+        client = create_shared_cache(f"redis://127.0.0.1:{server.port}/0")
+        assert isinstance(client, RedisCacheBackend)
+        assert client.ping()
+        check_backend(client)
+
+        keys = {f"k{i}": f"v{i}" for i in range(500)}
+        client.set_many(keys)
+        assert client.get_many(list(keys)) == list(keys.values())
+        print(f"✅ Конвейер из {len(keys)} команд выполнен")
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_unavailable_server_is_miss():
+    """Недоступный сервер не ломает запросы"""
+    client = RedisCacheBackend("127.0.0.1", 1, timeout=0.1)
+    assert client.get("a") is None
+    client.set("a", "b")
+    assert client.get_many(["a", "b"]) == [None, None]
+
+def test_circuit_breaker_skips_unavailable_server():
+    """После ошибки общий кэш пропускается без подключения до истечения retry_after"""
+    client = RedisCacheBackend("127.0.0.1", 1, timeout=0.1, retry_after=0.2)
+    assert client.get("a") is None
+    assert not client.available and client.failures == 1
+
+    connects = []
+    client._connect = lambda: connects.append(1)
+    start = time.perf_counter()
+    assert client.get("a") is None
+    client.set("a", "b")
+    assert time.perf_counter() - start < 0.05
+    assert connects == [] and client.skipped == 2
+
+    time.sleep(0.25)
+    assert client.available
+    print(f"✅ Цепь разомкнута на {client.retry_after}с, пропущено вызовов: {client.skipped}")
+
+def test_query_cache_async_methods():
+    """aget/aset работают с общим кэшем так же, как get/set"""
+    shared = InMemoryCacheBackend()
+    worker_1 = QueryCache(shared=shared)
+    worker_2 = QueryCache(shared=shared)
+
+    async def scenario():
+        await worker_1.aset("Где чек", {"intent": "receipt"})
+        assert await worker_2.aget("где чек") == {"intent": "receipt"}
+        assert await worker_2.aget("где чек") == {"intent": "receipt"}
+        assert await worker_2.aget("нет такого") is None
+
+    asyncio.run(scenario())
+    stats = worker_2.stats()
+    assert stats["shared_hits"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+    print(f"✅ aget/aset: {stats}")
+
+def test_query_cache_shared_between_workers():
+    """Прогретый в одном воркере ответ доступен в другом"""
+    print("🧪 Тестирование общего уровня QueryCache")
+    print("=" * 60)
+
+    shared = InMemoryCacheBackend()
+    worker_1 = QueryCache(shared=shared)
+    worker_2 = QueryCache(shared=shared)
+
+    worker_1.set("Как пополнить баланс", {"intent": "faq", "faq_id": 3, "confidence": 0.7})
+    assert worker_2.get("как пополнить баланс") == {"intent": "faq", "faq_id": 3, "confidence": 0.7}
+    assert worker_2.get("как пополнить баланс") is not None
+
+    stats = worker_2.stats()
+    assert stats["shared_hits"] == 1 and stats["hits"] == 1
+    print(f"✅ Статистика второго воркера: {stats}")
+
+if __name__ == "__main__":
+    test_in_memory_backend()
+    test_redis_client_with_local_server()
+    test_unavailable_server_is_miss()
+    test_circuit_breaker_skips_unavailable_server()
+    test_query_cache_async_methods()
+    test_query_cache_shared_between_workers()
@@ -0,0 +1,130 @@
+"""
+Тест общей нормализации текста и сравнение скорости с прежними функциями
+"""
+
+import re
+import sys
+import glob
+import json
+import time
+sys.path.insert(0, 'backend')
+
+from text_normalizer import clean_text, normalize_text, normalize_many
+
+STOP_WORDS = {'как', 'что', 'где', 'мне', 'для', 'это'}
+
+# Прежние реализации - эталон для сравнения результата и скорости
+def legacy_preprocess_text(text):
+    emoji_pattern = re.compile("["
+        u"\U0001F600-\U0001F64F"
+        u"\U0001F300-\U0001F5FF"
+        u"\U0001F680-\U0001F6FF"
+        u"\U0001F1E0-\U0001F1FF"
+        u"\U00002702-\U000027B0"
+        u"\U000024C2-\U0001F251"
+        "]+", flags=re.UNICODE)
+    text = emoji_pattern.sub('', text)
+    text = re.sub(r'[^\w\s\-.,!?]', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+def legacy_normalize_text_simple(text, stop_words=STOP_WORDS):
+    if not text:
+        return ""
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    words = text.split()
+    words = [word for word in words if word not in stop_words and len(word) > 2]
+    return ' '.join(words)
+
+def load_request_corpus():
+    """Запросы из сохраненных результатов прогонов и формулировки базы знаний"""
+    corpus = []
+
+    def collect(node, key=None):
+        if isinstance(node, str):
+            if key in ('question', 'query', 'text') or key is None:
+                corpus.append(node)
+        elif isinstance(node, dict):
+            for child_key, child in node.items():
+                collect(child, child_key)
+        elif isinstance(node, list):
+            for child in node:
+                collect(child, key)
+
+    for path in glob.glob('*test_results*.json'):
+        with open(path, encoding='utf-8') as f:
+            collect(json.load(f))
+    with open('backend/kb.json', encoding='utf-8') as f:
+        kb = json.load(f)
+    for item in kb.get('faq', []) if isinstance(kb, dict) else kb:
+        collect(item.get('question'))
+        collect(item.get('question_variations', []))
+
+    # Запросы из чата: эмодзи, пунктуация, лишние пробелы
+    corpus += ["че там по доставке ?", "Привет!!! 😀 Как пополнить   баланс???", "🚕 где водитель...",
+               "Такси #1 — лучшее!", "промокод «APARU2024» не работает 🙁", "Kaspi\tQR\nоплата"]
+    return corpus
+
+def test_same_results_as_legacy():
+    """Результат совпадает с прежними функциями на корпусе запросов"""
+    print("🧪 Тестирование совпадения с прежней нормализацией")
+    print("=" * 60)
+
+    corpus = load_request_corpus()
+    assert len(corpus) > 100
+    for text in corpus:
+        assert clean_text(text) == legacy_preprocess_text(text), text
+        assert normalize_text(text, STOP_WORDS, min_length=3) == legacy_normalize_text_simple(text), text
+    assert normalize_many(corpus, STOP_WORDS, min_length=3) == [legacy_normalize_text_simple(text) for text in corpus]
+
+    # Разделитель пакета внутри текста и пустые тексты
+    texts = ['а\x00б вв', '', 'Σ конец ΟΔΟΣ', None]
+    assert normalize_many(texts) == [normalize_text(text or '') for text in texts]
+    assert normalize_many(['ΟΔΟΣ', 'Ёлка, ёж!']) == ['οδος', 'ёлка ёж']
+    print(f"✅ {len(corpus)} запросов нормализуются так же")
+
+def test_all_code_points():
+    """Совпадение на всех символах Unicode; таблицы translate не растут"""
+    import text_normalizer
+
+    sizes = [len(text_normalizer._CLEAN_TABLE), len(text_normalizer._FOLD_TABLE)]
+    for start in range(0, sys.maxunicode + 1, 4096):
+        block = ''.join(chr(codepoint) for codepoint in range(start, min(start + 4096, sys.maxunicode + 1))
+                        if not 0xD800 <= codepoint <= 0xDFFF)
+        assert clean_text(block) == legacy_preprocess_text(block), hex(start)
+        assert normalize_text(block, STOP_WORDS, min_length=3) == legacy_normalize_text_simple(block), hex(start)
+    assert [len(text_normalizer._CLEAN_TABLE), len(text_normalizer._FOLD_TABLE)] == sizes
+    print(f"✅ Все символы Unicode, размер таблиц: {sizes}")
+
+def test_benchmark_on_request_corpus():
+    """Время нормализации корпуса запросов: прежние функции против общего модуля"""
+    print("🧪 Бенчмарк нормализации на корпусе запросов")
+    print("=" * 60)
+
+    corpus = load_request_corpus()
+    rounds = 20
+
+    def measure(fn):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        return (time.perf_counter() - start) / (rounds * len(corpus)) * 1e6
+
+    timings = {
+        'preprocess_text (прежний)': measure(lambda: [legacy_preprocess_text(text) for text in corpus]),
+        'clean_text': measure(lambda: [clean_text(text) for text in corpus]),
+        'normalize_text_simple (прежний)': measure(lambda: [legacy_normalize_text_simple(text) for text in corpus]),
+        'normalize_text': measure(lambda: [normalize_text(text, STOP_WORDS, 3) for text in corpus]),
+        'normalize_many': measure(lambda: normalize_many(corpus, STOP_WORDS, 3)),
+    }
+    for name, microseconds in timings.items():
+        print(f"   {name:35s} {microseconds:6.2f} мкс/запрос")
+    print(f"✅ {len(corpus)} запросов x {rounds} повторов")
+
+if __name__ == "__main__":
+    test_same_results_as_legacy()
+    test_all_code_points()
+    test_benchmark_on_request_corpus()
+    print("\n🎉 Все тесты пройдены!")
@@ -0,0 +1,106 @@
+"""
+Тест движка схожести строк (ограниченный Левенштейн, Майерс, batch API)
+"""
+
+import sys
+import os
+sys.path.insert(0, 'backend')
+
+import random
+import time
+from text_similarity import levenshtein_distance, similarity_ratio, batch_similarity, _MyersPattern, _banded_distance
+
+def reference_distance(s1, s2):
+    """Эталонное расстояние Левенштейна (полная матрица, как было в backend/main.py)"""
+    if len(s1) < len(s2):
+        return reference_distance(s2, s1)
+    if len(s2) == 0:
+        return len(s1)
+    
+    previous_row = list(range(len(s2) + 1))
+    for i, c1 in enumerate(s1):
+        current_row = [i + 1]
+        for j, c2 in enumerate(s2):
+            insertions = previous_row[j + 1] + 1
+            deletions = current_row[j] + 1
+            substitutions = previous_row[j] + (c1 != c2)
+            current_row.append(min(insertions, deletions, substitutions))
+        previous_row = current_row
+    
+    return previous_row[-1]
+
+def random_text(rng, max_len):
+    return ''.join(rng.choice('абвгде ') for _ in range(rng.randint(0, max_len)))
+
+def test_distance_matches_reference():
+    """Все пути расчета совпадают с эталоном (с учетом ограничения max_distance)"""
+    print("🧪 Сравнение расстояния Левенштейна с эталоном")
+    print("=" * 60)
+    
+    rng = random.Random(42)
+    for _ in range(3000):
+        s1, s2 = random_text(rng, 90), random_text(rng, 90)
+        expected = reference_distance(s1, s2)
+        max_distance = rng.randint(0, 40)
+        bounded = expected if expected <= max_distance else max_distance + 1
+        
+        assert levenshtein_distance(s1, s2) == expected
+        assert levenshtein_distance(s1, s2, max_distance) == bounded
+        assert _MyersPattern(s1).distance(s2, max_distance) == bounded
+        assert _banded_distance(s1, s2, max_distance) == bounded
+    
+    print("✅ Расстояния совпадают")
+
+def test_similarity_thresholds():
+    """Схожесть выше порога точная, ниже порога - точная или 0.0"""
+    print("🧪 Тестирование порогов схожести")
+    print("=" * 60)
+    
+    rng = random.Random(7)
+    for _ in range(2000):
+        s1, s2 = random_text(rng, 40), random_text(rng, 40)
+        if not s1 or not s2:
+            exact = 0.0
+        elif s1 == s2:
+            exact = 1.0
+        else:
+            exact = max(0.0, 1 - reference_distance(s1, s2) / max(len(s1), len(s2)))
+        
+        for min_similarity in (0.0, 0.6, 0.7, 0.9):
+            result = similarity_ratio(s1, s2, min_similarity)
+            if exact >= min_similarity:
+                assert result == exact, (s1, s2, min_similarity, result, exact)
+            else:
+                assert result in (exact, 0.0)
+            assert batch_similarity(s1, [s2], min_similarity) == [result]
+    
+    print("✅ Пороги соблюдаются")
+
+def test_batch_speed():
+    """Сравнение скорости с полной матрицей на длинных фразах"""
+    print("🧪 Скорость batch_similarity")
+    print("=" * 60)
+    
+    query = "как мне пополнить баланс через каспи если приложение не работает"
+    variations = [
+        "Как пополнить баланс?", "Через что можно пополнить баланс водителя?",
+        "Можно ли пополнить баланс через Kaspi?", "Почему не работает приложение после обновления?",
+        "Как зарегистрироваться водителем и получить доступ к ленте заказов?",
+    ] * 20
+    
+    start = time.perf_counter()
+    for variation in variations:
+        reference_distance(query, variation.lower())
+    reference_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    batch_similarity(query, [v.lower() for v in variations], min_similarity=0.7)
+    batch_time = time.perf_counter() - start
+    
+    print(f"  Полная матрица: {reference_time * 1000:.2f} мс, batch: {batch_time * 1000:.2f} мс "
+          f"(x{reference_time / max(batch_time, 1e-9):.1f})")
+
+if __name__ == "__main__":
+    test_distance_matches_reference()
+    test_similarity_thresholds()
+    test_batch_speed()
@@ -0,0 +1,161 @@
+"""
+Тест мемоизированного стеммера: совпадение корней с эталоном и микро-бенчмарк
+"""
+
+import sys
+import os
+sys.path.insert(0, 'backend')
+
+import json
+import re
+import time
+from word_stemmer import WordStemmer
+
+def load_kb_data():
+    """Загружает данные базы знаний"""
+    try:
+        with open('backend/kb.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"❌ Ошибка загрузки kb.json: {e}")
+        return None
+
+def reference_word_root(word):
+    """Эталонная реализация extract_word_root (как было в backend/main.py)"""
+    if len(word) < 4:
+        return word
+    
+    root = word.lower()
+    
+    # Специальные случаи для конкретных слов
+    special_cases = {
+        'доставка': 'достав', 'доставки': 'достав', 'доставку': 'достав', 'доставке': 'достав',
+        'доставщик': 'достав', 'доставщица': 'достав', 'доставлять': 'достав',
+        'передоставка': 'достав', 'поддоставка': 'достав',
+        'водитель': 'води', 'водители': 'води', 'водительница': 'води', 'водить': 'води',
+        'водит': 'води', 'водила': 'води', 'водило': 'води', 'водили': 'води',
+        'заказ': 'заказ', 'заказы': 'заказ', 'заказывать': 'заказ', 'заказчик': 'заказ',
+        'заказчица': 'заказ', 'перезаказ': 'заказ', 'подзаказ': 'заказ',
+        'ценообразование': 'цен', 'переоценка': 'цен', 'оценка': 'цен',
+        'карточка': 'карт', 'картографический': 'карт', 'картограф': 'карт',
+        'балансировка': 'баланс', 'балансировать': 'баланс',
+        'тарификация': 'тариф', 'тарифицировать': 'тариф'
+    }
+    
+    if root in special_cases:
+        return special_cases[root]
+    
+    # Русские окончания (по длине от длинных к коротким)
+    russian_endings = [
+        'оваться', 'иваться', 'еваться', 'аться', 'иться', 'еться', 'уться',
+        'ование', 'ирование', 'евание', 'ание', 'ение', 'ение',
+        'ский', 'ская', 'ское', 'ские', 'ского', 'ской', 'скую', 'ским', 'ском', 'ских', 'скими',
+        'ость', 'есть', 'ство', 'тель', 'тельница',
+        'ый', 'ая', 'ое', 'ые', 'ого', 'ой', 'ую', 'ым', 'ом', 'их', 'ыми',
+        'ия', 'ий', 'ие', 'ию', 'ием', 'ии', 'иями', 'иях',
+        'ик', 'иц', 'ич', 'ищ', 'ник', 'ниц', 'щик', 'щиц',
+        'а', 'о', 'у', 'ы', 'и', 'е', 'ю', 'ем', 'ом', 'ах', 'ями', 'ях',
+        'ть', 'ти', 'л', 'ла', 'ло', 'ли', 'н', 'на', 'но', 'ны'
+    ]
+    
+    # Приставки (по длине от длинных к коротким)
+    prefixes = [
+        'пере', 'пред', 'под', 'над', 'при', 'раз', 'рас', 'из', 'ис',
+        'от', 'об', 'в', 'во', 'за', 'на', 'до', 'по', 'со', 'вы', 'у'
+    ]
+    
+    # Убираем окончания (от длинных к коротким)
+    for ending in sorted(russian_endings, key=len, reverse=True):
+        if root.endswith(ending) and len(root) > len(ending) + 2:
+            root = root[:-len(ending)]
+            break
+    
+    # Убираем приставки (от длинных к коротким)
+    for prefix in sorted(prefixes, key=len, reverse=True):
+        if root.startswith(prefix) and len(root) > len(prefix) + 3:
+            root = root[len(prefix):]
+            break
+    
+    # Минимальная длина корня
+    return root if len(root) >= 3 else word.lower()
+
+
+def load_vocabulary():
+    """Все слова базы знаний и несколько форм с приставками/окончаниями"""
+    kb_data = load_kb_data()
+    words = set()
+    for item in kb_data["faq"]:
+        texts = [item.get("answer", "")] + item.get("question_variations", []) + item.get("keywords", [])
+        for text in texts:
+            words.update(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+    words.update(['доставщица', 'перезаказ', 'ВОДИТЕЛЬ', 'тарификация', 'переоформление',
+                  'подключиться', 'вызвать', 'уехал', 'ирование', 'спб'])
+    return sorted(words)
+
+def test_roots_match_reference():
+    """Корни совпадают с эталонной реализацией"""
+    print("🧪 Сравнение корней с эталоном")
+    print("=" * 60)
+
+    stemmer = WordStemmer()
+    vocabulary = load_vocabulary()
+    for word in vocabulary:
+        assert stemmer.stem(word) == reference_word_root(word), word
+        # Повторный вызов берется из кэша
+        assert stemmer.stem(word) == reference_word_root(word), word
+
+    info = stemmer.cache_info()
+    assert info['hits'] >= len(vocabulary)
+    print(f"✅ Проверено слов: {len(vocabulary)}, кэш: {info}")
+
+def test_pinned_roots():
+    """Закрепленные корни словаря не вычисляются повторно"""
+    stemmer = WordStemmer(cache_size=2)
+    stemmer.pin({'доставка': 'достав', 'баланса': 'баланс'})
+    assert stemmer.stem('доставка') == 'достав'
+    assert stemmer.stem('баланса') == 'баланс'
+    assert stemmer.cache_info()['misses'] == 0
+
+    # Перезагрузка базы: закреплен только словарь нового снимка
+    stemmer.pin({'поездка': 'поезд'})
+    assert stemmer.cache_info()['pinned'] == 1
+    assert stemmer.stem('доставка') == reference_word_root('доставка')
+
+def test_benchmark():
+    """Микро-бенчмарк: эталон против мемоизированного стеммера"""
+    print("🧪 Микро-бенчмарк стемминга")
+    print("=" * 60)
+
+    vocabulary = load_vocabulary()
+    rounds = 20
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for word in vocabulary:
+            reference_word_root(word)
+    reference_time = time.perf_counter() - start
+
+    stemmer = WordStemmer()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for word in vocabulary:
+            stemmer.stem(word)
+    cached_time = time.perf_counter() - start
+
+    uncached = WordStemmer()
+    start = time.perf_counter()
+    for word in vocabulary:
+        uncached._stem(word)
+    uncached_time = (time.perf_counter() - start) * rounds
+
+    calls = rounds * len(vocabulary)
+    print(f"  Эталон:        {reference_time / calls * 1e6:.2f} мкс/слово")
+    print(f"  Деревья:       {uncached_time / calls * 1e6:.2f} мкс/слово")
+    print(f"  Деревья + LRU: {cached_time / calls * 1e6:.2f} мкс/слово "
+          f"(x{reference_time / max(cached_time, 1e-9):.1f})")
+    assert cached_time < reference_time
+
+if __name__ == "__main__":
+    test_roots_match_reference()
+    test_pinned_roots()
+    test_benchmark()
@@ -15,6 +15,9 @@ from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 import os
 
+from ollama_async_client import get_ollama_client, OllamaTimeoutError
+from llm_selection import KBCandidateSelector
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -51,13 +54,26 @@ class HealthResponse(BaseModel):
     llm_available: bool = False
 
 class TrainedLLMClient:
+    # Неизменная часть обучающего промпта (общий префикс для KV-кэша Ollama)
+    TRAINING_INSTRUCTIONS = """Ты — AI-ассистент службы поддержки такси APARU. Твоя задача — найти подходящий ответ на вопрос пользователя среди пунктов базы знаний.
+
+ИНСТРУКЦИИ:
+1. Сравни вопрос с вариациями вопросов и ключевыми словами пунктов
+2. Найди пункт, который наиболее точно соответствует вопросу
+3. Если найден подходящий пункт, верни его номер (1, 2, 3, и т.д.)
+4. Если ни один пункт не подходит, верни 0"""
+    
     def __init__(self):
         self.ollama_url = os.environ.get("OLLAMA_URL", "http://localhost:11434")
         self.model_name = "aparu-senior-ai"
         self.ollama_available = False
         
+        self.ollama = get_ollama_client(self.ollama_url)
+        
         # Загружаем базу знаний с вариациями и ключевыми словами
         self.knowledge_base = self._load_knowledge_base()
+        # Лексический shortlist: в промпт попадают только top-k кандидатов
+        self.selector = KBCandidateSelector(self.knowledge_base, instructions=self.TRAINING_INSTRUCTIONS)
         
         # Проверяем доступность Ollama
         self._check_ollama_model()
@@ -89,7 +105,7 @@ class TrainedLLMClient:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к Ollama: {e}")
     
-    def find_best_answer(self, question: str) -> Dict[str, Any]:
+    async def find_best_answer(self, question: str) -> Dict[str, Any]:
         """Находит лучший ответ используя обученную LLM"""
         start_time = datetime.now()
         
@@ -97,7 +113,7 @@ class TrainedLLMClient:
         if self.ollama_available:
             try:
                 logger.info("🧠 Используем обученную LLM для поиска ответа...")
-                result = self._trained_llm_search(question)
+                result = await self._trained_llm_search(question)
                 if result:
                     processing_time = (datetime.now() - start_time).total_seconds()
                     logger.info(f"✅ LLM поиск завершен за {processing_time:.2f}с")
@@ -109,11 +125,16 @@ class TrainedLLMClient:
         logger.info("🔄 Fallback к поиску по ключевым словам...")
         return self._keyword_search(question)
     
-    def _trained_llm_search(self, question: str) -> Dict[str, Any]:
-        """Использует обученную LLM для поиска ответа по вариациям и ключевым словам"""
+    async def _trained_llm_search(self, question: str) -> Dict[str, Any]:
+        """Использует обученную LLM для выбора ответа среди кандидатов по вариациям и ключевым словам"""
         try:
-            # Создаем обучающий промпт с вариациями и ключевыми словами
-            training_prompt = self._create_training_prompt(question)
+            candidates = self.selector.shortlist(question)
+            if not candidates:
+                logger.info("🧠 Нет лексических кандидатов - LLM не вызываем")
+                return None
+            
+            # Создаем обучающий промпт с вариациями и ключевыми словами кандидатов
+            training_prompt = self._create_training_prompt(question, candidates)
             
             payload = {
                 "model": self.model_name,
@@ -130,94 +151,50 @@ class TrainedLLMClient:
                 }
             }
             
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload,
+            data = await self.ollama.generate(
+                payload["model"], payload["prompt"], options=payload["options"],
                 timeout=15  # Увеличенный таймаут для обучения
             )
+            answer = data.get('response', '').strip()
             
-            if response.status_code == 200:
-                data = response.json()
-                answer = data.get('response', '').strip()
-                
-                # Парсим ответ LLM
-                result = self._parse_llm_response(answer, question)
-                if result:
-                    return result
-                
-                logger.warning(f"⚠️ LLM вернул неожиданный ответ: {answer}")
-                return None
+            # Парсим ответ LLM
+            result = self._parse_llm_response(answer, candidates)
+            if result:
+                return result
             
-            logger.warning(f"⚠️ LLM вернул ошибку: {response.status_code}")
+            logger.warning(f"⚠️ LLM вернул неожиданный ответ: {answer}")
             return None
             
-        except requests.exceptions.Timeout:
+        except OllamaTimeoutError:
             logger.error(f"❌ LLM поиск таймаут (>15с)")
             return None
         except Exception as e:
             logger.error(f"❌ Ошибка LLM поиска: {e}")
             return None
     
-    def _create_training_prompt(self, question: str) -> str:
-        """Создает обучающий промпт с вариациями и ключевыми словами"""
-        prompt = f"""Ты — AI-ассистент службы поддержки такси APARU. Твоя задача — найти подходящий ответ на вопрос пользователя.
-
-ВОПРОС ПОЛЬЗОВАТЕЛЯ: "{question}"
-
-БАЗА ЗНАНИЙ APARU (с вариациями вопросов и ключевыми словами):"""
-
-        for i, item in enumerate(self.knowledge_base, 1):
-            variations = item.get("question_variations", [])
-            keywords = item.get("keywords", [])
-            answer = item.get("answer", "")
-            
-            prompt += f"\n\n{i}. ВАРИАЦИИ ВОПРОСОВ:"
-            for variation in variations[:5]:  # Берем первые 5 вариаций
-                prompt += f"\n   - {variation}"
-            
-            prompt += f"\n   КЛЮЧЕВЫЕ СЛОВА: {', '.join(keywords)}"
-            prompt += f"\n   ОТВЕТ: {answer[:200]}..."
-        
-        prompt += f"""
-
-ИНСТРУКЦИИ:
-1. Проанализируй вопрос пользователя: "{question}"
-2. Найди в базе знаний пункт, который наиболее точно соответствует вопросу
-3. Сравни вопрос с вариациями вопросов и ключевыми словами
-4. Если найден подходящий пункт, верни его номер (1, 2, 3, и т.д.)
-5. Если ни один пункт не подходит, верни "0"
-
-Твой ответ (только номер):"""
-
-        return prompt
+    def _create_training_prompt(self, question: str, candidates: List[int]) -> str:
+        """Создает обучающий промпт с вариациями и ключевыми словами кандидатов"""
+        return self.selector.build_prompt(question, candidates)
     
-    def _parse_llm_response(self, answer: str, question: str) -> Optional[Dict[str, Any]]:
+    def _parse_llm_response(self, answer: str, candidates: List[int]) -> Optional[Dict[str, Any]]:
         """Парсит ответ LLM и возвращает соответствующий ответ из базы знаний"""
-        try:
-            # Ищем число в ответе
-            import re
-            numbers = re.findall(r'\d+', answer)
-            if numbers:
-                num = int(numbers[0])
-                if 1 <= num <= len(self.knowledge_base):
-                    # Получаем ответ из базы знаний
-                    kb_item = self.knowledge_base[num - 1]
-                    return {
-                        "answer": kb_item.get("answer", "Ответ не найден"),
-                        "category": f"Категория {num}",
-                        "confidence": 0.95,
-                        "source": "trained_llm_search"
-                    }
-                elif num == 0:
-                    return {
-                        "answer": "Извините, не могу найти точный ответ на ваш вопрос в базе знаний. Пожалуйста, уточните или обратитесь в службу поддержки.",
-                        "category": "unknown",
-                        "confidence": 0.5,
-                        "source": "trained_llm_no_match"
-                    }
-            return None
-        except:
-            return None
+        kb_index = self.selector.resolve(answer, candidates)
+        if kb_index is not None:
+            kb_item = self.knowledge_base[kb_index]
+            return {
+                "answer": kb_item.get("answer", "Ответ не найден"),
+                "category": f"Категория {kb_index + 1}",
+                "confidence": 0.95,
+                "source": "trained_llm_search"
+            }
+        if answer.strip().startswith("0"):
+            return {
+                "answer": "Извините, не могу найти точный ответ на ваш вопрос в базе знаний. Пожалуйста, уточните или обратитесь в службу поддержки.",
+                "category": "unknown",
+                "confidence": 0.5,
+                "source": "trained_llm_no_match"
+            }
+        return None
     
     def _keyword_search(self, question: str) -> Dict[str, Any]:
         """Fallback поиск по ключевым словам"""
@@ -304,7 +281,7 @@ async def webapp():
 async def chat(request: ChatRequest):
     """Основной эндпоинт для чата"""
     try:
-        result = trained_llm_client.find_best_answer(request.text)
+        result = await trained_llm_client.find_best_answer(request.text)
         
         return ChatResponse(
             response=result["answer"],
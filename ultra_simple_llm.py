@@ -10,6 +10,10 @@ import requests
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import os
+import asyncio
+
+from ollama_async_client import get_ollama_client, OllamaTimeoutError
+from llm_selection import KBCandidateSelector
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -21,8 +25,12 @@ class UltraSimpleLLMClient:
         self.model_name = "aparu-senior-ai"
         self.ollama_available = False
         
+        self.ollama = get_ollama_client(self.ollama_url)
+        
         # Загружаем базу знаний для поиска
         self.knowledge_base = self._load_knowledge_base()
+        # Лексический shortlist: вместо фиксированного меню категорий LLM видит top-k пунктов базы
+        self.selector = KBCandidateSelector(self.knowledge_base)
         
         # Проверяем доступность Ollama
         self._check_ollama_model()
@@ -54,7 +62,7 @@ class UltraSimpleLLMClient:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось подключиться к Ollama: {e}")
     
-    def find_best_answer(self, question: str) -> Dict[str, Any]:
+    async def find_best_answer(self, question: str) -> Dict[str, Any]:
         """Находит лучший ответ из базы знаний"""
         start_time = datetime.now()
         
@@ -62,7 +70,7 @@ class UltraSimpleLLMClient:
         if self.ollama_available:
             try:
                 logger.info("🔍 Используем ультра-простой LLM для поиска ответа...")
-                result = self._ultra_simple_llm_search(question)
+                result = await self._ultra_simple_llm_search(question)
                 if result:
                     processing_time = (datetime.now() - start_time).total_seconds()
                     logger.info(f"✅ LLM поиск завершен за {processing_time:.2f}с")
@@ -74,29 +82,27 @@ class UltraSimpleLLMClient:
         logger.info("🔄 Fallback к улучшенному простому поиску...")
         return self._enhanced_simple_search(question)
     
-    def _ultra_simple_llm_search(self, question: str) -> Dict[str, Any]:
-        """Использует ультра-простой LLM для поиска ответа"""
+    async def _ultra_simple_llm_search(self, question: str) -> Dict[str, Any]:
+        """Использует ультра-простой LLM для поиска ответа (выбор среди кандидатов из лексического индекса)"""
         try:
-            # УЛЬТРА-ПРОСТОЙ ПРОМПТ
-            search_prompt = f"""Вопрос: "{question}"
-
-Выбери номер:
-1 - наценка/дорого
-2 - доставка/курьер  
-3 - баланс/оплата
-4 - приложение/ошибка
-5 - тариф/комфорт
-
-Номер:"""
+            candidates = self.selector.shortlist(question)
+            if not candidates:
+                logger.info("🔍 Нет лексических кандидатов - LLM не вызываем")
+                return None
+            if len(candidates) == 1:
+                # Единственный кандидат - выбирать LLM нечего
+                return self._kb_result(candidates[0], 0.9, "lexical_shortlist")
+            
+            prompt = self.selector.build_prompt(question, candidates)
 
             payload = {
                 "model": self.model_name,
-                "prompt": search_prompt,
+                "prompt": prompt,
                 "stream": False,
                 "options": {
                     "temperature": 0.0,   # Минимальная температура
                     "num_predict": 2,      # Только номер
-                    "num_ctx": 256,        # Минимальный контекст
+                    "num_ctx": 1024,       # Контекст под список кандидатов
                     "repeat_penalty": 1.0,
                     "top_k": 1,            # Только лучший вариант
                     "top_p": 0.1,          # Минимальная вероятность
@@ -104,55 +110,36 @@ class UltraSimpleLLMClient:
                 }
             }
             
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload,
-                timeout=10  # Короткий таймаут
+            data = await self.ollama.generate(
+                payload["model"], payload["prompt"], options=payload["options"],
+                timeout=10
             )
+            answer = data.get('response', '').strip()
             
-            if response.status_code == 200:
-                data = response.json()
-                answer = data.get('response', '').strip()
-                
-                # Парсим номер категории
-                category_num = self._parse_category_number(answer)
-                if category_num:
-                    # Получаем ответ из базы знаний
-                    if 1 <= category_num <= len(self.knowledge_base):
-                        kb_item = self.knowledge_base[category_num - 1]
-                        return {
-                            "answer": kb_item.get("answer", "Ответ не найден"),
-                            "category": kb_item.get("question", f"Категория {category_num}"),
-                            "confidence": 0.95,
-                            "source": "ultra_simple_llm_search"
-                        }
-                
-                logger.warning(f"⚠️ LLM вернул неожиданный ответ: '{answer}'")
-                return None
+            # Номер в списке кандидатов -> пункт базы знаний
+            kb_index = self.selector.resolve(answer, candidates)
+            if kb_index is not None:
+                return self._kb_result(kb_index, 0.95, "ultra_simple_llm_search")
             
-            logger.warning(f"⚠️ LLM вернул ошибку: {response.status_code}")
+            logger.warning(f"⚠️ LLM вернул неожиданный ответ: '{answer}'")
             return None
             
-        except requests.exceptions.Timeout:
+        except OllamaTimeoutError:
             logger.error(f"❌ LLM поиск таймаут (>10с)")
             return None
         except Exception as e:
             logger.error(f"❌ Ошибка LLM поиска: {e}")
             return None
     
-    def _parse_category_number(self, answer: str) -> Optional[int]:
-        """Парсит номер категории из ответа LLM"""
-        try:
-            # Ищем число в ответе
-            import re
-            numbers = re.findall(r'\d+', answer)
-            if numbers:
-                num = int(numbers[0])
-                if 1 <= num <= 5:
-                    return num
-            return None
-        except:
-            return None
+    def _kb_result(self, kb_index: int, confidence: float, source: str) -> Dict[str, Any]:
+        """Ответ из пункта базы знаний"""
+        kb_item = self.knowledge_base[kb_index]
+        return {
+            "answer": kb_item.get("answer", "Ответ не найден"),
+            "category": kb_item.get("question", f"Категория {kb_index + 1}"),
+            "confidence": confidence,
+            "source": source
+        }
     
     def _enhanced_simple_search(self, question: str) -> Dict[str, Any]:
         """Улучшенный простой поиск по ключевым словам и синонимам"""
@@ -292,7 +279,7 @@ if __name__ == "__main__":
     
     for i, question in enumerate(test_questions, 1):
         print(f"{i:2d}. {question}")
-        result = client.find_best_answer(question)
+        result = asyncio.run(client.find_best_answer(question))
         print(f"    ✅ Ответ: {result['answer'][:100]}...")
         print(f"    📊 Категория: {result['category']}")
         print(f"    🎯 Уверенность: {result['confidence']}")